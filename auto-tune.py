@@ -0,0 +1,255 @@
+import os
+import cv2
+import sys
+import json
+import time
+import socket
+import argparse
+import itertools
+import numpy as np
+from datetime import datetime
+
+# Configuration
+PROTOTXT = "MobileNetSSD_deploy.prototxt"
+MODEL = "MobileNetSSD_deploy.caffemodel"
+PROFILE_PATH = "tuning-profile.json"
+CONFIDENCE_THRESHOLD = 0.5
+HUMAN_CLASS_ID = 15
+
+SWEEP_INPUT_SIZES = [300, 256, 224]
+SWEEP_BATCH_SIZES = [1, 2, 4]
+CLIP_FRAMES = 60           # frames decoded from the clip and replayed for every trial
+TRIAL_SECONDS = 3.0        # measuring time per parameter combination
+WARMUP_RUNS = 3            # untimed forward passes after changing backend or input size
+LATENCY_SLO_MS = 200.0     # p99 per-frame latency a configuration must meet to be picked
+
+# Accuracy gate: every configuration is checked against the detector's own settings
+REFERENCE_INPUT_SIZE = 300 # the detector's INPUT_SIZE, run on the default OpenCV/CPU backend
+MIN_PERSON_RECALL = 0.95   # fraction of the reference's people a configuration must still find to be picked
+MATCH_IOU = 0.5            # a box overlapping a reference box this much is the same person
+
+BACKEND_NAMES = {
+    cv2.dnn.DNN_BACKEND_OPENCV: "opencv",
+    cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE: "inference_engine",
+    cv2.dnn.DNN_BACKEND_CUDA: "cuda",
+}
+TARGET_NAMES = {
+    cv2.dnn.DNN_TARGET_CPU: "cpu",
+    cv2.dnn.DNN_TARGET_OPENCL: "opencl",
+    cv2.dnn.DNN_TARGET_OPENCL_FP16: "opencl_fp16",
+    cv2.dnn.DNN_TARGET_CUDA: "cuda",
+    cv2.dnn.DNN_TARGET_CUDA_FP16: "cuda_fp16",
+}
+
+def log_message(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}")
+
+def percentile(values, pct):
+    return float(np.percentile(values, pct)) if values else float('nan')
+
+def thread_counts():
+    """1, 2, 4, ... up to the number of CPUs, always including the CPU count"""
+    cpus = os.cpu_count() or 1
+    counts = []
+    n = 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    counts.append(cpus)
+    return counts
+
+def backend_targets():
+    """(backend, target) pairs this OpenCV build can run"""
+    pairs = [(cv2.dnn.DNN_BACKEND_OPENCV, cv2.dnn.DNN_TARGET_CPU)]
+    if hasattr(cv2.dnn, 'getAvailableBackends'):
+        for backend, target in cv2.dnn.getAvailableBackends():
+            if (backend, target) not in pairs and backend in BACKEND_NAMES and target in TARGET_NAMES:
+                pairs.append((backend, target))
+    return pairs
+
+def load_clip(source, count):
+    """Decode the first `count` frames of the clip into memory"""
+    cap = cv2.VideoCapture(source)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.flip(frame, 1))
+    cap.release()
+    return frames
+
+def detect_people(net, frames, input_size):
+    """Person boxes (fractions of the frame) per frame, one forward pass per frame"""
+    people = []
+    for frame in frames:
+        net.setInput(cv2.dnn.blobFromImage(cv2.resize(frame, (input_size, input_size)), 0.007843,
+                                           (input_size, input_size), 127.5))
+        rows = net.forward()[0, 0]
+        people.append(rows[(rows[:, 2] > CONFIDENCE_THRESHOLD) & (rows[:, 1].astype(int) == HUMAN_CLASS_ID), 3:7])
+    return people
+
+def person_recall(reference, found):
+    """Fraction of the reference's person boxes that `found` has a box for, matched one to one by IoU"""
+    matched = total = 0
+    for expected, boxes in zip(reference, found):
+        total += len(expected)
+        free = list(boxes)
+        for box in expected:
+            overlaps = [box_iou(box, other) for other in free]
+            if overlaps and max(overlaps) >= MATCH_IOU:
+                free.pop(int(np.argmax(overlaps)))
+                matched += 1
+    return matched / total if total else 1.0
+
+def box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def run_trial(net, frames, input_size, batch_size, seconds):
+    """Time batched forward passes and return throughput and per-frame latency"""
+    blobs = []
+    for i in range(0, len(frames) - batch_size + 1, batch_size):
+        batch = [cv2.resize(f, (input_size, input_size)) for f in frames[i:i + batch_size]]
+        blobs.append(cv2.dnn.blobFromImages(batch, 0.007843, (input_size, input_size), 127.5))
+
+    for blob in blobs[:WARMUP_RUNS]:
+        net.setInput(blob)
+        net.forward()
+
+    latencies = []
+    processed = 0
+    started = time.perf_counter()
+    for blob in itertools.cycle(blobs):
+        t0 = time.perf_counter()
+        net.setInput(blob)
+        net.forward()
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        # Every frame in a batch waits for the whole batch
+        latencies.extend([elapsed_ms] * batch_size)
+        processed += batch_size
+        if time.perf_counter() - started >= seconds:
+            break
+    wall = time.perf_counter() - started
+    return {
+        'fps': processed / wall,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99)
+    }
+
+def sweep_inference(frames, seconds):
+    """Measure every thread count, backend, input size and batch size combination, and each
+    backend and input size's person recall against the reference"""
+    results = []
+    net = cv2.dnn.readNetFromCaffe(PROTOTXT, MODEL)
+    reference = detect_people(net, frames, REFERENCE_INPUT_SIZE)
+    input_sizes = SWEEP_INPUT_SIZES
+    if not any(len(people) for people in reference):
+        # Nothing to lose, so nothing to check: only the reference size can be picked safely
+        log_message(f"Warning: no people in the clip, recall cannot be checked; sweeping input {REFERENCE_INPUT_SIZE} only")
+        input_sizes = [REFERENCE_INPUT_SIZE]
+    for backend, target in backend_targets():
+        try:
+            net.setPreferableBackend(backend)
+            net.setPreferableTarget(target)
+        except cv2.error as e:
+            log_message(f"Skipping {BACKEND_NAMES[backend]}/{TARGET_NAMES[target]}: {e}")
+            continue
+        recall = {}  # input size -> recall; thread count and batch size do not change the detections
+        for threads, input_size, batch_size in itertools.product(thread_counts(), input_sizes, SWEEP_BATCH_SIZES):
+            cv2.setNumThreads(threads)
+            try:
+                if input_size not in recall:
+                    recall[input_size] = person_recall(reference, detect_people(net, frames, input_size))
+                measured = run_trial(net, frames, input_size, batch_size, seconds)
+            except cv2.error as e:
+                log_message(f"Trial failed ({BACKEND_NAMES[backend]}/{TARGET_NAMES[target]}, "
+                            f"threads={threads}, size={input_size}, batch={batch_size}): {e}")
+                continue
+            result = {
+                'num_threads': threads,
+                'backend': BACKEND_NAMES[backend],
+                'target': TARGET_NAMES[target],
+                'input_size': input_size,
+                'batch_size': batch_size,
+                'person_recall': recall[input_size],
+                **measured
+            }
+            log_message(f"{result['backend']}/{result['target']} threads={threads} size={input_size} "
+                        f"batch={batch_size}: {result['fps']:.1f} FPS, p99 {result['p99_ms']:.1f} ms, "
+                        f"recall {100 * result['person_recall']:.1f}%")
+            results.append(result)
+    return results
+
+def pick_best(results, slo_ms, min_recall, key_latency='p99_ms'):
+    """Highest throughput within the latency SLO among the configurations that keep `min_recall`
+    of the reference's people, or the lowest latency if nothing meets the SLO"""
+    accurate = [r for r in results if r['person_recall'] >= min_recall]
+    if not accurate:
+        best_recall = max(r['person_recall'] for r in results)
+        log_message(f"Warning: no configuration kept {100 * min_recall:.0f}% person recall, "
+                    f"picking among the most accurate ({100 * best_recall:.1f}%)")
+        accurate = [r for r in results if r['person_recall'] == best_recall]
+    results = accurate
+    within = [r for r in results if r[key_latency] <= slo_ms]
+    if within:
+        return max(within, key=lambda r: r['fps'])
+    log_message(f"Warning: no configuration met the {slo_ms:.0f} ms SLO, picking the lowest latency")
+    return min(results, key=lambda r: r[key_latency])
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the fastest inference and threading settings for this host")
+    parser.add_argument('clip', help="recorded clip (or camera index) to benchmark with")
+    parser.add_argument('-o', '--output', default=PROFILE_PATH, help="profile file to write")
+    parser.add_argument('--seconds', type=float, default=TRIAL_SECONDS, help="measuring time per combination")
+    parser.add_argument('--slo-ms', type=float, default=LATENCY_SLO_MS, help="p99 latency limit in milliseconds")
+    parser.add_argument('--min-recall', type=float, default=MIN_PERSON_RECALL,
+                        help=f"fraction of the {REFERENCE_INPUT_SIZE} px reference's people a configuration must find")
+    args = parser.parse_args()
+
+    frames = load_clip(int(args.clip) if args.clip.isdigit() else args.clip, CLIP_FRAMES)
+    if not frames:
+        log_message(f"Error: could not read frames from {args.clip}")
+        sys.exit(1)
+    log_message(f"Loaded {len(frames)} frames from {args.clip}")
+
+    try:
+        inference_results = sweep_inference(frames, args.seconds)
+    except KeyboardInterrupt:
+        log_message("Auto-tune stopped by user")
+        sys.exit(1)
+
+    if not inference_results:
+        log_message("Error: no inference configuration could be measured")
+        sys.exit(1)
+
+    best = pick_best(inference_results, args.slo_ms, args.min_recall)
+    profile = {
+        'host': socket.gethostname(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'opencv_version': cv2.__version__,
+        'num_threads': best['num_threads'],
+        'backend': best['backend'],
+        'target': best['target'],
+        'input_size': best['input_size'],
+        'batch_size': best['batch_size'],
+        'reference_input_size': REFERENCE_INPUT_SIZE,
+        'person_recall': best['person_recall'],
+        'measured': {'inference': best, 'slo_ms': args.slo_ms, 'min_recall': args.min_recall}
+    }
+    with open(args.output, 'w') as f:
+        json.dump(profile, f, indent=2)
+
+    log_message(f"Best: {best['backend']}/{best['target']} threads={best['num_threads']} "
+                f"size={best['input_size']} batch={best['batch_size']} "
+                f"({best['fps']:.1f} FPS, p99 {best['p99_ms']:.1f} ms, "
+                f"person recall {100 * best['person_recall']:.1f}% of the {REFERENCE_INPUT_SIZE} px reference)")
+    log_message(f"Profile written to {args.output}")
+
+if __name__ == "__main__":
+    main()
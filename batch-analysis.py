@@ -0,0 +1,357 @@
+import os
+import cv2
+import sys
+import json
+import time
+import types
+import argparse
+import importlib.util
+import numpy as np
+from datetime import datetime
+from multiprocessing import Pool
+
+# Configuration
+PROTOTXT = "MobileNetSSD_deploy.prototxt"
+MODEL = "MobileNetSSD_deploy.caffemodel"
+CONFIDENCE_THRESHOLD = 0.5
+HUMAN_CLASS_ID = 15
+NO_HUMAN_WAIT_TIME = 30  # seconds (video time) without humans before the process starts
+MIN_HUMANS = 1           # humans in zone needed for "human detected"
+INPUT_SIZE = 300         # network input width/height
+BATCH_SIZE = 1           # frames per forward pass
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.m4v')
+CHUNK_FRAMES = 900       # frames per work unit (60 s at 15 fps)
+DEFAULT_FPS = 15.0       # used when the container does not report a frame rate
+MIRROR_FRAMES = True     # live loops flip frames before detection, so zones are defined mirrored
+
+# Detection area configuration (percentage of frame width/height)
+DETECTION_AREA = {
+    'x_start': 0.25,
+    'y_start': 0.25,
+    'x_end': 0.75,
+    'y_end': 0.75
+}
+
+# Predictive zone-entry warning
+DETECTOR_SCRIPT = "dynamic-area-detections.py"  # the tracker and its settings come from this script
+
+DNN_BACKENDS = {
+    'opencv': cv2.dnn.DNN_BACKEND_OPENCV,
+    'inference_engine': cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE,
+    'cuda': cv2.dnn.DNN_BACKEND_CUDA
+}
+DNN_TARGETS = {
+    'cpu': cv2.dnn.DNN_TARGET_CPU,
+    'opencl': cv2.dnn.DNN_TARGET_OPENCL,
+    'opencl_fp16': cv2.dnn.DNN_TARGET_OPENCL_FP16,
+    'cuda': cv2.dnn.DNN_TARGET_CUDA,
+    'cuda_fp16': cv2.dnn.DNN_TARGET_CUDA_FP16
+}
+
+# Per-worker model, loaded once by init_worker
+net = None
+
+def log_message(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}")
+
+def init_worker(mirror, profile):
+    """Load the model once per worker process"""
+    global net, MIRROR_FRAMES, INPUT_SIZE, BATCH_SIZE
+    MIRROR_FRAMES = mirror
+    # Each worker is one process; keep OpenCV from spawning a thread pool per worker
+    cv2.setNumThreads(1)
+    net = cv2.dnn.readNetFromCaffe(PROTOTXT, MODEL)
+    if profile:
+        # Thread count is left at 1: the pool already uses one process per core
+        net.setPreferableBackend(DNN_BACKENDS[profile['backend']])
+        net.setPreferableTarget(DNN_TARGETS[profile['target']])
+        INPUT_SIZE = profile['input_size']
+        BATCH_SIZE = profile['batch_size']
+
+def is_in_detection_area(box, frame_width, frame_height):
+    """Check if detection is within our defined area"""
+    x_center = (box[0] + box[2]) / 2
+    y_center = (box[1] + box[3]) / 2
+
+    x_min = frame_width * DETECTION_AREA['x_start']
+    x_max = frame_width * DETECTION_AREA['x_end']
+    y_min = frame_height * DETECTION_AREA['y_start']
+    y_max = frame_height * DETECTION_AREA['y_end']
+
+    return (x_min <= x_center <= x_max) and (y_min <= y_center <= y_max)
+
+def detect_humans(frames):
+    """Run the detector on a batch of frames and return person detections with zone membership per frame"""
+    (h, w) = frames[0].shape[:2]
+    resized = [cv2.resize(frame, (INPUT_SIZE, INPUT_SIZE)) for frame in frames]
+    blob = cv2.dnn.blobFromImages(resized, 0.007843, (INPUT_SIZE, INPUT_SIZE), 127.5)
+
+    net.setInput(blob)
+    detections = net.forward()
+
+    people = [[] for _ in frames]
+    for i in range(detections.shape[2]):
+        confidence = detections[0, 0, i, 2]
+
+        if confidence > CONFIDENCE_THRESHOLD:
+            class_id = int(detections[0, 0, i, 1])
+
+            if class_id == HUMAN_CLASS_ID:
+                # Column 0 holds the index of the frame within the batch
+                image_id = int(detections[0, 0, i, 0])
+                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
+                (startX, startY, endX, endY) = box.astype("int")
+                people[image_id].append({
+                    'box': [int(startX), int(startY), int(endX), int(endY)],
+                    'centre': [round((startX + endX) / (2 * w), 4), round((startY + endY) / (2 * h), 4)],
+                    'confidence': round(float(confidence), 4),
+                    'in_zone': bool(is_in_detection_area((startX, startY, endX, endY), w, h))
+                })
+    return people
+
+def load_detector(path):
+    """Import the detector script without starting it; GPIO is stubbed off the Pi"""
+    if 'RPi' not in sys.modules and importlib.util.find_spec('RPi') is None:
+        gpio = types.ModuleType('RPi.GPIO')
+        gpio.BCM, gpio.OUT = 'BCM', 'OUT'
+        gpio.setmode = gpio.setup = gpio.output = lambda *args, **kwargs: None
+        sys.modules['RPi'] = types.ModuleType('RPi')
+        sys.modules['RPi'].GPIO = sys.modules['RPi.GPIO'] = gpio
+    spec = importlib.util.spec_from_file_location('detector', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def find_videos(paths):
+    """Expand files and directories into a sorted list of video files"""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in files:
+                    if name.lower().endswith(VIDEO_EXTENSIONS):
+                        videos.append(os.path.join(root, name))
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            log_message(f"Warning: {path} does not exist, skipping")
+    return sorted(videos)
+
+def probe_video(path):
+    """Return (frame_count, fps) for a video file"""
+    cap = cv2.VideoCapture(path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    if not fps or fps <= 0 or fps != fps:
+        fps = DEFAULT_FPS
+    return frame_count, fps
+
+def plan_chunks(videos, chunk_frames):
+    """Split every video into (path, start, end, fps) work units, in file and frame order"""
+    tasks = []
+    for path in videos:
+        frame_count, fps = probe_video(path)
+        if frame_count <= 0:
+            # Unknown length (some containers): process the whole file as one unit
+            tasks.append((path, 0, None, fps))
+            continue
+        for start in range(0, frame_count, chunk_frames):
+            tasks.append((path, start, min(start + chunk_frames, frame_count), fps))
+    return tasks
+
+def seek(cap, start):
+    """Position the capture on frame `start`, decoding forward if the container cannot seek exactly"""
+    if start == 0:
+        return
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == start:
+        return
+    # Inexact seek: restart and skip frames so chunk boundaries stay frame-accurate
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(start):
+        if not cap.grab():
+            break
+
+def process_chunk(task):
+    """Detect humans on every frame of one work unit"""
+    path, start, end, fps = task
+    cap = cv2.VideoCapture(path)
+    seek(cap, start)
+
+    records = []
+    index = start
+    finished = False
+    while not finished:
+        batch = []
+        while len(batch) < BATCH_SIZE and (end is None or index + len(batch) < end):
+            ret, frame = cap.read()
+            if not ret:
+                finished = True
+                break
+            batch.append(cv2.flip(frame, 1) if MIRROR_FRAMES else frame)
+        if not batch:
+            break
+
+        for people in detect_humans(batch):
+            records.append({
+                'frame': index,
+                # Timestamps come from the frame index, not the wall clock, so reruns match exactly
+                'timestamp': round(index / fps, 6),
+                'human_count': sum(1 for p in people if p['in_zone']),
+                'detections': people
+            })
+            index += 1
+
+    cap.release()
+    return path, start, fps, records
+
+def state_transitions(record, state):
+    """Apply the live loop's presence logic to one frame and return the transitions it causes.
+
+    Args:
+        record (dict): Per-frame record produced by process_chunk.
+        state (dict): Presence state for the current file, updated in place.
+    """
+    events = []
+    current_time = record['timestamp']
+    human_detected = record['human_count'] >= MIN_HUMANS
+
+    # Pre-warning, as in dynamic-area-detections.py: a tracked person is heading into the zone
+    entry_eta = state['predictor'].update([p['centre'] for p in record['detections']], current_time, DETECTION_AREA)
+    warning = entry_eta is not None and not human_detected
+    if warning and state['warning_since'] is None:
+        events.append('prewarning_on')
+        state['warning_since'] = current_time
+    elif not warning and state['warning_since'] is not None:
+        if not human_detected:
+            events.append('prewarning_off')
+        state['last_warning'] = state['warning_since']
+        state['warning_since'] = None
+
+    # Serial output: sent only when the detected state changes
+    if human_detected != state['human_state']:
+        events.append('human_enter' if human_detected else 'human_exit')
+        state['lead_time'] = None
+        if human_detected and state['last_warning'] is not None:
+            # Warning held until this frame's entry ended it: that is the lead time gained
+            state['lead_time'] = round(current_time - state['last_warning'], 6)
+        state['human_state'] = human_detected
+    state['last_warning'] = None
+
+    # Process start/stop, as in region-detaction.py
+    if human_detected:
+        state['last_human_detected_time'] = current_time
+        if state['process_started']:
+            events.append('process_stop')
+            state['process_started'] = False
+    else:
+        if state['last_human_detected_time'] is None:
+            state['last_human_detected_time'] = current_time
+        if (current_time - state['last_human_detected_time']) >= NO_HUMAN_WAIT_TIME and not state['process_started']:
+            events.append('process_start')
+            state['process_started'] = True
+
+    return events
+
+def new_state(detector):
+    """Presence state at the start of a file, with a fresh tracker from the imported detector"""
+    return {'human_state': None, 'last_human_detected_time': None, 'process_started': False,
+            'predictor': detector.ZoneEntryPredictor(), 'warning_since': None, 'last_warning': None, 'lead_time': None}
+
+def run_batch(videos, output_path, workers, chunk_frames, mirror=MIRROR_FRAMES, profile=None):
+    """Analyse all videos with a process pool and write results as JSON lines.
+
+    Args:
+        videos (list): Video files to analyse.
+        output_path (str): Results file; one JSON object per line.
+        workers (int): Number of worker processes.
+        chunk_frames (int): Frames per work unit.
+        mirror (bool): Flip frames horizontally before detection, like the live loops.
+        profile (dict): Optional auto-tune profile providing backend, input size and batch size.
+    """
+    tasks = plan_chunks(videos, chunk_frames)
+    detector = load_detector(os.path.join(os.path.dirname(os.path.abspath(__file__)), DETECTOR_SCRIPT))
+    log_message(f"Analysing {len(videos)} file(s) as {len(tasks)} chunk(s) on {workers} worker(s)")
+
+    started = time.time()
+    total_frames = 0
+    video_seconds = 0.0
+    transitions = 0
+    entries = 0
+    lead_times = []
+    current_path = None
+    state = None
+
+    with open(output_path, 'w') as out, Pool(workers, initializer=init_worker, initargs=(mirror, profile)) as pool:
+        # imap keeps chunk order, so the state machine sees every file's frames in sequence
+        for path, start, fps, records in pool.imap(process_chunk, tasks):
+            if path != current_path:
+                current_path = path
+                state = new_state(detector)
+                log_message(f"Processing {path}")
+
+            for record in records:
+                out.write(json.dumps({'type': 'frame', 'file': path, **record}) + "\n")
+                for event in state_transitions(record, state):
+                    transition = {
+                        'type': 'transition',
+                        'file': path,
+                        'frame': record['frame'],
+                        'timestamp': record['timestamp'],
+                        'event': event,
+                        'human_count': record['human_count']
+                    }
+                    if event == 'human_enter':
+                        entries += 1
+                        transition['lead_time'] = state['lead_time']
+                        if state['lead_time'] is not None:
+                            lead_times.append(state['lead_time'])
+                    out.write(json.dumps(transition) + "\n")
+                    transitions += 1
+
+            total_frames += len(records)
+            video_seconds += len(records) / fps
+
+    elapsed = time.time() - started
+    speed = video_seconds / elapsed if elapsed > 0 else 0.0
+    log_message(f"Done: {total_frames} frames, {transitions} transitions in {elapsed:.1f}s "
+                f"({total_frames / max(elapsed, 1e-9):.1f} FPS, {speed:.1f}x realtime)")
+    if entries:
+        log_message(f"Pre-warning: {len(lead_times)} of {entries} zone entries warned"
+                    + (f", lead time mean {np.mean(lead_times):.2f}s, median {np.median(lead_times):.2f}s, "
+                       f"min {min(lead_times):.2f}s" if lead_times else ""))
+    log_message(f"Results written to {output_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run human detection over recorded video as fast as the CPU allows")
+    parser.add_argument('inputs', nargs='+', help="video files or directories")
+    parser.add_argument('-o', '--output', default="detections.jsonl", help="results file (JSON lines)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument('--chunk-frames', type=int, default=CHUNK_FRAMES, help="frames per work unit")
+    parser.add_argument('--no-mirror', action='store_true', help="do not flip frames before detection")
+    parser.add_argument('--profile', help="tuning profile written by auto-tune.py")
+    args = parser.parse_args()
+
+    profile = None
+    if args.profile:
+        with open(args.profile) as f:
+            profile = json.load(f)
+        if profile.get('person_recall') is None and profile['input_size'] != INPUT_SIZE:
+            log_message(f"Warning: profile input {profile['input_size']} has no recall check, keeping input {INPUT_SIZE}")
+            profile['input_size'] = INPUT_SIZE
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        log_message("Error: no video files found")
+        sys.exit(1)
+
+    try:
+        run_batch(videos, args.output, args.workers, args.chunk_frames, mirror=not args.no_mirror, profile=profile)
+    except KeyboardInterrupt:
+        log_message("Batch analysis stopped by user")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from datetime import datetime
+from multiprocessing import shared_memory, resource_tracker
+
+# Configuration
+SHM_NAME = "human-detections"  # DETECTIONS_SHM in dynamic-area-detections.py
+POLL_INTERVAL = 0.005          # seconds between checks for new records
+REATTACH_TIMEOUT = 2.0         # seconds without records before re-opening the ring (detector restarted)
+REPORT_INTERVAL = 60           # seconds between lost-record log lines
+
+# Ring layout, kept in step with DetectionRing in dynamic-area-detections.py
+RING_MAGIC = b'HDRG'
+RING_VERSION = 1
+RING_HEADER = np.dtype([('magic', 'S4'), ('version', '<u4'), ('slots', '<u4'), ('max_boxes', '<u2'),
+                        ('max_zones', '<u2'), ('write_seq', '<u8')])
+RING_HEADER_SIZE = 64
+
+def log_message(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}", file=sys.stderr)
+
+def record_dtype(max_boxes, max_zones):
+    return np.dtype([
+        ('commit', '<u8'),
+        ('seq', '<u8'),
+        ('timestamp', '<f8'),
+        ('camera', 'S16'),
+        ('box_count', '<u2'),
+        ('zone_count', '<u2'),
+        ('boxes', '<f4', (max_boxes, 4)),
+        ('confidences', '<f4', (max_boxes,)),
+        ('zone_ids', '<i2', (max_boxes,)),
+        ('zone_counts', '<u2', (max_zones,))
+    ])
+
+class RingReader:
+    """Read-only view of the detector's shared-memory ring"""
+
+    def __init__(self, name):
+        self.shm = shared_memory.SharedMemory(name)
+        # The detector owns the segment; keep this process's resource tracker from unlinking it on exit
+        resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.header = np.ndarray((), RING_HEADER, buffer=self.shm.buf)
+        if self.header['magic'] != RING_MAGIC or self.header['version'] != RING_VERSION:
+            self.close()
+            raise ValueError(f"shared memory '{name}' is not a version {RING_VERSION} detection ring")
+        dtype = record_dtype(int(self.header['max_boxes']), int(self.header['max_zones']))
+        self.records = np.ndarray((int(self.header['slots']),), dtype, buffer=self.shm.buf, offset=RING_HEADER_SIZE)
+
+    def write_seq(self):
+        return int(self.header['write_seq'])
+
+    def read(self, seq):
+        """Copy record `seq` out of the ring, or None if it was overwritten or is being written"""
+        i = seq % len(self.records)
+        if self.records['commit'][i] != seq:
+            return None
+        record = self.records[i].copy()
+        if self.records['commit'][i] != seq or record['seq'] != seq:
+            return None  # The writer lapped us while we copied
+        return record
+
+    def close(self):
+        del self.header
+        self.__dict__.pop('records', None)
+        self.shm.close()
+
+def to_dict(record):
+    n = int(record['box_count'])
+    return {
+        'camera': record['camera'].decode(errors='replace'),
+        'seq': int(record['seq']),
+        'timestamp': float(record['timestamp']),
+        'boxes': [[round(float(v), 4) for v in box] for box in record['boxes'][:n]],
+        'confidences': [round(float(c), 4) for c in record['confidences'][:n]],
+        'zone_ids': [int(z) for z in record['zone_ids'][:n]],
+        'zone_counts': [int(c) for c in record['zone_counts'][:int(record['zone_count'])]]
+    }
+
+def follow(name, output_format):
+    """Print every new record as it is published, re-attaching if the detector restarts"""
+    reader = None
+    next_seq = None
+    lost = 0
+    last_record = time.monotonic()
+    last_report = time.monotonic()
+    while True:
+        if reader is None:
+            try:
+                reader = RingReader(name)
+            except (FileNotFoundError, ValueError) as e:
+                log_message(f"Waiting for detection ring '{name}': {e}")
+                time.sleep(REATTACH_TIMEOUT)
+                continue
+            next_seq = reader.write_seq() + 1
+            last_record = time.monotonic()
+            log_message(f"Attached to '{name}' ({len(reader.records)} slots)")
+
+        write_seq = reader.write_seq()
+        if write_seq < next_seq - 1:
+            next_seq = write_seq + 1  # Ring was re-created under the same name
+        if write_seq - next_seq + 1 > len(reader.records):
+            lost += write_seq - next_seq + 1 - len(reader.records)
+            next_seq = write_seq - len(reader.records) + 1
+        while next_seq <= write_seq:
+            record = reader.read(next_seq)
+            if record is None:
+                lost += 1
+            elif output_format == 'jsonl':
+                print(json.dumps(to_dict(record)), flush=True)
+            else:
+                r = to_dict(record)
+                print(f"{r['camera']} #{r['seq']} {datetime.fromtimestamp(r['timestamp']).strftime('%H:%M:%S.%f')[:-3]} "
+                      f"zones {r['zone_counts']} boxes {len(r['boxes'])}", flush=True)
+            next_seq += 1
+            last_record = time.monotonic()
+
+        now = time.monotonic()
+        if now - last_record > REATTACH_TIMEOUT:
+            # A restarted detector unlinks and re-creates the ring; our mapping would stay on the old one
+            reader.close()
+            reader = None
+            continue
+        if lost and now - last_report >= REPORT_INTERVAL:
+            log_message(f"{lost} record(s) lost (reader fell a full ring behind)")
+            lost = 0
+            last_report = now
+        time.sleep(POLL_INTERVAL)
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream detections published by dynamic-area-detections.py on this host")
+    parser.add_argument('--name', default=SHM_NAME, help="shared memory name (DETECTIONS_SHM)")
+    parser.add_argument('--format', choices=['text', 'jsonl'], default='text', help="output format")
+    args = parser.parse_args()
+
+    try:
+        follow(args.name, args.format)
+    except KeyboardInterrupt:
+        log_message("Subscriber stopped by user")
+
+if __name__ == "__main__":
+    main()
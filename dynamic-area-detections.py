@@ -1,7 +1,25 @@
+import os
+import sys
 import cv2
+import json
 import time
+import queue
+import signal
+import socket
+import struct
+import binascii
+import resource
+import threading
+import tracemalloc
 import numpy as np
+import urllib.parse
+import urllib.request
 from datetime import datetime
+from inference_client import InferenceClient
+from types import MappingProxyType
+from collections import deque, Counter, namedtuple
+from multiprocessing import shared_memory
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import serial
 import RPi.GPIO as GPIO
 
@@ -11,13 +29,38 @@ PROTOTXT = "MobileNetSSD_deploy.prototxt"
 MODEL = "MobileNetSSD_deploy.caffemodel"
 CONFIDENCE_THRESHOLD = 0.5
 HUMAN_CLASS_ID = 15
+INPUT_SIZE = 300            # network input width/height, may be overridden by the tuning profile
+CAPTURE_BUFFER_SIZE = None  # capture queue length in frames, None leaves the driver default
+
+# Per-host tuning profile written by auto-tune.py, applied at startup if present
+TUNING_PROFILE = "tuning-profile.json"
+DNN_BACKENDS = {
+    'opencv': cv2.dnn.DNN_BACKEND_OPENCV,
+    'inference_engine': cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE,
+    'cuda': cv2.dnn.DNN_BACKEND_CUDA
+}
+DNN_TARGETS = {
+    'cpu': cv2.dnn.DNN_TARGET_CPU,
+    'opencl': cv2.dnn.DNN_TARGET_OPENCL,
+    'opencl_fp16': cv2.dnn.DNN_TARGET_OPENCL_FP16,
+    'cuda': cv2.dnn.DNN_TARGET_CUDA,
+    'cuda_fp16': cv2.dnn.DNN_TARGET_CUDA_FP16
+}
 
 GPIO_LED = 23
+GPIO_ALARM = 24             # driven high while the watchdog holds the safe state
+GPIO_PREWARNING = 25        # driven high while a person is predicted to enter the zone
 
 # Serial port configuration
 SERIAL_PORT = '/dev/cu.usbserial-120'  # Change to your Arduino port
 BAUD_RATE = 9600
 
+# 'byte' sends b'1'/b'0' on SERIAL_PORT; 'framed' sends every zone's state as one bitmask frame
+# (sync, zone count, sequence, mask, CRC-16) to each port in ACTUATOR_OUTPUTS, see serial-test.py
+SERIAL_PROTOCOL = 'byte'
+ACTUATOR_OUTPUTS = {SERIAL_PORT: ['detection_area', 'prewarning']}  # port -> zones, bit i is zones[i]
+FRAME_HEARTBEAT = 1.0       # seconds between repeated frames while no zone changes
+
 # Initial Detection area configuration (percentage of frame width/height)
 DETECTION_AREA = {
     'x_start': 0.25,
@@ -26,32 +69,177 @@ DETECTION_AREA = {
     'y_end': 0.75
 }
 
+# Occupancy statistics configuration
+STATS_WINDOWS = {'1m': 60, '1h': 3600, '1d': 86400}  # window name -> length in seconds
+STATS_BUCKETS = 60          # time buckets per window, so memory stays fixed however long we run
+HEATMAP_GRID = (48, 64)     # rows, columns of the position heatmap
+STATS_HTTP_PORT = 8085      # live stats on http://127.0.0.1:<port>/stats, None to disable
+
+# Stage scheduling (Linux): CPU set per pipeline stage, None leaves placement to the OS
+STAGE_AFFINITY = None       # e.g. {'capture': {0}, 'inference': {2, 3}, 'output': {1}}
+INFERENCE_THREADS = None    # OpenCV thread pool size, defaults to the size of the inference CPU set
+CAPTURE_THREADS = None      # FFmpeg decode threads for stream/file sources, None for the FFmpeg default
+STAGE_REPORT_INTERVAL = 60  # seconds between per-stage CPU and jitter log lines
+
+# Sampling profiler, started at runtime with `kill -USR1 <pid>` or
+# `curl -X POST http://127.0.0.1:8085/profile?seconds=30`; nothing runs while it is off
+PROFILE_DURATION = 30       # seconds sampled per run unless the request says otherwise
+PROFILE_INTERVAL = 0.005    # seconds between stack samples
+PROFILE_DIR = "profiles"    # collapsed stacks (<name>.folded, for flamegraph.pl/speedscope) and <name>.txt summary
+PROFILE_TOP = 25            # functions listed in the summary
+
+# Low-memory profile for 1 GB boards: preallocated buffers, bounded queues, memory reporting
+LOW_MEMORY = False
+LOW_MEMORY_RSS_BUDGET_MB = 300  # resident memory the detector should stay under
+LOW_MEMORY_FRAME_SCALE = 1.0    # process frames at this fraction of the 640x480 capture size
+LOW_MEMORY_GRAYSCALE = False    # feed the network grayscale replicated to three channels
+MEMORY_REPORT_INTERVAL = 60     # seconds between RSS and allocation log lines
+
+# Latency tracking and fail-safe watchdog
+LATENCY_SLO = 0.5           # seconds from capture to serial write before the watchdog trips
+FRAME_TIMEOUT = 1.0         # seconds without a captured or completed frame before the watchdog trips
+WATCHDOG_INTERVAL = 0.1     # seconds between watchdog checks
+WATCHDOG_RECOVERY = 2.0     # seconds of healthy frames before normal output resumes
+SAFE_OUTPUT_STATE = True    # output forced while tripped: '1' stops the machine
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+# Thermal throttling: step down the workload before the SoC throttles itself. THERMAL_ROOT can
+# point at a copy of the sysfs tree to test; None disables
+THERMAL_TARGET = None           # degrees C to stay under, e.g. 75 on a Raspberry Pi in an enclosure
+THERMAL_ROOT = "/sys"
+THERMAL_SENSOR = "class/thermal/thermal_zone0/temp"                 # millidegrees C
+CPU_FREQ_CURRENT = "devices/system/cpu/cpu0/cpufreq/scaling_cur_freq"  # kHz
+CPU_FREQ_MAX = "devices/system/cpu/cpu0/cpufreq/cpuinfo_max_freq"
+THERMAL_THROTTLED = "devices/platform/soc/soc:firmware/get_throttled"  # Raspberry Pi firmware flags (hex)
+THROTTLED_NOW = 0xE             # flag bits for ARM frequency capped, throttled now, soft temperature limit
+THERMAL_INTERVAL = 1.0          # seconds between sysfs reads
+THERMAL_LOOKAHEAD = 30.0        # seconds ahead the temperature trend is projected
+THERMAL_TREND_WINDOW = 20       # readings in the trend fit
+THERMAL_HYSTERESIS = 5.0        # degrees below target (projected too) before stepping back up
+THERMAL_MIN_DWELL = 15.0        # seconds at a level before stepping again
+FREQ_CAPPED_RATIO = 0.9         # without firmware flags: current/max CPU frequency below this mid-frame means capped
+# Cheapest last; 'frame_interval' is the minimum seconds between inferences (keep it under FRAME_TIMEOUT),
+# 'input_size' overrides INPUT_SIZE and 'model' swaps in a lighter (prototxt, caffemodel) pair
+THERMAL_LEVELS = [
+    {'name': 'full'},
+    {'name': 'reduced_rate', 'frame_interval': 0.1},
+    {'name': 'small_input', 'frame_interval': 0.1, 'input_size': 224},
+    {'name': 'minimum', 'frame_interval': 0.25, 'input_size': 160}
+]
+
+# Predictive zone-entry warning
+PREDICTION_HORIZON = 1.5        # seconds ahead a tracked person's path is checked against the zone
+PREDICTION_MIN_SPEED = 0.05     # frame widths/heights per second below which a person counts as standing
+TRACK_MAX_DISTANCE = 0.15       # furthest (fraction of frame) a centre may move between frames and keep its track
+TRACK_TIMEOUT = 0.5             # seconds a track survives without a matching detection
+TRACK_MIN_HITS = 3              # detections before a track's velocity is trusted
+TRACK_PROCESS_NOISE = 0.5       # Kalman process noise (acceleration variance)
+TRACK_MEASUREMENT_NOISE = 1e-4  # Kalman measurement noise (centre variance)
+PREWARNING_SERIAL = False       # also send PREWARNING_LEVEL over serial (needs firmware that knows it)
+PREWARNING_LEVEL = 2            # serial byte b'2' while pre-warning and no one is in the zone
+
+# Multi-node presence (presence-bus.py hub), None keeps this node standalone
+PRESENCE_BUS = None         # hub address, e.g. ('192.168.1.10', 9500)
+NODE_ID = socket.gethostname()
+PRESENCE_HEARTBEAT = 0.5    # seconds between messages while presence is unchanged
+
+# Local detection feed for other processes on this host (see detections-subscriber.py)
+DETECTIONS_SHM = None           # shared memory name, e.g. "human-detections"; None disables
+DETECTIONS_RING_SLOTS = 64      # records kept; a subscriber further behind than this loses records
+DETECTIONS_MAX_BOXES = 16       # boxes per record, further detections are left out of the record
+DETECTIONS_MAX_ZONES = 8        # per-zone counts per record
+CAMERA_ID = f"cam{WEBCAM_INDEX}"
+
+# Per-frame results and presence
+MAX_DETECTIONS = 100            # detections kept per frame (the SSD's keep_top_k)
+PRESENCE_MIN_COUNT = 2          # people in the zone for presence, i.e. the '1' output
+
+# Confidence-driven escalation: ambiguous people in or near the zone get a second pass on a
+# crop of the full frame, so they are seen at higher resolution; None disables
+ESCALATION_BAND = (0.3, 0.65)   # person confidences that are re-checked (the refined confidence decides)
+ESCALATION_NEAR_MARGIN = 0.1    # fraction of the frame around the zone that still counts as near it
+ESCALATION_PADDING = 0.25       # crop grows by this fraction of the box size on every side
+ESCALATION_MAX_REGIONS = 2      # crops per frame, most confident candidates first
+ESCALATION_MIN_CROP = 32        # pixels; smaller crops are not re-run
+ESCALATION_MATCH_IOU = 0.3      # overlap a crop detection needs with the original box to replace it
+
+# Hazard rules over every MobileNetSSD class, evaluated on the same forward pass.
+# 'zone' names HAZARD_ZONES or 'detection_area' (the live, mouse-drawn zone); 'classes'
+# None matches any class; 'moving' needs frame-to-frame motion inside the box; 'stop'
+# also drives the main serial/LED output. Rule names can be listed in ACTUATOR_OUTPUTS, so they
+# must be unique and not one of BUILTIN_OUTPUTS.
+BUILTIN_OUTPUTS = ('detection_area', 'prewarning')
+VOC_CLASSES = ['background', 'aeroplane', 'bicycle', 'bird', 'boat', 'bottle', 'bus', 'car', 'cat',
+               'chair', 'cow', 'diningtable', 'dog', 'horse', 'motorbike', 'person', 'pottedplant',
+               'sheep', 'sofa', 'train', 'tvmonitor']
+HAZARD_ZONES = {}               # e.g. {'loading_bay': {'x_start': 0.0, 'y_start': 0.6, 'x_end': 0.4, 'y_end': 1.0}}
+HAZARD_RULES = []               # e.g. [{'name': 'rider_in_area', 'zone': 'detection_area', 'classes': ['person', 'bicycle']},
+                                #       {'name': 'bay_moving', 'zone': 'loading_bay', 'classes': None, 'moving': True, 'stop': True}]
+HAZARD_MOTION_SIZE = (80, 60)   # frame is downscaled to this for motion detection
+HAZARD_MOTION_DELTA = 25        # grey-level change that counts as motion
+HAZARD_MOTION_MIN_FRACTION = 0.05  # fraction of a box that must change for the object to count as moving
+
 # UI Configuration
 BUTTONS = {
     'reset_zone': {'text': "Reset Zone", 'pos': (10, 70), 'size': (120, 30), 'color': (100, 100, 255)},
     'disable_zone': {'text': "Disable Zone", 'pos': (10, 110), 'size': (120, 30), 'color': (100, 255, 100)},
     'enable_zone': {'text': "Enable Zone", 'pos': (10, 150), 'size': (120, 30), 'color': (255, 100, 100)}
 }
+WINDOW_NAME = 'Human Detection with Serial Output'
+UI_POLL_INTERVAL = 0.05     # seconds the UI waits for a new frame before pumping window events anyway
 
-# Global variables
+# Global variables (UI thread only; detection sees the zone through ZoneConfig snapshots)
 drawing = False
-zone_enabled = True
-last_human_state = None
-human_count = 0
 start_point = (-1, -1)
 end_point = (-1, -1)
 
+# Remote inference (inference-server.py), None always runs the model locally
+INFERENCE_SERVER_URL = None     # e.g. "http://192.168.1.10:8090/detect"
+INFERENCE_TIMEOUT = 0.5         # seconds before falling back to the local model
+INFERENCE_RETRY_INTERVAL = 10   # seconds on the local model before trying the server again
+
 # Load pre-trained model
 net = cv2.dnn.readNetFromCaffe(PROTOTXT, MODEL)
 
-# Initialize serial connection
-try:
-    ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-    time.sleep(2)  # Wait for connection to establish
-    print(f"Connected to serial port {SERIAL_PORT}")
-except serial.SerialException as e:
-    print(f"Error opening serial port: {e}")
-    ser = None
+# Serial connection, opened at startup (framed outputs are opened by ActuatorPool)
+ser = None
+serial_lock = threading.Lock()
+actuators = None  # ActuatorPool under the framed protocol
+buffers = None  # FrameBuffers under the low-memory profile
+
+def load_tuning_profile(path):
+    """Apply thread count, DNN backend and input size from an auto-tune profile.
+
+    A smaller input size is only applied when the profile records the person recall it kept
+    against the reference size; profiles from before that check keep INPUT_SIZE.
+    """
+    global INPUT_SIZE
+
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        log_message(f"Error reading tuning profile {path}: {e}")
+        return None
+
+    if profile.get('host') != socket.gethostname():
+        log_message(f"Warning: tuning profile was measured on {profile.get('host')}, not this host")
+
+    cv2.setNumThreads(profile['num_threads'])
+    net.setPreferableBackend(DNN_BACKENDS[profile['backend']])
+    net.setPreferableTarget(DNN_TARGETS[profile['target']])
+    recall = profile.get('person_recall')
+    if recall is None and profile['input_size'] != INPUT_SIZE:
+        log_message(f"Warning: tuning profile input {profile['input_size']} has no recall check, keeping input {INPUT_SIZE}")
+    else:
+        INPUT_SIZE = profile['input_size']
+    accuracy = "" if recall is None else \
+        f" (person recall {100 * recall:.1f}% of the {profile['reference_input_size']} px reference)"
+    log_message(f"Loaded tuning profile {path}: {profile['backend']}/{profile['target']}, "
+                f"{profile['num_threads']} threads, input {INPUT_SIZE}{accuracy}")
+    return profile
 
 def set_gpio(pin_number, value):
     GPIO.setmode(GPIO.BCM)      # Use BCM numbering scheme
@@ -62,10 +250,29 @@ def log_message(message):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {message}")
 
+# Zone settings as the detector sees them for one frame; `area` is a read-only mapping
+ZoneConfig = namedtuple('ZoneConfig', ['area', 'zone_enabled', 'version'])
+
+class UIConfig:
+    """Publishes zone edits from the UI thread as immutable ZoneConfig snapshots.
+
+    Every edit builds a new snapshot and replaces `current` in one reference store, so the
+    detection thread, which reads `current` once per frame, always sees a whole snapshot:
+    the zone test, escalation, hazard rules and prediction of a frame use the same zone.
+    """
+
+    def __init__(self, area, zone_enabled=True):
+        self.current = ZoneConfig(MappingProxyType(dict(area)), zone_enabled, 0)
+
+    def publish(self, area=None, zone_enabled=None):
+        config = self.current
+        self.current = ZoneConfig(config.area if area is None else MappingProxyType(dict(area)),
+                                  config.zone_enabled if zone_enabled is None else zone_enabled,
+                                  config.version + 1)
+        return self.current
+
 def check_button_click(x, y):
     """Check if a button was clicked and perform the corresponding action"""
-    global zone_enabled, DETECTION_AREA
-    
     for btn_name, btn in BUTTONS.items():
         pos = btn['pos']
         size = btn['size']
@@ -74,27 +281,22 @@ def check_button_click(x, y):
             pos[1] <= y <= pos[1] + size[1]):
             
             if btn_name == 'reset_zone':
-                DETECTION_AREA = {
-                    'x_start': 0.25,
-                    'y_start': 0.25,
-                    'x_end': 0.75,
-                    'y_end': 0.75
-                }
+                ui_config.publish(area=DETECTION_AREA)
                 log_message("Detection zone reset to default")
                 
             elif btn_name == 'disable_zone':
-                zone_enabled = False
+                ui_config.publish(zone_enabled=False)
                 log_message("Detection zone disabled - monitoring entire frame")
                 
             elif btn_name == 'enable_zone':
-                zone_enabled = True
+                ui_config.publish(zone_enabled=True)
                 log_message("Detection zone enabled")
                 
             return True
     return False
 
 def mouse_callback(event, x, y, flags, param):
-    global drawing, start_point, end_point, DETECTION_AREA
+    global drawing, start_point, end_point
     
     if event == cv2.EVENT_LBUTTONDOWN:
         # Check if a button was clicked first
@@ -103,7 +305,7 @@ def mouse_callback(event, x, y, flags, param):
             return
 
         # If not a button, and zone is enabled, then start drawing
-        if zone_enabled:
+        if ui_config.current.zone_enabled:
             drawing = True
             start_point = (x, y)
             end_point = (x, y)
@@ -118,45 +320,1058 @@ def mouse_callback(event, x, y, flags, param):
             
             # Convert to relative coordinates if a zone was being drawn
             frame_height, frame_width = param.shape[:2]
-            DETECTION_AREA = {
+            ui_config.publish(area={
                 'x_start': min(start_point[0], end_point[0]) / frame_width,
                 'y_start': min(start_point[1], end_point[1]) / frame_height,
                 'x_end': max(start_point[0], end_point[0]) / frame_width,
                 'y_end': max(start_point[1], end_point[1]) / frame_height
-            }
+            })
         # After drawing or if not drawing, also check for button click on release
         else:
             check_button_click(x,y)
 
 
-def is_in_detection_area(box, frame_width, frame_height):
-    """Check if detection is within our defined area"""
-    if not zone_enabled:
-        return True
-        
-    x_center = (box[0] + box[2]) / 2
-    y_center = (box[1] + box[3]) / 2
-    
-    x_min = frame_width * DETECTION_AREA['x_start']
-    x_max = frame_width * DETECTION_AREA['x_end']
-    y_min = frame_height * DETECTION_AREA['y_start']
-    y_max = frame_height * DETECTION_AREA['y_end']
-    
-    return (x_min <= x_center <= x_max) and (y_min <= y_center <= y_max)
+def send_serial_data(camera, state, count=None, zone_states=None):
+    """Send `camera`'s output over serial if the port is open, returning True if anything was written.
 
-def send_serial_data(state):
-    """Send data over serial if port is open"""
-    global last_human_state
+    With the framed protocol, zone_states maps zone names to their state; None sets every
+    zone to `state`, which is how the watchdog forces the safe state.
+    """
+    if actuators is not None:
+        return actuators.send(zone_states or {}, default=bool(state))
     
-    # Only send if state changed
-    if state != last_human_state and ser is not None:
+    # Output and watchdog threads both write; keep state and port access consistent
+    with serial_lock:
+        # Only send if state changed
+        if state != camera.state.last_sent and ser is not None:
+            try:
+                data = str(int(state)).encode()  # b'0', b'1', or PREWARNING_LEVEL
+                ser.write(data)
+                ser.flush()  # Return once the byte has left, so latency covers the write
+                log_message(f"Serial data sent: {data.decode()} (Humans detected: {camera.state.count if count is None else count})")
+                camera.state.last_sent = state
+                return True
+            except serial.SerialException as e:
+                log_message(f"Serial write error: {e}")
+    return False
+
+class ZoneEntryPredictor:
+    """Tracks person box centres with a constant-velocity Kalman filter and predicts zone entry.
+
+    Centres are given as fractions of the frame width/height, so tracks survive zone and
+    resolution changes. update() returns the soonest predicted entry time into `area` in
+    seconds, or None.
+    """
+
+    def __init__(self):
+        self.tracks = []
+        self.last_time = None
+
+    def reset(self):
+        """Forget all tracks, e.g. while the zone is disabled"""
+        self.tracks = []
+        self.last_time = None
+
+    @staticmethod
+    def transition(dt):
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        return F
+
+    def update(self, centres, now, area):
+        dt = 0.0 if self.last_time is None else max(0.0, now - self.last_time)
+        self.last_time = now
+        F = self.transition(dt)
+        Q = np.diag([dt ** 2, dt ** 2, dt, dt]) * TRACK_PROCESS_NOISE
+        for track in self.tracks:
+            track['x'] = F @ track['x']
+            track['P'] = F @ track['P'] @ F.T + Q
+
+        # Greedy nearest-neighbour association between predicted tracks and new centres
+        pairs = sorted((np.hypot(t['x'][0] - c[0], t['x'][1] - c[1]), ti, ci)
+                       for ti, t in enumerate(self.tracks) for ci, c in enumerate(centres))
+        used_tracks, used_centres = set(), set()
+        H = np.eye(2, 4)
+        R = np.eye(2) * TRACK_MEASUREMENT_NOISE
+        for distance, ti, ci in pairs:
+            if distance > TRACK_MAX_DISTANCE:
+                break
+            if ti in used_tracks or ci in used_centres:
+                continue
+            used_tracks.add(ti)
+            used_centres.add(ci)
+            track = self.tracks[ti]
+            innovation = np.asarray(centres[ci]) - H @ track['x']
+            S = H @ track['P'] @ H.T + R
+            K = track['P'] @ H.T @ np.linalg.inv(S)
+            track['x'] = track['x'] + K @ innovation
+            track['P'] = (np.eye(4) - K @ H) @ track['P']
+            track['hits'] += 1
+            track['seen'] = now
+
+        self.tracks = [t for t in self.tracks if now - t['seen'] <= TRACK_TIMEOUT]
+        for ci, centre in enumerate(centres):
+            if ci not in used_centres:
+                self.tracks.append({'x': np.array([centre[0], centre[1], 0.0, 0.0]),
+                                    'P': np.diag([TRACK_MEASUREMENT_NOISE] * 2 + [1.0, 1.0]),
+                                    'hits': 1, 'seen': now})
+
+        soonest = None
+        for track in self.tracks:
+            if track['hits'] < TRACK_MIN_HITS or track['seen'] != now:
+                continue
+            eta = self.time_to_entry(track['x'], area)
+            if eta is not None and (soonest is None or eta < soonest):
+                soonest = eta
+        return soonest
+
+    @staticmethod
+    def time_to_entry(x, area):
+        """Seconds until a point moving at constant velocity enters the zone, if within the horizon"""
+        px, py, vx, vy = x
+        if np.hypot(vx, vy) < PREDICTION_MIN_SPEED:
+            return None
+        lo = np.array([area['x_start'], area['y_start']])
+        hi = np.array([area['x_end'], area['y_end']])
+        p = np.array([px, py])
+        if np.all(p >= lo) and np.all(p <= hi):
+            return None  # Already inside: the normal stop output covers it
+        # Slab intersection of the motion ray with the zone rectangle
+        t_enter, t_exit = 0.0, PREDICTION_HORIZON
+        for axis, v in enumerate((vx, vy)):
+            if abs(v) < 1e-9:
+                if not lo[axis] <= p[axis] <= hi[axis]:
+                    return None
+                continue
+            t1 = (lo[axis] - p[axis]) / v
+            t2 = (hi[axis] - p[axis]) / v
+            t_enter = max(t_enter, min(t1, t2))
+            t_exit = min(t_exit, max(t1, t2))
+        return t_enter if t_enter <= t_exit else None
+
+FRAME_SYNC = b'\xaa\x55'
+FRAME_HEADER = struct.Struct('<2sBHI')  # sync, zone count, sequence, zone bitmask; CRC-16 follows
+
+def pack_frame(seq, zone_count, mask):
+    body = FRAME_HEADER.pack(FRAME_SYNC, zone_count, seq, mask)
+    return body + struct.pack('<H', binascii.crc_hqx(body, 0xFFFF))
+
+class ActuatorPool:
+    """Serial outputs opened once at startup, each sent a framed bitmask of its zones.
+
+    A frame goes out when a port's mask changes, and again every FRAME_HEARTBEAT seconds so
+    the firmware can fail safe if frames stop arriving.
+    """
+
+    def __init__(self, outputs):
+        self.ports = {}
+        for port, zones in outputs.items():
+            try:
+                conn = serial.Serial(port, BAUD_RATE, timeout=1)
+            except serial.SerialException as e:
+                log_message(f"Error opening serial port {port}: {e}")
+                continue
+            self.ports[port] = {'serial': conn, 'zones': zones, 'mask': None, 'sent': 0.0, 'seq': 0,
+                                'lock': threading.Lock()}
+            log_message(f"Connected to serial port {port} (zones: {', '.join(zones)})")
+        if self.ports:
+            time.sleep(2)  # Wait for the boards to reset after opening
+
+    def send(self, zone_states, default=False):
+        written = False
+        for port, out in self.ports.items():
+            mask = 0
+            for bit, zone in enumerate(out['zones']):
+                if zone_states.get(zone, default):
+                    mask |= 1 << bit
+            # Output and watchdog threads both write; one lock per port keeps frames whole
+            with out['lock']:
+                now = time.monotonic()
+                if mask == out['mask'] and now - out['sent'] < FRAME_HEARTBEAT:
+                    continue
+                seq = (out['seq'] + 1) % 2**16
+                try:
+                    out['serial'].write(pack_frame(seq, len(out['zones']), mask))
+                    out['serial'].flush()
+                except serial.SerialException as e:
+                    log_message(f"Serial write error on {port}: {e}")
+                    continue
+                if mask != out['mask']:
+                    log_message(f"Frame sent to {port}: zones {mask:0{len(out['zones'])}b} (seq {seq})")
+                out['seq'] = seq
+                out['mask'] = mask
+                out['sent'] = now
+                written = True
+        return written
+
+    def close(self):
+        for out in self.ports.values():
+            out['serial'].close()
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram, cheap enough to update on every frame"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        i = 0
+        while i < len(LATENCY_BUCKETS_MS) and ms > LATENCY_BUCKETS_MS[i]:
+            i += 1
+        with self.lock:
+            self.counts[i] += 1
+            self.total += 1
+            self.sum_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th percentile"""
+        target = self.total * pct / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return 0.0
+
+    def summary(self):
+        with self.lock:
+            if not self.total:
+                return {'count': 0}
+            return {
+                'count': self.total,
+                'mean_ms': self.sum_ms / self.total,
+                'p50_ms': self.percentile(50),
+                'p99_ms': self.percentile(99),
+                'max_ms': self.max_ms,
+                'buckets_ms': dict(zip([str(b) for b in LATENCY_BUCKETS_MS] + ['inf'], self.counts))
+            }
+
+def record_latencies(stamps):
+    """Record per-stage and end-to-end latency for one frame from its monotonic timestamps"""
+    latency['queue'].record(stamps['inference_start'] - stamps['captured'])
+    latency['inference'].record(stamps['inference_end'] - stamps['inference_start'])
+    latency['zone'].record(stamps['zone_end'] - stamps['inference_end'])
+    latency['output'].record(stamps['output_end'] - stamps['zone_end'])
+    latency['end_to_end'].record(stamps['output_end'] - stamps['captured'])
+
+def report_latency():
+    """Log mean and tail latency for every stage"""
+    for name, histogram in latency.items():
+        summary = histogram.summary()
+        if summary['count']:
+            log_message(f"Latency {name}: mean {summary['mean_ms']:.1f} ms, p50 <={summary['p50_ms']:.0f} ms, "
+                        f"p99 <={summary['p99_ms']:.0f} ms, max {summary['max_ms']:.1f} ms")
+
+class Watchdog:
+    """Forces a camera's safe output state when frames stop or end-to-end latency exceeds the SLO"""
+
+    def __init__(self, camera):
+        self.camera = camera
+        now = time.monotonic()
+        self.last_captured = now
+        self.last_completed = now
+        self.last_latency = 0.0
+        self.tripped = False
+        self.healthy_since = now
+        self.trips = 0
+
+    def frame_captured(self, when):
+        self.last_captured = when
+
+    def frame_completed(self, end_to_end):
+        self.last_completed = time.monotonic()
+        self.last_latency = end_to_end
+
+    def fault(self, now):
+        if now - self.last_captured > FRAME_TIMEOUT:
+            return f"no frame captured for {now - self.last_captured:.1f}s"
+        if now - self.last_completed > FRAME_TIMEOUT:
+            return f"no frame completed for {now - self.last_completed:.1f}s"
+        if self.last_latency > LATENCY_SLO:
+            return f"end-to-end latency {1000 * self.last_latency:.0f} ms exceeds {1000 * LATENCY_SLO:.0f} ms"
+        return None
+
+    def run(self):
+        pin_current_thread('output')
+        # Start the timeouts from now, not from startup
+        self.last_captured = self.last_completed = time.monotonic()
+        while not stop_event.wait(WATCHDOG_INTERVAL):
+            now = time.monotonic()
+            fault = self.fault(now)
+            if fault:
+                self.healthy_since = now
+                if not self.tripped:
+                    self.tripped = True
+                    self.trips += 1
+                    log_message(f"ALARM: watchdog tripped ({fault}), forcing safe output state")
+                    set_gpio(GPIO_ALARM, 1)
+                # Re-assert every check in case the output stage is what failed
+                send_serial_data(self.camera, SAFE_OUTPUT_STATE)
+                set_gpio(GPIO_LED, SAFE_OUTPUT_STATE)
+            elif self.tripped and now - self.healthy_since >= WATCHDOG_RECOVERY:
+                self.tripped = False
+                log_message("Watchdog recovered, resuming normal output")
+                set_gpio(GPIO_ALARM, 0)
+
+    def summary(self):
+        return {'tripped': self.tripped, 'trips': self.trips, 'last_end_to_end_ms': 1000 * self.last_latency}
+
+# Layout shared with presence-bus.py: magic, version, node id, boot id, seq, sent time, presence mask, zone count
+PRESENCE_HEADER = struct.Struct('<4sB16sIIdIB')
+
+class ThermalGovernor:
+    """Reads SoC temperature and throttling state, and picks a THERMAL_LEVELS entry ahead of the target.
+
+    The temperature trend over the last readings is projected THERMAL_LOOKAHEAD seconds out, so
+    the load comes down before the target is reached rather than after. The main loop applies the
+    chosen level at a frame boundary.
+    """
+
+    def __init__(self, root, busy):
+        self.root = root
+        self.busy = busy  # callable: True while the detection loop has a frame in work
+        self.readings = deque(maxlen=THERMAL_TREND_WINDOW)
+        self.level = 0
+        self.level_since = time.monotonic()
+        self.temperature = None
+        self.projected = None
+        self.freq_ratio = None
+        self.capped = False
+        self.changes = 0
+        self.seconds_at_level = [0.0] * len(THERMAL_LEVELS)
+        self.last_tick = time.monotonic()
+        self.lock = threading.Lock()
+
+    def read(self, path):
+        with open(os.path.join(self.root, path)) as f:
+            return float(f.read().split()[0])
+
+    def throttled(self):
+        """Firmware throttle flags where the platform exposes them, else None"""
         try:
-            data = b'1' if state else b'0'
-            ser.write(data)
-            log_message(f"Serial data sent: {data.decode()} (Humans detected: {human_count})")
-            last_human_state = state
-        except serial.SerialException as e:
-            log_message(f"Serial write error: {e}")
+            with open(os.path.join(self.root, THERMAL_THROTTLED)) as f:
+                return int(f.read().split()[0], 16)
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def available(self):
+        try:
+            self.read(THERMAL_SENSOR)
+            return True
+        except (OSError, ValueError, IndexError):
+            return False
+
+    def sample(self):
+        now = time.monotonic()
+        try:
+            temperature = self.read(THERMAL_SENSOR) / 1000
+        except (OSError, ValueError, IndexError) as e:
+            log_message(f"Thermal sensor read failed: {e}")
+            return
+        try:
+            freq_ratio = self.read(CPU_FREQ_CURRENT) / self.read(CPU_FREQ_MAX)
+        except (OSError, ValueError, IndexError, ZeroDivisionError):
+            freq_ratio = None  # No cpufreq (e.g. in a container); decide on temperature alone
+        flags = self.throttled()
+        if flags is not None:
+            capped = bool(flags & THROTTLED_NOW)
+        else:
+            # ondemand/schedutil clock an idle CPU down too, so a low frequency only counts while a frame is in work
+            capped = freq_ratio is not None and freq_ratio < FREQ_CAPPED_RATIO and self.busy()
+        self.readings.append((now, temperature))
+        projected = temperature
+        if len(self.readings) >= 3:
+            times, temps = zip(*self.readings)
+            slope = np.polyfit(np.array(times) - times[0], temps, 1)[0]
+            projected = temperature + max(slope, 0.0) * THERMAL_LOOKAHEAD
+
+        with self.lock:
+            self.seconds_at_level[self.level] += now - self.last_tick
+            self.last_tick = now
+            self.temperature, self.projected, self.freq_ratio, self.capped = temperature, projected, freq_ratio, capped
+            if now - self.level_since < THERMAL_MIN_DWELL:
+                return
+            if (projected > THERMAL_TARGET or capped) and self.level < len(THERMAL_LEVELS) - 1:
+                self.set_level(self.level + 1, now, f"projected {projected:.1f}C" + (", CPU frequency capped" if capped else ""))
+            elif projected < THERMAL_TARGET - THERMAL_HYSTERESIS and not capped and self.level > 0:
+                self.set_level(self.level - 1, now, f"projected {projected:.1f}C")
+
+    def set_level(self, level, now, reason):
+        log_message(f"Thermal: {THERMAL_LEVELS[self.level]['name']} -> {THERMAL_LEVELS[level]['name']} "
+                    f"at {self.temperature:.1f}C ({reason}, target {THERMAL_TARGET}C)")
+        self.level = level
+        self.level_since = now
+        self.changes += 1
+
+    def current(self):
+        return THERMAL_LEVELS[self.level]
+
+    def run(self):
+        while not stop_event.wait(THERMAL_INTERVAL):
+            self.sample()
+
+    def summary(self):
+        with self.lock:
+            return {
+                'temperature_c': self.temperature,
+                'projected_c': self.projected,
+                'target_c': THERMAL_TARGET,
+                'cpu_freq_ratio': self.freq_ratio,
+                'cpu_capped': self.capped,
+                'level': THERMAL_LEVELS[self.level]['name'],
+                'level_changes': self.changes,
+                'seconds_at_level': {level['name']: seconds for level, seconds in zip(THERMAL_LEVELS, self.seconds_at_level)}
+            }
+
+model_variants = {}
+
+def apply_thermal_level(level):
+    """Switch input size and model to a THERMAL_LEVELS entry; called between frames"""
+    global INPUT_SIZE, net
+    INPUT_SIZE = level.get('input_size', base_input_size)
+    variant = level.get('model', (PROTOTXT, MODEL))
+    if variant not in model_variants:
+        model_variants[variant] = cv2.dnn.readNetFromCaffe(*variant)
+        if tuning_profile is not None:
+            model_variants[variant].setPreferableBackend(DNN_BACKENDS[tuning_profile['backend']])
+            model_variants[variant].setPreferableTarget(DNN_TARGETS[tuning_profile['target']])
+    net = model_variants[variant]
+
+class PresencePublisher:
+    """Sends compact per-zone presence to the presence hub on change, and as a heartbeat otherwise"""
+
+    def __init__(self, address, node_id):
+        self.address = address
+        self.node_id = node_id.encode()[:16]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)  # A full socket buffer drops a message rather than stall output
+        self.boot = int.from_bytes(os.urandom(4), 'little')  # New per start, so receivers drop the old seq
+        self.seq = 0
+        self.last_mask = None
+        self.last_sent = 0.0
+        self.error_logged = False
+
+    def publish(self, zone_states, zone_counts):
+        mask = 0
+        for i, present in enumerate(zone_states):
+            mask |= bool(present) << i
+        now = time.monotonic()
+        if mask == self.last_mask and now - self.last_sent < PRESENCE_HEARTBEAT:
+            return
+        self.seq = (self.seq + 1) % 2**32
+        message = PRESENCE_HEADER.pack(b'HDPB', 2, self.node_id, self.boot, self.seq, time.time(), mask, len(zone_counts))
+        message += bytes(min(count, 255) for count in zone_counts)
+        try:
+            self.sock.sendto(message, self.address)
+            self.error_logged = False
+        except OSError as e:
+            if not self.error_logged:
+                log_message(f"Presence publish failed: {e}")
+                self.error_logged = True
+        self.last_mask = mask
+        self.last_sent = now
+
+# Shared-memory ring layout, mirrored in detections-subscriber.py: a 64-byte header, then fixed-size
+# records. A record is valid when its 'commit' equals its 'seq' before and after it is copied.
+RING_MAGIC = b'HDRG'
+RING_VERSION = 1
+RING_HEADER = np.dtype([('magic', 'S4'), ('version', '<u4'), ('slots', '<u4'), ('max_boxes', '<u2'),
+                        ('max_zones', '<u2'), ('write_seq', '<u8')])
+RING_HEADER_SIZE = 64
+
+def record_dtype(max_boxes, max_zones):
+    return np.dtype([
+        ('commit', '<u8'),                       # 0 while the writer is filling the slot
+        ('seq', '<u8'),
+        ('timestamp', '<f8'),                    # wall clock, seconds since the epoch
+        ('camera', 'S16'),
+        ('box_count', '<u2'),
+        ('zone_count', '<u2'),
+        ('boxes', '<f4', (max_boxes, 4)),        # x1, y1, x2, y2 as fractions of the frame
+        ('confidences', '<f4', (max_boxes,)),
+        ('zone_ids', '<i2', (max_boxes,)),       # index into the zone counts, -1 outside every zone
+        ('zone_counts', '<u2', (max_zones,))
+    ])
+
+class DetectionRing:
+    """Writes per-frame detections into a shared-memory ring that local subscribers poll.
+
+    The writer never waits for readers: it overwrites the oldest slot, and a reader that
+    falls a full lap behind sees the gap in sequence numbers.
+    """
+
+    def __init__(self, name, slots, max_boxes, max_zones):
+        dtype = record_dtype(max_boxes, max_zones)
+        size = RING_HEADER_SIZE + slots * dtype.itemsize
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a run that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name)
+            stale.unlink()
+            stale.close()
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        self.header = np.ndarray((), RING_HEADER, buffer=self.shm.buf)
+        self.records = np.ndarray((slots,), dtype, buffer=self.shm.buf, offset=RING_HEADER_SIZE)
+        self.records['commit'] = 0
+        self.header['version'] = RING_VERSION
+        self.header['slots'] = slots
+        self.header['max_boxes'] = max_boxes
+        self.header['max_zones'] = max_zones
+        self.header['write_seq'] = 0
+        self.header['magic'] = RING_MAGIC  # Last, so readers never see a half-initialised header
+        self.seq = 0
+
+    def publish(self, result, zone_counts):
+        """Write one frame's record from the people in a FrameResult"""
+        self.seq += 1
+        i = self.seq % len(self.records)
+        r = self.records
+        people = result.person_indices()[:r['boxes'].shape[1]]
+        n = len(people)
+        r['commit'][i] = 0
+        r['seq'][i] = self.seq
+        r['timestamp'][i] = result.timestamp
+        r['camera'][i] = result.camera
+        r['box_count'][i] = n
+        r['boxes'][i, :n] = result.boxes[people]
+        r['confidences'][i, :n] = result.confidences[people]
+        r['zone_ids'][i, :n] = result.zone_ids[people]
+        r['zone_count'][i] = len(zone_counts)
+        r['zone_counts'][i, :len(zone_counts)] = zone_counts
+        r['commit'][i] = self.seq
+        self.header['write_seq'] = self.seq
+
+    def close(self):
+        del self.header, self.records  # Views must go before the mapping can be closed
+        self.shm.close()
+        self.shm.unlink()
+
+class FrameResult:
+    """One camera's detections for a frame, as parallel arrays allocated once and refilled in place.
+
+    Rows are the detections above CONFIDENCE_THRESHOLD (any class); only the first `count`
+    entries of each array are valid. Zone id 0 is the detection area, -1 outside it.
+    """
+
+    __slots__ = ('camera', 'seq', 'timestamp', 'count', 'in_zone', 'boxes', 'pixel_boxes', 'confidences',
+                 'class_ids', 'zone_ids', 'centres', 'people', '_keep', '_inside', '_test', '_scaled', '_scale')
+
+    def __init__(self, camera, capacity=MAX_DETECTIONS):
+        self.camera = camera
+        self.seq = 0
+        self.timestamp = 0.0
+        self.count = 0
+        self.in_zone = 0
+        self.boxes = np.zeros((capacity, 4), dtype=np.float32)        # x1, y1, x2, y2 as fractions of the frame
+        self.pixel_boxes = np.zeros((capacity, 4), dtype=np.int32)
+        self.confidences = np.zeros(capacity, dtype=np.float32)
+        self.class_ids = np.zeros(capacity, dtype=np.int16)
+        self.zone_ids = np.zeros(capacity, dtype=np.int16)
+        self.centres = np.zeros((capacity, 2), dtype=np.float64)       # pixel box centres
+        self.people = np.zeros(capacity, dtype=bool)
+        self._keep = np.zeros(capacity, dtype=bool)
+        self._inside = np.zeros(capacity, dtype=bool)
+        self._test = np.zeros(capacity, dtype=bool)
+        self._scaled = np.zeros((capacity, 4), dtype=np.float64)
+        self._scale = np.zeros(4, dtype=np.float64)
+
+    def fill(self, timestamp, detections, w, h, area):
+        """Refill from an SSD detections array (1, 1, N, 7); `area` is the zone, or None for the whole frame"""
+        rows = detections[0, 0, :len(self.confidences)]
+        keep = self._keep[:len(rows)]
+        np.greater(rows[:, 2], CONFIDENCE_THRESHOLD, out=keep)
+        n = int(np.count_nonzero(keep))
+        self.seq += 1
+        self.timestamp = timestamp
+        self.count = n
+        np.compress(keep, rows[:, 3:7], axis=0, out=self.boxes[:n])
+        np.compress(keep, rows[:, 2], out=self.confidences[:n])
+        np.compress(keep, rows[:, 1], out=self.class_ids[:n])
+        np.equal(self.class_ids[:n], HUMAN_CLASS_ID, out=self.people[:n])
+
+        # Pixel boxes truncated like box.astype("int"), so zone tests match the per-box code
+        self._scale[:] = (w, h, w, h)
+        np.multiply(self.boxes[:n], self._scale, out=self._scaled[:n])
+        np.copyto(self.pixel_boxes[:n], self._scaled[:n], casting='unsafe')
+        np.add(self.pixel_boxes[:n, 0], self.pixel_boxes[:n, 2], out=self.centres[:n, 0])
+        np.add(self.pixel_boxes[:n, 1], self.pixel_boxes[:n, 3], out=self.centres[:n, 1])
+        self.centres[:n] /= 2
+
+        inside, test = self._inside[:n], self._test[:n]
+        if area is None:
+            inside[:] = True
+        else:
+            np.greater_equal(self.centres[:n, 0], w * area['x_start'], out=inside)
+            np.less_equal(self.centres[:n, 0], w * area['x_end'], out=test)
+            inside &= test
+            np.greater_equal(self.centres[:n, 1], h * area['y_start'], out=test)
+            inside &= test
+            np.less_equal(self.centres[:n, 1], h * area['y_end'], out=test)
+            inside &= test
+        self.zone_ids[:n] = -1
+        np.copyto(self.zone_ids[:n], 0, where=inside)
+        np.logical_and(inside, self.people[:n], out=test)
+        self.in_zone = int(np.count_nonzero(test))
+
+    def person_indices(self):
+        return np.flatnonzero(self.people[:self.count])
+
+    def person_centres(self, w, h):
+        """Person box centres as (x, y) fractions of the frame"""
+        return self.centres[self.person_indices()] / (w, h)
+
+class PresenceState:
+    """Presence state machine for one camera, advanced by one FrameResult per frame"""
+
+    __slots__ = ('camera', 'present', 'count', 'since', 'last_detected', 'last_sent')
+
+    def __init__(self, camera):
+        self.camera = camera
+        self.present = False
+        self.count = 0
+        self.since = None           # when `present` last changed
+        self.last_detected = None   # last frame with anyone in the zone
+        self.last_sent = None       # state last written to the serial port
+
+    def update(self, result):
+        """Advance to the result's frame; returns True when presence changed"""
+        self.count = result.in_zone
+        if self.count:
+            self.last_detected = result.timestamp
+        present = self.count >= PRESENCE_MIN_COUNT
+        if present == self.present and self.since is not None:
+            return False
+        self.present = present
+        self.since = result.timestamp
+        return True
+
+class FrameBuffers:
+    """Frame, resize and blob buffers allocated once and reused for every frame"""
+
+    # Capture writes one slot, one waits in the frame queue, inference reads one, the UI shows one
+    SLOTS = 4
+
+    def __init__(self, width, height, input_size):
+        self.slots = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.SLOTS)]
+        self.free = queue.Queue()
+        for i in range(self.SLOTS):
+            self.free.put(i)
+        self.raw = None  # capture-sized frame, adopted from the first read
+        self.scaled = np.empty((height, width, 3), dtype=np.uint8)
+        self.allocate_input(input_size)
+
+    def allocate_input(self, input_size):
+        self.input_size = input_size
+        self.resized = np.empty((input_size, input_size, 3), dtype=np.uint8)
+        self.gray = np.empty((input_size, input_size), dtype=np.uint8)
+        self.hwc = np.empty((input_size, input_size, 3), dtype=np.float32)
+        self.blob = np.empty((1, 3, input_size, input_size), dtype=np.float32)
+
+    def nbytes(self):
+        arrays = self.slots + [self.scaled, self.resized, self.gray, self.hwc, self.blob]
+        return sum(a.nbytes for a in arrays)
+
+# blobFromImage turns the scalar mean 127.5 into Scalar(127.5, 0, 0), so only the first
+# channel is centred; the preallocated path reproduces that to give identical detections
+BLOB_MEAN = np.array([127.5, 0.0, 0.0], dtype=np.float32)
+
+def make_blob(frame):
+    """Network input for `frame`, built in the preallocated buffers when the low-memory profile is on"""
+    if buffers is None:
+        return cv2.dnn.blobFromImage(cv2.resize(frame, (INPUT_SIZE, INPUT_SIZE)), 0.007843, (INPUT_SIZE, INPUT_SIZE), 127.5)
+
+    if buffers.input_size != INPUT_SIZE:
+        buffers.allocate_input(INPUT_SIZE)
+    cv2.resize(frame, (INPUT_SIZE, INPUT_SIZE), dst=buffers.resized)
+    if LOW_MEMORY_GRAYSCALE:
+        cv2.cvtColor(buffers.resized, cv2.COLOR_BGR2GRAY, dst=buffers.gray)
+        cv2.cvtColor(buffers.gray, cv2.COLOR_GRAY2BGR, dst=buffers.resized)
+    # Same arithmetic as blobFromImage: (pixel - mean) * scale, HWC -> NCHW
+    np.subtract(buffers.resized, BLOB_MEAN, out=buffers.hwc, dtype=np.float32)
+    np.multiply(buffers.hwc, 0.007843, out=buffers.hwc)
+    buffers.blob[0] = buffers.hwc.transpose(2, 0, 1)
+    return buffers.blob
+
+def current_rss():
+    """Resident set size in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak_rss()
+
+def peak_rss():
+    """Peak resident set size in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+class MemoryStats:
+    """RSS and per-frame allocation tracking for the low-memory profile"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.allocated = 0
+        self.window_start = time.monotonic()
+        self.alloc_rate = 0.0
+        self.frame_base = 0
+
+    def frame_start(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self.frame_base = tracemalloc.get_traced_memory()[0]
+
+    def frame_end(self):
+        """Count the frame's transient allocations (traced peak above the frame's starting level)"""
+        if not tracemalloc.is_tracing():
+            return
+        allocated = tracemalloc.get_traced_memory()[1] - self.frame_base
+        now = time.monotonic()
+        with self.lock:
+            self.allocated += allocated
+            if now - self.window_start >= 1.0:
+                self.alloc_rate = self.allocated / (now - self.window_start)
+                self.allocated, self.window_start = 0, now
+
+    def summary(self):
+        with self.lock:
+            alloc_rate = self.alloc_rate
+        return {
+            'rss_mb': current_rss() / 2**20,
+            'peak_rss_mb': peak_rss() / 2**20,
+            'budget_mb': LOW_MEMORY_RSS_BUDGET_MB if LOW_MEMORY else None,
+            'alloc_rate_kb_s': alloc_rate / 1024
+        }
+
+def report_memory():
+    """Log RSS, peak RSS and allocation rate, warning when over budget"""
+    summary = memory_stats.summary()
+    log_message(f"Memory: RSS {summary['rss_mb']:.1f} MB, peak {summary['peak_rss_mb']:.1f} MB, "
+                f"allocations {summary['alloc_rate_kb_s']:.1f} KB/s")
+    if LOW_MEMORY and summary['rss_mb'] > LOW_MEMORY_RSS_BUDGET_MB:
+        log_message(f"Warning: RSS {summary['rss_mb']:.1f} MB exceeds the {LOW_MEMORY_RSS_BUDGET_MB} MB budget")
+
+def pin_current_thread(stage):
+    """Restrict the calling thread, and any threads it creates later, to the stage's CPU set"""
+    if not STAGE_AFFINITY or stage not in STAGE_AFFINITY:
+        return
+    if not hasattr(os, 'sched_setaffinity'):
+        log_message(f"Warning: CPU affinity is not supported on this platform, {stage} stage not pinned")
+        return
+    # On Linux, pid 0 applies to the calling thread only
+    try:
+        os.sched_setaffinity(0, STAGE_AFFINITY[stage])
+    except OSError as e:
+        log_message(f"Error pinning {stage} stage to CPUs {sorted(STAGE_AFFINITY[stage])}: {e}")
+        return
+    log_message(f"{stage.capitalize()} stage pinned to CPUs {sorted(STAGE_AFFINITY[stage])}")
+
+class SamplingProfiler:
+    """Wall-clock stack sampler for the pipeline threads, run on demand for a fixed duration"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.threads = {}   # thread ident -> stage name, or the CameraContext of a detection loop
+        self.thread = None
+        self.last_result = None
+
+    def register(self, stage):
+        """Mark the calling thread as a stage; a detection loop passes its camera and reports through camera.stage"""
+        self.threads[threading.get_ident()] = stage
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, duration):
+        """Start sampling in the background; False if a run is already in progress"""
+        with self.lock:
+            if self.running():
+                return False
+            self.thread = threading.Thread(target=self.run, args=(duration,), daemon=True)
+            self.thread.start()
+        log_message(f"Profiler started for {duration:.0f}s")
+        return True
+
+    def run(self, duration):
+        stacks = Counter()
+        stage_samples = Counter()
+        samples = 0
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            frames = sys._current_frames()
+            for ident, stage in list(self.threads.items()):
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                if not isinstance(stage, str):
+                    stage = stage.stage
+                names = []
+                line = frame.f_lineno
+                while frame is not None:
+                    names.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})")
+                    frame = frame.f_back
+                stacks[(stage,) + tuple(reversed(names)), line] += 1
+                stage_samples[stage] += 1
+            del frames
+            samples += 1
+            time.sleep(PROFILE_INTERVAL)
+        self.last_result = self.write(stacks, stage_samples, samples, duration)
+
+    def write(self, stacks, stage_samples, samples, duration):
+        """Write the collapsed stacks and the per-function summary; returns the file paths"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+        with open(base + ".folded", 'w') as f:
+            for (stack, line), count in stacks.most_common():
+                # The leaf frame keeps its line, so hot lines inside a function stay apart
+                f.write(f"{';'.join(stack[:-1])};{stack[-1][:-1]}:{line}) {count}\n")
+
+        own = Counter()
+        total = Counter()
+        for (stack, _), count in stacks.items():
+            own[stack[-1]] += count
+            for name in set(stack[1:]):
+                total[name] += count
+        all_samples = sum(stage_samples.values()) or 1
+        lines = [f"{samples} samples over {duration:.0f}s every {1000 * PROFILE_INTERVAL:.0f} ms "
+                 f"(wall clock: time blocked in queue.get/read is included)", "", "Stage        samples  share"]
+        lines += [f"{stage:<12} {count:>7}  {100 * count / all_samples:5.1f}%" for stage, count in stage_samples.most_common()]
+        lines += ["", f"{'self':>7} {'total':>7}  function"]
+        lines += [f"{100 * count / all_samples:6.1f}% {100 * total[name] / all_samples:6.1f}%  {name}"
+                  for name, count in own.most_common(PROFILE_TOP)]
+        with open(base + ".txt", 'w') as f:
+            f.write("\n".join(lines) + "\n")
+
+        log_message(f"Profile written to {base}.folded and {base}.txt; stages: " +
+                    ", ".join(f"{stage} {100 * count / all_samples:.0f}%" for stage, count in stage_samples.most_common()))
+        return {'folded': base + ".folded", 'summary': base + ".txt"}
+
+def start_profile_on_signal(signum, frame):
+    profiler.start(PROFILE_DURATION)
+
+class StageStats:
+    """CPU usage and scheduling jitter of one pipeline stage, recorded by the stage's own thread"""
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=1000)
+        self.items = 0
+        self.cpu_percent = 0.0
+        self.cpu_start = None
+        self.wall_start = None
+
+    def record(self, latency):
+        """Record how late the stage picked up its latest item (seconds)"""
+        now = time.monotonic()
+        cpu = time.thread_time()
+        with self.lock:
+            self.latencies.append(latency)
+            self.items += 1
+            if self.cpu_start is None:
+                self.cpu_start, self.wall_start = cpu, now
+            elif now - self.wall_start >= 1.0:
+                self.cpu_percent = 100.0 * (cpu - self.cpu_start) / (now - self.wall_start)
+                self.cpu_start, self.wall_start = cpu, now
+
+    def summary(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            items, cpu_percent = self.items, self.cpu_percent
+        if not latencies:
+            return {'items': items, 'cpu_percent': cpu_percent}
+        return {
+            'items': items,
+            'cpu_percent': cpu_percent,
+            'jitter_p50_ms': 1000 * latencies[len(latencies) // 2],
+            'jitter_p99_ms': 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+            'jitter_max_ms': 1000 * latencies[-1]
+        }
+
+def report_stages():
+    """Log per-stage CPU usage and scheduling jitter"""
+    for name, stats in stage_stats.items():
+        summary = stats.summary()
+        if 'jitter_p99_ms' in summary:
+            log_message(f"Stage {name}: CPU {summary['cpu_percent']:.0f}%, jitter p50 {summary['jitter_p50_ms']:.1f} ms, "
+                        f"p99 {summary['jitter_p99_ms']:.1f} ms, max {summary['jitter_max_ms']:.1f} ms")
+
+class RollingWindow:
+    """Ring of time buckets holding occupancy totals for one window (e.g. the last hour)"""
+
+    def __init__(self, seconds, buckets):
+        self.bucket_seconds = seconds / buckets
+        self.count_seconds = [0.0] * buckets   # integral of human count over time
+        self.max_count = [0] * buckets
+        self.occupied_seconds = [0.0] * buckets
+        self.elapsed_seconds = [0.0] * buckets
+        self.visits = [0] * buckets
+        self.current = None
+
+    def _advance(self, now):
+        """Move to the bucket for `now`, clearing buckets that fell out of the window"""
+        bucket = int(now // self.bucket_seconds)
+        if self.current is None:
+            self.current = bucket
+            return
+        # Never more than one lap of the ring, so this stays O(1) per frame
+        for step in range(1, min(bucket - self.current, len(self.visits)) + 1):
+            i = (self.current + step) % len(self.visits)
+            self.count_seconds[i] = 0.0
+            self.max_count[i] = 0
+            self.occupied_seconds[i] = 0.0
+            self.elapsed_seconds[i] = 0.0
+            self.visits[i] = 0
+        self.current = max(self.current, bucket)
+
+    def add(self, now, dt, count, entered):
+        self._advance(now)
+        i = self.current % len(self.visits)
+        self.count_seconds[i] += count * dt
+        self.max_count[i] = max(self.max_count[i], count)
+        self.elapsed_seconds[i] += dt
+        if count > 0:
+            self.occupied_seconds[i] += dt
+        if entered:
+            self.visits[i] += 1
+
+    def summary(self, now):
+        self._advance(now)
+        elapsed = sum(self.elapsed_seconds)
+        occupied = sum(self.occupied_seconds)
+        visits = sum(self.visits)
+        return {
+            'mean_count': sum(self.count_seconds) / elapsed if elapsed else 0.0,
+            'max_count': max(self.max_count),
+            'time_in_zone': occupied,
+            'occupancy_ratio': occupied / elapsed if elapsed else 0.0,
+            'visits': visits,
+            'mean_dwell': occupied / visits if visits else 0.0
+        }
+
+class OccupancyStats:
+    """Incrementally updated per-zone occupancy statistics and position heatmap"""
+
+    def __init__(self, zone_names):
+        self.lock = threading.Lock()
+        self.windows = {zone: {name: RollingWindow(seconds, STATS_BUCKETS)
+                               for name, seconds in STATS_WINDOWS.items()}
+                        for zone in zone_names}
+        self.dwell_start = {zone: None for zone in zone_names}
+        self.heatmap = np.zeros(HEATMAP_GRID, dtype=np.float64)
+        self.last_update = None
+
+    def update(self, zone_counts, centres):
+        """Add one frame: human count per zone and normalised (x, y) person centres"""
+        now = time.monotonic()
+        with self.lock:
+            dt = 0.0 if self.last_update is None else now - self.last_update
+            self.last_update = now
+
+            for zone, count in zone_counts.items():
+                entered = count > 0 and self.dwell_start[zone] is None
+                if entered:
+                    self.dwell_start[zone] = now
+                elif count == 0:
+                    self.dwell_start[zone] = None
+                for window in self.windows[zone].values():
+                    window.add(now, dt, count, entered)
+
+            rows, cols = HEATMAP_GRID
+            for x, y in centres:
+                self.heatmap[min(max(int(y * rows), 0), rows - 1), min(max(int(x * cols), 0), cols - 1)] += 1
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            return {zone: {
+                'current_dwell': now - self.dwell_start[zone] if self.dwell_start[zone] is not None else 0.0,
+                'windows': {name: window.summary(now) for name, window in windows.items()}
+            } for zone, windows in self.windows.items()}
+
+    def heatmap_png(self):
+        with self.lock:
+            peak = self.heatmap.max()
+            scaled = (self.heatmap * (255.0 / peak) if peak else self.heatmap).astype(np.uint8)
+        image = cv2.applyColorMap(cv2.resize(scaled, (640, 480), interpolation=cv2.INTER_NEAREST), cv2.COLORMAP_JET)
+        return cv2.imencode('.png', image)[1].tobytes()
+
+class StatsRequestHandler(BaseHTTPRequestHandler):
+    """Serve /stats (JSON) and /heatmap.png from the live statistics"""
+
+    def do_GET(self):
+        if self.path == '/stats':
+            body = json.dumps(camera.occupancy.snapshot(), indent=2).encode()
+            content_type = 'application/json'
+        elif self.path == '/heatmap.png':
+            body = camera.occupancy.heatmap_png()
+            content_type = 'image/png'
+        elif self.path == '/stages':
+            body = json.dumps({name: stats.summary() for name, stats in stage_stats.items()}, indent=2).encode()
+            content_type = 'application/json'
+        elif self.path == '/latency':
+            body = json.dumps({'stages': {name: h.summary() for name, h in latency.items()},
+                               'watchdog': camera.watchdog.summary()}, indent=2).encode()
+            content_type = 'application/json'
+        elif self.path == '/memory':
+            body = json.dumps(memory_stats.summary(), indent=2).encode()
+            content_type = 'application/json'
+        elif self.path == '/escalation':
+            body = json.dumps(escalation.summary(), indent=2).encode()
+            content_type = 'application/json'
+        elif self.path == '/thermal' and thermal is not None:
+            body = json.dumps(thermal.summary(), indent=2).encode()
+            content_type = 'application/json'
+        elif self.path == '/profile':
+            body = json.dumps({'running': profiler.running(), 'last': profiler.last_result}, indent=2).encode()
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_body(200, body, content_type)
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path != '/profile':
+            self.send_error(404)
+            return
+        try:
+            duration = float(urllib.parse.parse_qs(url.query).get('seconds', [PROFILE_DURATION])[0])
+        except ValueError:
+            self.send_error(400, "seconds must be a number")
+            return
+        started = profiler.start(duration)
+        body = json.dumps({'started': started, 'seconds': duration}).encode()
+        self.send_body(202 if started else 409, body, 'application/json')
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep request logs out of the detection log
+
+def start_stats_server(port):
+    """Serve live statistics from a background thread so queries never block detection"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StatsRequestHandler)
+
+    def serve():
+        pin_current_thread('output')
+        server.serve_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    log_message(f"Stats available at http://127.0.0.1:{port}/stats and /heatmap.png")
+    return server
 
 def draw_buttons(frame):
     """Draw interactive buttons on the frame"""
@@ -177,122 +1392,623 @@ def draw_buttons(frame):
         # Draw button text
         cv2.putText(frame, btn['text'], (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
 
-def detect_humans(frame):
-    global human_count
+inference = InferenceClient(INFERENCE_SERVER_URL, INFERENCE_TIMEOUT, INFERENCE_RETRY_INTERVAL)
+
+class EscalationStats:
+    """Counts how often frames are escalated to a crop pass and what it costs"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.escalated_frames = 0
+        self.regions = 0
+        self.promoted = 0   # below CONFIDENCE_THRESHOLD before, above after
+        self.rejected = 0   # above before, below after
+        self.base_seconds = 0.0
+        self.extra_seconds = 0.0
+
+    def record(self, base_seconds, extra_seconds, regions, promoted, rejected):
+        with self.lock:
+            self.frames += 1
+            self.base_seconds += base_seconds
+            if regions:
+                self.escalated_frames += 1
+                self.regions += regions
+                self.promoted += promoted
+                self.rejected += rejected
+                self.extra_seconds += extra_seconds
+
+    def summary(self):
+        with self.lock:
+            if not self.frames:
+                return {'frames': 0}
+            return {
+                'frames': self.frames,
+                'escalation_rate': self.escalated_frames / self.frames,
+                'regions': self.regions,
+                'promoted': self.promoted,
+                'rejected': self.rejected,
+                'extra_ms_per_escalated_frame': 1000 * self.extra_seconds / self.escalated_frames if self.escalated_frames else 0.0,
+                'extra_cost_ratio': self.extra_seconds / self.base_seconds if self.base_seconds else 0.0
+            }
+
+escalation = EscalationStats()
+
+def report_escalation():
+    summary = escalation.summary()
+    if summary['frames']:
+        log_message(f"Escalation: {100 * summary['escalation_rate']:.1f}% of frames, {summary['regions']} crop(s), "
+                    f"+{summary['extra_ms_per_escalated_frame']:.1f} ms per escalated frame "
+                    f"(+{100 * summary['extra_cost_ratio']:.1f}% inference time), "
+                    f"{summary['promoted']} promoted, {summary['rejected']} rejected")
+
+def box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def escalate_ambiguous(frame, detections, area):
+    """Re-run people with ambiguous confidence in or near `area` (None: anywhere) on a crop of the frame.
+
+    The crop is resized to the same network input as the full frame, so a person fills far
+    more of it; their confidence and box are replaced by the best matching crop detection,
+    or the confidence drops to 0 when the crop finds no one there. Returns the (possibly
+    copied) detections, the number of crops run and how many people were promoted over
+    and rejected under CONFIDENCE_THRESHOLD.
+    """
+    if ESCALATION_BAND is None or not detections.shape[2]:
+        return detections, 0, 0, 0
+
+    rows = detections[0, 0]
+    low, high = ESCALATION_BAND
+    ambiguous = (rows[:, 1] == HUMAN_CLASS_ID) & (rows[:, 2] >= low) & (rows[:, 2] <= high)
+    if area is not None:
+        cx = (rows[:, 3] + rows[:, 5]) / 2
+        cy = (rows[:, 4] + rows[:, 6]) / 2
+        ambiguous &= ((cx >= area['x_start'] - ESCALATION_NEAR_MARGIN) &
+                      (cx <= area['x_end'] + ESCALATION_NEAR_MARGIN) &
+                      (cy >= area['y_start'] - ESCALATION_NEAR_MARGIN) &
+                      (cy <= area['y_end'] + ESCALATION_NEAR_MARGIN))
+    candidates = np.flatnonzero(ambiguous)
+    if not len(candidates):
+        return detections, 0, 0, 0
+
+    (h, w) = frame.shape[:2]
+    detections = detections.copy()
+    rows = detections[0, 0]
+    regions = promoted = rejected = 0
+    for i in candidates[np.argsort(-rows[candidates, 2])][:ESCALATION_MAX_REGIONS]:
+        x1, y1, x2, y2 = rows[i, 3:7]
+        pad_x, pad_y = (x2 - x1) * ESCALATION_PADDING, (y2 - y1) * ESCALATION_PADDING
+        cx1, cy1 = int(max(0.0, x1 - pad_x) * w), int(max(0.0, y1 - pad_y) * h)
+        cx2, cy2 = int(min(1.0, x2 + pad_x) * w), int(min(1.0, y2 + pad_y) * h)
+        if cx2 - cx1 < ESCALATION_MIN_CROP or cy2 - cy1 < ESCALATION_MIN_CROP:
+            continue
+        crop = frame[cy1:cy2, cx1:cx2]
+        net.setInput(cv2.dnn.blobFromImage(cv2.resize(crop, (INPUT_SIZE, INPUT_SIZE)), 0.007843,
+                                           (INPUT_SIZE, INPUT_SIZE), 127.5))
+        refined = net.forward()[0, 0]
+        regions += 1
+
+        # Crop detections back to full-frame fractions
+        people = refined[refined[:, 1] == HUMAN_CLASS_ID]
+        scale = np.array([cx2 - cx1, cy2 - cy1, cx2 - cx1, cy2 - cy1]) / np.array([w, h, w, h])
+        offset = np.array([cx1, cy1, cx1, cy1]) / np.array([w, h, w, h])
+        best_confidence, best_box = 0.0, None
+        for person in people:
+            box = person[3:7] * scale + offset
+            if person[2] > best_confidence and box_iou(box, rows[i, 3:7]) >= ESCALATION_MATCH_IOU:
+                best_confidence, best_box = float(person[2]), box
+
+        was_accepted = bool(rows[i, 2] > CONFIDENCE_THRESHOLD)
+        rows[i, 2] = best_confidence
+        if best_box is not None:
+            rows[i, 3:7] = best_box
+        promoted += int(not was_accepted and best_confidence > CONFIDENCE_THRESHOLD)
+        rejected += int(was_accepted and best_confidence <= CONFIDENCE_THRESHOLD)
+    return detections, regions, promoted, rejected
+
+class HazardRules:
+    """HAZARD_RULES compiled to arrays and evaluated for all rules and detections at once"""
+
+    def __init__(self, rules, zones):
+        self.names = [rule['name'] for rule in rules]
+        for name in self.names:
+            if name in BUILTIN_OUTPUTS:
+                raise ValueError(f"hazard rule name '{name}' is reserved for a built-in output")
+            if self.names.count(name) > 1:
+                raise ValueError(f"hazard rule name '{name}' is used more than once")
+        self.zone_names = sorted({rule['zone'] for rule in rules})
+        for zone in self.zone_names:
+            if zone != 'detection_area' and zone not in zones:
+                raise ValueError(f"hazard rule zone '{zone}' is not in HAZARD_ZONES")
+        self.zones = zones
+        self.rule_zone = np.array([self.zone_names.index(rule['zone']) for rule in rules], dtype=np.intp)
+        self.classes = np.zeros((len(rules), len(VOC_CLASSES)), dtype=bool)
+        for r, rule in enumerate(rules):
+            if rule.get('classes') is None:
+                self.classes[r, 1:] = True
+            else:
+                self.classes[r, [VOC_CLASSES.index(name) for name in rule['classes']]] = True
+        self.confidence = np.array([rule.get('confidence', CONFIDENCE_THRESHOLD) for rule in rules], dtype=np.float32)
+        self.min_count = np.array([rule.get('min_count', 1) for rule in rules])
+        self.moving = np.array([rule.get('moving', False) for rule in rules], dtype=bool)
+        self.stop = np.array([rule.get('stop', False) for rule in rules], dtype=bool)
+        self.fired = np.zeros(len(rules), dtype=bool)
+        self.previous_gray = None
+
+    def zone_bounds(self, detection_area):
+        """(zones, 4) array of x_start, y_start, x_end, y_end, with the frame's detection area (None: whole frame)"""
+        bounds = np.empty((len(self.zone_names), 4), dtype=np.float32)
+        for z, name in enumerate(self.zone_names):
+            if name == 'detection_area':
+                area = detection_area if detection_area is not None else \
+                    {'x_start': 0, 'y_start': 0, 'x_end': 1, 'y_end': 1}
+            else:
+                area = self.zones[name]
+            bounds[z] = (area['x_start'], area['y_start'], area['x_end'], area['y_end'])
+        return bounds
+
+    def motion(self, frame, boxes):
+        """Fraction of each box (normalised x1, y1, x2, y2) that changed since the previous frame"""
+        small = cv2.cvtColor(cv2.resize(frame, HAZARD_MOTION_SIZE), cv2.COLOR_BGR2GRAY)
+        previous, self.previous_gray = self.previous_gray, small
+        if previous is None:
+            return np.zeros(len(boxes), dtype=np.float32)
+        changed = (cv2.absdiff(small, previous) > HAZARD_MOTION_DELTA).astype(np.uint8)
+        integral = cv2.integral(changed)
+        mw, mh = HAZARD_MOTION_SIZE
+        xs = np.clip(np.rint(boxes[:, [0, 2]] * mw), 0, mw).astype(np.intp)
+        ys = np.clip(np.rint(boxes[:, [1, 3]] * mh), 0, mh).astype(np.intp)
+        inside = (integral[ys[:, 1], xs[:, 1]] - integral[ys[:, 0], xs[:, 1]]
+                  - integral[ys[:, 1], xs[:, 0]] + integral[ys[:, 0], xs[:, 0]])
+        area = np.maximum((xs[:, 1] - xs[:, 0]) * (ys[:, 1] - ys[:, 0]), 1)
+        return inside / area
+
+    def evaluate(self, frame, detections, detection_area):
+        """Match every detection against every rule; returns {rule name: fired} and the (rules, N) hit matrix"""
+        rows = detections[0, 0]
+        class_ids = np.clip(rows[:, 1].astype(np.intp), 0, len(VOC_CLASSES) - 1)
+        cx = (rows[:, 3] + rows[:, 5]) / 2
+        cy = (rows[:, 4] + rows[:, 6]) / 2
+        bounds = self.zone_bounds(detection_area)
+        in_zone = ((cx >= bounds[:, 0:1]) & (cx <= bounds[:, 2:3]) &
+                   (cy >= bounds[:, 1:2]) & (cy <= bounds[:, 3:4]))            # (zones, N)
+        hits = (self.classes[:, class_ids] &                                     # (rules, N)
+                (rows[:, 2] > self.confidence[:, None]) &
+                in_zone[self.rule_zone])
+        if self.moving.any():
+            moving = self.motion(frame, rows[:, 3:7]) >= HAZARD_MOTION_MIN_FRACTION
+            hits &= moving | ~self.moving[:, None]
+        fired = hits.sum(axis=1) >= self.min_count
+
+        for r in np.flatnonzero(fired != self.fired):
+            log_message(f"Hazard {self.names[r]}: {'triggered' if fired[r] else 'cleared'}")
+        self.fired = fired
+        return dict(zip(self.names, fired.tolist())), hits
+
+    def stop_triggered(self):
+        return bool((self.fired & self.stop).any())
+
+class CameraContext:
+    """Everything one camera carries from frame to frame: detections, presence, tracks, hazard
+    rules, statistics and its output queue. detect_humans, output_loop and send_serial_data work
+    on the context they are given, so cameras in one process never share state."""
+
+    def __init__(self, camera_id, output_queue, ring=None):
+        self.camera = camera_id
+        self.result = FrameResult(camera_id)
+        self.state = PresenceState(camera_id)
+        self.predictor = ZoneEntryPredictor()
+        self.hazard_rules = HazardRules(HAZARD_RULES, HAZARD_ZONES) if HAZARD_RULES else None
+        self.occupancy = OccupancyStats(['detection_area'])
+        self.watchdog = Watchdog(self)
+        self.output_queue = output_queue
+        self.ring = ring            # DetectionRing, shared by cameras; records carry the camera id
+        self.stage = 'waiting'      # detection loop stage, for the profiler and thermal governor
+
+def detect_humans(camera, frame, stamps, config):
+    """Detect, decide and annotate one of `camera`'s frames; `config` is the ZoneConfig snapshot taken for it"""
+    result, hazard_rules = camera.result, camera.hazard_rules
     
     (h, w) = frame.shape[:2]
-    blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 0.007843, (300, 300), 127.5)
+    area = config.area if config.zone_enabled else None
+    stamps['inference_start'] = time.monotonic()
+    detections = inference.detections(frame)
+    if detections is None:
+        net.setInput(make_blob(frame))
+        detections = net.forward()
+    base_end = time.monotonic()
+    detections, regions, promoted, rejected = escalate_ambiguous(frame, detections, area)
+    stamps['inference_end'] = time.monotonic()
+    escalation.record(base_end - stamps['inference_start'], stamps['inference_end'] - base_end,
+                      regions, promoted, rejected)
+    hazards, hazard_hits = hazard_rules.evaluate(frame, detections, area) if hazard_rules is not None else ({}, None)
+    camera.stage = 'drawing'
     
-    net.setInput(blob)
-    detections = net.forward()
+    result.fill(time.time(), detections, w, h, area)
+    camera.state.update(result)
     
-    human_count = 0
+    # Draw detection area rectangle if enabled (the UI draws a zone being dragged on top)
+    if area is not None:
+        x1 = int(w * area['x_start'])
+        y1 = int(h * area['y_start'])
+        x2 = int(w * area['x_end'])
+        y2 = int(h * area['y_end'])
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
+        cv2.putText(frame, "Detection Zone", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
     
-    # Draw detection area rectangle if enabled
-    if zone_enabled:
-        x1 = int(w * DETECTION_AREA['x_start'])
-        y1 = int(h * DETECTION_AREA['y_start'])
-        x2 = int(w * DETECTION_AREA['x_end'])
-        y2 = int(h * DETECTION_AREA['y_end'])
-        
-        # Draw the rectangle being defined
-        if drawing:
-            cv2.rectangle(frame, start_point, end_point, (0, 255, 255), 2)
+    for i in result.person_indices():
+        (startX, startY, endX, endY) = result.pixel_boxes[i]
+        if result.zone_ids[i] >= 0:
+            cv2.rectangle(frame, (startX, startY), (endX, endY), (0, 255, 0), 2)
+            label = f"Person: {result.confidences[i] * 100:.2f}%"
+            cv2.putText(frame, label, (startX, startY - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
         else:
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
-            cv2.putText(frame, "Detection Zone", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+            cv2.rectangle(frame, (startX, startY), (endX, endY), (200, 200, 200), 1)
     
-    for i in range(detections.shape[2]):
-        confidence = detections[0, 0, i, 2]
-        
-        if confidence > CONFIDENCE_THRESHOLD:
-            class_id = int(detections[0, 0, i, 1])
-            
-            if class_id == HUMAN_CLASS_ID:
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (startX, startY, endX, endY) = box.astype("int")
-                
-                if is_in_detection_area((startX, startY, endX, endY), w, h):
-                    human_count += 1
-                    cv2.rectangle(frame, (startX, startY), (endX, endY), (0, 255, 0), 2)
-                    label = f"Person: {confidence * 100:.2f}%"
-                    cv2.putText(frame, label, (startX, startY - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                else:
-                    cv2.rectangle(frame, (startX, startY), (endX, endY), (200, 200, 200), 1)
+    if hazard_hits is not None:
+        # Non-person objects that set off a rule; people are already drawn above
+        for i in np.flatnonzero(hazard_hits.any(axis=0) & (detections[0, 0, :, 1] != HUMAN_CLASS_ID)):
+            (startX, startY, endX, endY) = (detections[0, 0, i, 3:7] * np.array([w, h, w, h])).astype("int")
+            cv2.rectangle(frame, (startX, startY), (endX, endY), (0, 140, 255), 2)
+            cv2.putText(frame, VOC_CLASSES[int(detections[0, 0, i, 1])], (startX, startY - 15),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 140, 255), 2)
+        fired = [name for name, on in hazards.items() if on]
+        if fired:
+            cv2.putText(frame, f"HAZARD: {', '.join(fired)}", (20, h - 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+    
+    if camera.ring is not None:
+        camera.ring.publish(result, [result.in_zone])
     
-    # Send serial data based on detection (1 if more than 1 human detected)
-    send_serial_data(human_count > 1)
-    set_gpio(GPIO_LED, human_count > 1)  # Set GPIO LED state based on detection
+    centres = result.person_centres(w, h)
+    # No zone, nothing to enter: drop the tracks so re-enabling starts from fresh ones
+    entry_eta = None
+    if area is None:
+        camera.predictor.reset()
+    else:
+        entry_eta = camera.predictor.update(centres, stamps['inference_end'], area)
+    if entry_eta is not None:
+        cv2.putText(frame, f"PRE-WARNING: zone entry in {entry_eta:.1f}s", (20, h - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
+    
+    stamps['zone_end'] = time.monotonic()
+    camera.occupancy.update({'detection_area': result.in_zone}, centres)
+    
+    # Hand the output state to the output stage (1 if enough people are in the zone or a stop rule fired)
+    state = camera.state.present or (hazard_rules is not None and hazard_rules.stop_triggered())
+    camera.output_queue.put((state, result.in_zone, entry_eta, hazards, stamps))
     
     return frame
 
-# Connect to webcam
-cap = cv2.VideoCapture(WEBCAM_INDEX)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-cap.set(cv2.CAP_PROP_FPS, 15)
-
-if not cap.isOpened():
-    log_message("Error: Could not open webcam")
-    exit()
-
-# Create window and set mouse callback
-cv2.namedWindow('Human Detection with Serial Output')
-# Pass the initial frame to mouse_callback so it can get frame dimensions immediately
-ret, initial_frame = cap.read()
-if ret:
-    cv2.setMouseCallback('Human Detection with Serial Output', mouse_callback, initial_frame)
-else:
-    log_message("Warning: Could not read initial frame for mouse callback setup. Mouse interaction might be affected.")
+def capture_loop(camera):
+    """Capture stage: keep only the newest frame so inference never works on a stale one"""
+    global cap
+    pin_current_thread('capture')
+    profiler.register('capture')
+    if CAPTURE_THREADS:
+        os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = f"threads;{CAPTURE_THREADS}"
 
+    # Opened here so decoder threads inherit the capture CPU set
+    cap = cv2.VideoCapture(WEBCAM_INDEX)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640 if buffers is None else buffers.slots[0].shape[1])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480 if buffers is None else buffers.slots[0].shape[0])
+    cap.set(cv2.CAP_PROP_FPS, 15)
+    if CAPTURE_BUFFER_SIZE is not None:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, CAPTURE_BUFFER_SIZE)
+    capture_ready.set()
+    if not cap.isOpened():
+        return
 
-log_message("System started. Monitoring for humans...")
-
-try:
-    while True:
-        ret, frame = cap.read()
+    frame_interval = 1.0 / 15
+    last_read = None
+    while not stop_event.is_set():
+        if buffers is None:
+            ret, frame = cap.read()
+        else:
+            # Decode into the same buffer every time once its size is known
+            ret, buffers.raw = cap.read(buffers.raw)
+        now = time.monotonic()
         if not ret:
             log_message("Error reading frame from webcam")
             time.sleep(1)
+            last_read = None
             continue
-        
-        frame = cv2.flip(frame, 1)
-        processed_frame = detect_humans(frame)
-        
-        # Display status text
-        status_text = f"DETECTED: {human_count} (Sending {'1' if human_count > 1 else '0'})"
-        status_color = (0, 255, 0) if human_count > 1 else (0, 0, 255)
-        cv2.putText(processed_frame, status_text, (20, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
-        
-        # Display zone status
-        zone_status = "ZONE: ENABLED" if zone_enabled else "ZONE: DISABLED"
-        zone_color = (0, 255, 0) if zone_enabled else (0, 0, 255)
-        cv2.putText(processed_frame, zone_status, (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, zone_color, 2)
-        
-        # Draw buttons
-        draw_buttons(processed_frame)
-        
-        cv2.imshow('Human Detection with Serial Output', processed_frame)
+        camera.watchdog.frame_captured(now)
+        if last_read is not None:
+            # Jitter: how far the frame arrived past the nominal frame interval
+            stage_stats['capture'].record(max(0.0, now - last_read - frame_interval))
+        last_read = now
+
+        slot = None
+        if buffers is not None:
+            # Scale and mirror into a free ring slot; inference then skips its own flip
+            slot = buffers.free.get()
+            frame = buffers.slots[slot]
+            source = buffers.raw
+            if source.shape != frame.shape:
+                source = cv2.resize(source, (frame.shape[1], frame.shape[0]), dst=buffers.scaled)
+            cv2.flip(source, 1, dst=frame)
+
+        try:
+            _, _, dropped = frame_queue.get_nowait()  # Drop the unprocessed frame
+            if dropped is not None:
+                buffers.free.put(dropped)
+        except queue.Empty:
+            pass
+        frame_queue.put((frame, now, slot))
+
+def output_loop(camera):
+    """Output stage for one camera: serial and GPIO writes, off the inference thread"""
+    pin_current_thread('output')
+    profiler.register('output')
+    watchdog = camera.watchdog
+    warning = False
+    while True:
+        item = camera.output_queue.get()
+        if item is None:
+            break
+        state, count, entry_eta, hazards, stamps = item
+        stage_stats['output'].record(time.monotonic() - stamps['zone_end'])
+        if watchdog.tripped:
+            state = SAFE_OUTPUT_STATE  # Hold the safe state until the watchdog recovers
+        if (entry_eta is not None and not state) != warning:
+            warning = not warning
+            log_message(f"Pre-warning: person predicted to enter zone in {entry_eta:.1f}s" if warning
+                        else "Pre-warning cleared")
+        zone_states = None if watchdog.tripped else {'detection_area': state, 'prewarning': warning, **hazards}
+        send_serial_data(camera, PREWARNING_LEVEL if PREWARNING_SERIAL and warning else state, count, zone_states)
+        set_gpio(GPIO_LED, state)  # Set GPIO LED state based on detection
+        set_gpio(GPIO_PREWARNING, warning)
+        if presence is not None:
+            presence.publish([state], [count])
+        stamps['output_end'] = time.monotonic()
+        record_latencies(stamps)
+        watchdog.frame_completed(stamps['output_end'] - stamps['captured'])
+
+def show_frame(frame, slot):
+    """Hand an annotated frame to the UI, replacing one it has not shown yet"""
+    try:
+        _, dropped = display_queue.get_nowait()
+        if dropped is not None:
+            buffers.free.put(dropped)
+    except queue.Empty:
+        pass
+    display_queue.put((frame, slot))
+
+def detection_loop(camera):
+    """Inference stage for one camera: detection, zone logic and annotation, never waiting on the UI.
+
+    The zone settings are read once per frame from `ui_config.current`, so an edit made
+    while a frame is in flight applies from the next frame.
+    """
+    pin_current_thread('inference')
+    profiler.register(camera)
+    thermal_level = THERMAL_LEVELS[0]
+    last_inference = 0.0
+    last_stage_report = time.monotonic()
+    last_memory_report = time.monotonic()
+    try:
+        while not stop_event.is_set():
+            camera.stage = 'waiting'
+            try:
+                frame, captured_at, slot = frame_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            camera.stage = 'inference'
+            if thermal is not None:
+                if thermal.current() is not thermal_level:
+                    thermal_level = thermal.current()
+                    apply_thermal_level(thermal_level)
+                if time.monotonic() - last_inference < thermal_level.get('frame_interval', 0):
+                    if slot is not None:
+                        buffers.free.put(slot)
+                    continue  # Reduced cadence: let this frame go
+                last_inference = time.monotonic()
+            stage_stats['inference'].record(time.monotonic() - captured_at)
+            stamps = {'captured': captured_at}
+            config = ui_config.current
+            memory_stats.frame_start()
+            
+            # The slot goes back to the pool unless show_frame passed it on to the UI
+            shown = False
+            try:
+                if slot is None:
+                    frame = cv2.flip(frame, 1)
+                processed_frame = detect_humans(camera, frame, stamps, config)
+                
+                # Display status text
+                status_text = f"DETECTED: {camera.state.count} (Sending {'1' if camera.state.present else '0'})"
+                status_color = (0, 255, 0) if camera.state.present else (0, 0, 255)
+                cv2.putText(processed_frame, status_text, (20, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
+                
+                # Display zone status
+                zone_status = "ZONE: ENABLED" if config.zone_enabled else "ZONE: DISABLED"
+                zone_color = (0, 255, 0) if config.zone_enabled else (0, 0, 255)
+                cv2.putText(processed_frame, zone_status, (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, zone_color, 2)
+                
+                show_frame(processed_frame, slot)
+                shown = True
+            finally:
+                if slot is not None and not shown:
+                    buffers.free.put(slot)
+            memory_stats.frame_end()
+            
+            if LOW_MEMORY and time.monotonic() - last_memory_report >= MEMORY_REPORT_INTERVAL:
+                report_memory()
+                last_memory_report = time.monotonic()
+            
+            if time.monotonic() - last_stage_report >= STAGE_REPORT_INTERVAL:
+                report_stages()
+                report_latency()
+                report_escalation()
+                last_stage_report = time.monotonic()
+    finally:
+        stop_event.set()  # Take the UI down with it rather than show a frozen frame
+
+def ui_loop():
+    """UI stage, on the main thread where HighGUI keeps the window: show the newest frame,
+    pump mouse and key events, and publish zone edits through ui_config"""
+    profiler.register('ui')
+    while not stop_event.is_set():
+        try:
+            frame, slot = display_queue.get(timeout=UI_POLL_INTERVAL)
+        except queue.Empty:
+            frame = None
+        if frame is not None:
+            # Draw the rectangle being defined
+            if drawing:
+                cv2.rectangle(frame, start_point, end_point, (0, 255, 255), 2)
+            draw_buttons(frame)
+            cv2.imshow(WINDOW_NAME, frame)
+            if slot is not None:
+                buffers.free.put(slot)
         
         # Handle keyboard events
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):
             break
         elif key == ord('d'):
-            zone_enabled = not zone_enabled
-            log_message(f"Detection zone {'enabled' if zone_enabled else 'disabled'}")
-        
-        # Removed the problematic mouse_x/mouse_y checks here
-        # Button clicks are now handled exclusively within mouse_callback
-
-except KeyboardInterrupt:
-    log_message("System stopped by user")
-
-finally:
-    cap.release()
-    cv2.destroyAllWindows()
-    if ser is not None:
-        send_serial_data(0) # Ensure serial state is reset on exit
-        set_gpio(GPIO_LED, 0) # Turn off GPIO LED
-        ser.close()
-    log_message("System shutdown")
\ No newline at end of file
+            config = ui_config.publish(zone_enabled=not ui_config.current.zone_enabled)
+            log_message(f"Detection zone {'enabled' if config.zone_enabled else 'disabled'}")
+
+# Importable for the harnesses (equivalence-harness.py); the detector only starts when run
+if __name__ == "__main__":
+    # Initialize serial connection (framed outputs are opened by ActuatorPool)
+    if SERIAL_PROTOCOL == 'byte':
+        try:
+            ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
+            time.sleep(2)  # Wait for connection to establish
+            print(f"Connected to serial port {SERIAL_PORT}")
+        except serial.SerialException as e:
+            print(f"Error opening serial port: {e}")
+            ser = None
+
+    # OpenCV's thread pool takes the CPU set of the thread that starts it, so the main
+    # thread starts it on the inference set before moving to the output set (see below)
+    pin_current_thread('inference')
+    profiler = SamplingProfiler()
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, start_profile_on_signal)
+    tuning_profile = load_tuning_profile(TUNING_PROFILE)
+    base_input_size = INPUT_SIZE
+    model_variants[(PROTOTXT, MODEL)] = net
+    if STAGE_AFFINITY and 'inference' in STAGE_AFFINITY:
+        cv2.setNumThreads(INFERENCE_THREADS or len(STAGE_AFFINITY['inference']))
+        net.setInput(make_blob(np.zeros((480, 640, 3), dtype=np.uint8)))
+        net.forward()  # Starts the pool's worker threads on the inference CPUs
+    # The main thread runs the UI and window events: I/O work, not inference; the
+    # detection thread pins itself to the inference set
+    pin_current_thread('output')
+
+    stage_stats = {name: StageStats(name) for name in ('capture', 'inference', 'output')}
+    latency = {name: LatencyHistogram() for name in ('queue', 'inference', 'zone', 'output', 'end_to_end')}
+    if SERIAL_PROTOCOL == 'framed':
+        actuators = ActuatorPool(ACTUATOR_OUTPUTS)
+    stop_event = threading.Event()
+    capture_ready = threading.Event()
+    frame_queue = queue.Queue(maxsize=1)
+
+    memory_stats = MemoryStats()
+    if LOW_MEMORY:
+        buffers = FrameBuffers(int(640 * LOW_MEMORY_FRAME_SCALE), int(480 * LOW_MEMORY_FRAME_SCALE), INPUT_SIZE)
+        headroom = LOW_MEMORY_RSS_BUDGET_MB * 2**20 - current_rss()
+        # Output items are tiny; cap the queue so a stalled serial port cannot grow memory
+        output_queue = queue.Queue(maxsize=max(1, min(256, headroom // 1024)))
+        log_message(f"Low-memory profile: {buffers.nbytes() / 2**20:.1f} MB preallocated, "
+                    f"{headroom / 2**20:.1f} MB headroom in {LOW_MEMORY_RSS_BUDGET_MB} MB budget")
+        if headroom < buffers.nbytes():
+            log_message("Warning: RSS budget leaves no headroom, lower LOW_MEMORY_FRAME_SCALE or raise the budget")
+        tracemalloc.start(1)
+    else:
+        output_queue = queue.Queue()
+
+    presence = None
+    if PRESENCE_BUS is not None:
+        presence = PresencePublisher(PRESENCE_BUS, NODE_ID)
+        log_message(f"Publishing presence as {NODE_ID} to {PRESENCE_BUS[0]}:{PRESENCE_BUS[1]}")
+
+    ui_config = UIConfig(DETECTION_AREA)
+    display_queue = queue.Queue(maxsize=1)
+
+    ring = None
+    if DETECTIONS_SHM:
+        ring = DetectionRing(DETECTIONS_SHM, DETECTIONS_RING_SLOTS, DETECTIONS_MAX_BOXES, DETECTIONS_MAX_ZONES)
+        log_message(f"Publishing detections to shared memory '{DETECTIONS_SHM}' ({DETECTIONS_RING_SLOTS} slots)")
+    camera = CameraContext(CAMERA_ID, output_queue, ring)
+
+    thermal = None
+    if THERMAL_TARGET is not None:
+        thermal = ThermalGovernor(THERMAL_ROOT, lambda: camera.stage != 'waiting')
+        if thermal.available():
+            threading.Thread(target=thermal.run, daemon=True).start()
+            log_message(f"Thermal throttling on: target {THERMAL_TARGET}C, sensor {os.path.join(THERMAL_ROOT, THERMAL_SENSOR)}")
+        else:
+            log_message(f"Warning: no thermal sensor at {os.path.join(THERMAL_ROOT, THERMAL_SENSOR)}, throttling disabled")
+            thermal = None
+
+    # Occupancy statistics, queryable while detection runs
+    if STATS_HTTP_PORT:
+        stats_server = start_stats_server(STATS_HTTP_PORT)
+
+    # Connect to webcam
+    cap = None
+    capture_thread = threading.Thread(target=capture_loop, args=(camera,), daemon=True)
+    capture_thread.start()
+    capture_ready.wait()
+
+    if not cap.isOpened():
+        log_message("Error: Could not open webcam")
+        exit()
+
+    output_thread = threading.Thread(target=output_loop, args=(camera,), daemon=True)
+    output_thread.start()
+
+    # Create window and set mouse callback
+    cv2.namedWindow(WINDOW_NAME)
+    # Pass the initial frame to mouse_callback so it can get frame dimensions immediately
+    try:
+        initial_frame, _, slot = frame_queue.get(timeout=5)
+        cv2.setMouseCallback(WINDOW_NAME, mouse_callback, initial_frame.copy())
+        if slot is not None:
+            buffers.free.put(slot)
+    except queue.Empty:
+        log_message("Warning: Could not read initial frame for mouse callback setup. Mouse interaction might be affected.")
+
+
+    watchdog_thread = threading.Thread(target=camera.watchdog.run, daemon=True)
+    watchdog_thread.start()
+
+    log_message("System started. Monitoring for humans...")
+    detection_thread = threading.Thread(target=detection_loop, args=(camera,), daemon=True)
+    detection_thread.start()
+
+    try:
+        ui_loop()
+
+    except KeyboardInterrupt:
+        log_message("System stopped by user")
+
+    finally:
+        stop_event.set()
+        detection_thread.join(timeout=2)
+        camera.output_queue.put(None)
+        output_thread.join(timeout=2)
+        watchdog_thread.join(timeout=2)
+        capture_thread.join(timeout=2)
+        cap.release()
+        cv2.destroyAllWindows()
+        if ring is not None:
+            ring.close()
+        if ser is not None or actuators is not None:
+            send_serial_data(camera, 0) # Ensure serial state is reset on exit
+            set_gpio(GPIO_LED, 0) # Turn off GPIO LED
+            set_gpio(GPIO_ALARM, 0)
+            set_gpio(GPIO_PREWARNING, 0)
+        if ser is not None:
+            ser.close()
+        if actuators is not None:
+            actuators.close()
+        log_message("System shutdown")
\ No newline at end of file
@@ -1,7 +1,12 @@
 import cv2
 import time
+import queue
+import threading
 import numpy as np
 from datetime import datetime
+from inference_client import InferenceClient
+from types import MappingProxyType
+from collections import namedtuple
 import serial
 
 # Configuration
@@ -31,17 +36,20 @@ BUTTONS = {
     'zoom_in': {'text': "+", 'pos': (500, 10), 'size': (50, 30), 'color': (200, 200, 200)},
     'zoom_out': {'text': "-", 'pos': (560, 10), 'size': (50, 30), 'color': (200, 200, 200)}
 }
+WINDOW_NAME = 'Human Detection with Serial Output'
+UI_POLL_INTERVAL = 0.05  # seconds the UI waits for a new frame before pumping window events anyway
 
 # Global variables
-drawing = False
-zone_enabled = True
-last_human_state = None
-human_count = 0
+drawing = False           # drawing, start_point and end_point belong to the UI thread
 start_point = (-1, -1)
 end_point = (-1, -1)
-zoom_factor = 1.0
 zoom_center = (320, 240)  # Default center for 640x480 frame
 
+# Remote inference (inference-server.py), None always runs the model locally
+INFERENCE_SERVER_URL = None     # e.g. "http://192.168.1.10:8090/detect"
+INFERENCE_TIMEOUT = 0.5         # seconds before falling back to the local model
+INFERENCE_RETRY_INTERVAL = 10   # seconds on the local model before trying the server again
+
 # Load pre-trained model
 net = cv2.dnn.readNetFromCaffe(PROTOTXT, MODEL)
 
@@ -58,9 +66,31 @@ def log_message(message):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {message}")
 
+# Zone and zoom settings as the detector sees them for one frame; `area` is a read-only mapping
+ZoneConfig = namedtuple('ZoneConfig', ['area', 'zone_enabled', 'zoom_factor', 'version'])
+
+class UIConfig:
+    """Publishes zone and zoom edits from the UI thread as immutable ZoneConfig snapshots.
+
+    Every edit builds a new snapshot and replaces `current` in one reference store; the
+    detection thread reads `current` once per frame, so zoom, zone test and drawing of a
+    frame always agree.
+    """
+
+    def __init__(self, area, zone_enabled=True, zoom_factor=1.0):
+        self.current = ZoneConfig(MappingProxyType(dict(area)), zone_enabled, zoom_factor, 0)
+
+    def publish(self, area=None, zone_enabled=None, zoom_factor=None):
+        config = self.current
+        self.current = ZoneConfig(config.area if area is None else MappingProxyType(dict(area)),
+                                  config.zone_enabled if zone_enabled is None else zone_enabled,
+                                  config.zoom_factor if zoom_factor is None else zoom_factor,
+                                  config.version + 1)
+        return self.current
+
 def check_button_click(x, y):
     """Check if a button was clicked and perform the corresponding action"""
-    global zone_enabled, DETECTION_AREA, zoom_factor, zoom_center
+    zoom_factor = ui_config.current.zoom_factor
     
     for btn_name, btn in BUTTONS.items():
         pos = btn['pos']
@@ -70,35 +100,32 @@ def check_button_click(x, y):
             pos[1] <= y <= pos[1] + size[1]):
             
             if btn_name == 'reset_zone':
-                DETECTION_AREA = {
-                    'x_start': 0.25,
-                    'y_start': 0.25,
-                    'x_end': 0.75,
-                    'y_end': 0.75
-                }
+                ui_config.publish(area=DETECTION_AREA)
                 log_message("Detection zone reset to default")
                 
             elif btn_name == 'disable_zone':
-                zone_enabled = False
+                ui_config.publish(zone_enabled=False)
                 log_message("Detection zone disabled - monitoring entire frame")
                 
             elif btn_name == 'enable_zone':
-                zone_enabled = True
+                ui_config.publish(zone_enabled=True)
                 log_message("Detection zone enabled")
                 
             elif btn_name == 'zoom_in':
-                zoom_factor = min(zoom_factor * 1.2, 3.0)  # Max zoom 3x
+                zoom_factor = ui_config.publish(zoom_factor=min(zoom_factor * 1.2, 3.0)).zoom_factor  # Max zoom 3x
                 log_message(f"Zoom in - current zoom: {zoom_factor:.1f}x")
                 
             elif btn_name == 'zoom_out':
-                zoom_factor = max(zoom_factor / 1.2, 1.0)  # Min zoom 1x
+                zoom_factor = ui_config.publish(zoom_factor=max(zoom_factor / 1.2, 1.0)).zoom_factor  # Min zoom 1x
                 log_message(f"Zoom out - current zoom: {zoom_factor:.1f}x")
                 
             return True
     return False
 
 def mouse_callback(event, x, y, flags, param):
-    global drawing, start_point, end_point, DETECTION_AREA, zoom_center, zoom_factor
+    global drawing, start_point, end_point
+    config = ui_config.current
+    zoom_factor = config.zoom_factor
     
     # Adjust coordinates for zoom
     adj_x = int(x / zoom_factor + zoom_center[0] * (1 - 1/zoom_factor))
@@ -111,7 +138,7 @@ def mouse_callback(event, x, y, flags, param):
             return
 
         # If not a button, and zone is enabled, then start drawing
-        if zone_enabled:
+        if config.zone_enabled:
             drawing = True
             start_point = (adj_x, adj_y)
             end_point = (adj_x, adj_y)
@@ -126,12 +153,12 @@ def mouse_callback(event, x, y, flags, param):
             
             # Convert to relative coordinates if a zone was being drawn
             frame_height, frame_width = param.shape[:2]
-            DETECTION_AREA = {
+            ui_config.publish(area={
                 'x_start': min(start_point[0], end_point[0]) / frame_width,
                 'y_start': min(start_point[1], end_point[1]) / frame_height,
                 'x_end': max(start_point[0], end_point[0]) / frame_width,
                 'y_end': max(start_point[1], end_point[1]) / frame_height
-            }
+            })
         # After drawing or if not drawing, also check for button click on release
         else:
             check_button_click(x, y)
@@ -139,12 +166,12 @@ def mouse_callback(event, x, y, flags, param):
     elif event == cv2.EVENT_MOUSEWHEEL:
         # Handle mouse wheel for zoom (alternative to buttons)
         if flags > 0:  # Scroll up
-            zoom_factor = min(zoom_factor * 1.1, 3.0)
+            zoom_factor = ui_config.publish(zoom_factor=min(zoom_factor * 1.1, 3.0)).zoom_factor
         else:  # Scroll down
-            zoom_factor = max(zoom_factor / 1.1, 1.0)
+            zoom_factor = ui_config.publish(zoom_factor=max(zoom_factor / 1.1, 1.0)).zoom_factor
         log_message(f"Mouse wheel zoom - current zoom: {zoom_factor:.1f}x")
 
-def apply_zoom(frame):
+def apply_zoom(frame, zoom_factor):
     """Apply zoom transformation to the frame"""
     if zoom_factor == 1.0:
         return frame.copy()
@@ -170,32 +197,44 @@ def apply_zoom(frame):
     zoomed = frame[y1:y2, x1:x2]
     return cv2.resize(zoomed, (w, h))
 
-def is_in_detection_area(box, frame_width, frame_height):
-    """Check if detection is within our defined area"""
-    if not zone_enabled:
+def is_in_detection_area(box, frame_width, frame_height, config):
+    """Check if detection is within the area of the frame's config snapshot"""
+    if not config.zone_enabled:
         return True
         
     x_center = (box[0] + box[2]) / 2
     y_center = (box[1] + box[3]) / 2
     
-    x_min = frame_width * DETECTION_AREA['x_start']
-    x_max = frame_width * DETECTION_AREA['x_end']
-    y_min = frame_height * DETECTION_AREA['y_start']
-    y_max = frame_height * DETECTION_AREA['y_end']
+    x_min = frame_width * config.area['x_start']
+    x_max = frame_width * config.area['x_end']
+    y_min = frame_height * config.area['y_start']
+    y_max = frame_height * config.area['y_end']
     
     return (x_min <= x_center <= x_max) and (y_min <= y_center <= y_max)
 
-def send_serial_data(state):
-    """Send data over serial if port is open"""
-    global last_human_state
-    
+class PresenceState:
+    """Presence for one camera: people in the zone on the last frame, and the state last sent"""
+
+    __slots__ = ('count', 'present', 'last_sent')
+
+    def __init__(self):
+        self.count = 0
+        self.present = False
+        self.last_sent = None
+
+    def update(self, count):
+        self.count = count
+        self.present = count > 1  # 1 if more than 1 human detected
+
+def send_serial_data(camera, state):
+    """Send `camera`'s state over serial if port is open"""
     # Only send if state changed
-    if state != last_human_state and ser is not None:
+    if state != camera.last_sent and ser is not None:
         try:
             data = b'1' if state else b'0'
             ser.write(data)
-            log_message(f"Serial data sent: {data.decode()} (Humans detected: {human_count})")
-            last_human_state = state
+            log_message(f"Serial data sent: {data.decode()} (Humans detected: {camera.count})")
+            camera.last_sent = state
         except serial.SerialException as e:
             log_message(f"Serial write error: {e}")
 
@@ -218,40 +257,33 @@ def draw_buttons(frame):
         # Draw button text
         cv2.putText(frame, btn['text'], (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
 
-def detect_humans(frame):
-    global human_count, zoom_factor, zoom_center
-    
+inference = InferenceClient(INFERENCE_SERVER_URL, INFERENCE_TIMEOUT, INFERENCE_RETRY_INTERVAL)
+
+def detect_humans(camera, frame, config):
+    zoom_factor = config.zoom_factor
     (h, w) = frame.shape[:2]
-    blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 0.007843, (300, 300), 127.5)
-    
-    net.setInput(blob)
-    detections = net.forward()
+    detections = inference.detections(frame)
+    if detections is None:
+        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 0.007843, (300, 300), 127.5)
+        net.setInput(blob)
+        detections = net.forward()
     
     human_count = 0
     
-    # Draw detection area rectangle if enabled
-    if zone_enabled:
-        x1 = int(w * DETECTION_AREA['x_start'])
-        y1 = int(h * DETECTION_AREA['y_start'])
-        x2 = int(w * DETECTION_AREA['x_end'])
-        y2 = int(h * DETECTION_AREA['y_end'])
+    # Draw detection area rectangle if enabled (the UI draws a zone being dragged on top)
+    if config.zone_enabled:
+        x1 = int(w * config.area['x_start'])
+        y1 = int(h * config.area['y_start'])
+        x2 = int(w * config.area['x_end'])
+        y2 = int(h * config.area['y_end'])
         
-        # Draw the rectangle being defined
-        if drawing:
-            # Adjust drawing coordinates for zoom
-            adj_x1 = int((start_point[0] - zoom_center[0] * (1 - 1/zoom_factor)) * zoom_factor)
-            adj_y1 = int((start_point[1] - zoom_center[1] * (1 - 1/zoom_factor)) * zoom_factor)
-            adj_x2 = int((end_point[0] - zoom_center[0] * (1 - 1/zoom_factor)) * zoom_factor)
-            adj_y2 = int((end_point[1] - zoom_center[1] * (1 - 1/zoom_factor)) * zoom_factor)
-            cv2.rectangle(frame, (adj_x1, adj_y1), (adj_x2, adj_y2), (0, 255, 255), 2)
-        else:
-            # Adjust zone coordinates for zoom
-            adj_x1 = int((x1 - zoom_center[0] * (1 - 1/zoom_factor)) * zoom_factor)
-            adj_y1 = int((y1 - zoom_center[1] * (1 - 1/zoom_factor)) * zoom_factor)
-            adj_x2 = int((x2 - zoom_center[0] * (1 - 1/zoom_factor)) * zoom_factor)
-            adj_y2 = int((y2 - zoom_center[1] * (1 - 1/zoom_factor)) * zoom_factor)
-            cv2.rectangle(frame, (adj_x1, adj_y1), (adj_x2, adj_y2), (255, 0, 0), 2)
-            cv2.putText(frame, "Detection Zone", (adj_x1, adj_y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+        # Adjust zone coordinates for zoom
+        adj_x1 = int((x1 - zoom_center[0] * (1 - 1/zoom_factor)) * zoom_factor)
+        adj_y1 = int((y1 - zoom_center[1] * (1 - 1/zoom_factor)) * zoom_factor)
+        adj_x2 = int((x2 - zoom_center[0] * (1 - 1/zoom_factor)) * zoom_factor)
+        adj_y2 = int((y2 - zoom_center[1] * (1 - 1/zoom_factor)) * zoom_factor)
+        cv2.rectangle(frame, (adj_x1, adj_y1), (adj_x2, adj_y2), (255, 0, 0), 2)
+        cv2.putText(frame, "Detection Zone", (adj_x1, adj_y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
     
     for i in range(detections.shape[2]):
         confidence = detections[0, 0, i, 2]
@@ -263,7 +295,7 @@ def detect_humans(frame):
                 box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
                 (startX, startY, endX, endY) = box.astype("int")
                 
-                if is_in_detection_area((startX, startY, endX, endY), w, h):
+                if is_in_detection_area((startX, startY, endX, endY), w, h, config):
                     human_count += 1
                     # Adjust detection box coordinates for zoom
                     adj_startX = int((startX - zoom_center[0] * (1 - 1/zoom_factor)) * zoom_factor)
@@ -282,10 +314,105 @@ def detect_humans(frame):
                     cv2.rectangle(frame, (adj_startX, adj_startY), (adj_endX, adj_endY), (200, 200, 200), 1)
     
     # Send serial data based on detection (1 if more than 1 human detected)
-    send_serial_data(human_count > 1)
+    camera.update(human_count)
+    send_serial_data(camera, camera.present)
     
     return frame
 
+def show_frame(frame):
+    """Hand an annotated frame to the UI, replacing one it has not shown yet"""
+    try:
+        display_queue.get_nowait()
+    except queue.Empty:
+        pass
+    display_queue.put(frame)
+
+def detection_loop(camera):
+    """Capture, detection and annotation for one camera, never waiting on the UI.
+
+    Zone and zoom settings are read once per frame from `ui_config.current`, so an edit
+    made while a frame is in flight applies from the next frame.
+    """
+    try:
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                log_message("Error reading frame from webcam")
+                time.sleep(1)
+                continue
+            
+            config = ui_config.current
+            frame = cv2.flip(frame, 1)
+            
+            # Apply zoom before processing
+            zoomed_frame = apply_zoom(frame, config.zoom_factor)
+            
+            # Detect humans and draw UI on zoomed frame
+            processed_frame = detect_humans(camera, zoomed_frame, config)
+            
+            # Display status text
+            status_text = f"DETECTED: {camera.count} (Sending {'1' if camera.present else '0'})"
+            status_color = (0, 255, 0) if camera.present else (0, 0, 255)
+            cv2.putText(processed_frame, status_text, (20, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
+            
+            # Display zone status
+            zone_status = "ZONE: ENABLED" if config.zone_enabled else "ZONE: DISABLED"
+            zone_color = (0, 255, 0) if config.zone_enabled else (0, 0, 255)
+            cv2.putText(processed_frame, zone_status, (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, zone_color, 2)
+            
+            # Display zoom level
+            zoom_text = f"Zoom: {config.zoom_factor:.1f}x"
+            cv2.putText(processed_frame, zoom_text, (500, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            
+            show_frame((processed_frame, config.zoom_factor))
+    finally:
+        stop_event.set()  # Take the UI down with it rather than show a frozen frame
+
+def ui_loop():
+    """UI on the main thread, where HighGUI keeps the window: show the newest frame, pump
+    mouse and key events, and publish zone and zoom edits through ui_config"""
+    while not stop_event.is_set():
+        try:
+            frame, zoom_factor = display_queue.get(timeout=UI_POLL_INTERVAL)
+        except queue.Empty:
+            frame = None
+        if frame is not None:
+            # Draw the rectangle being defined, adjusted for the frame's zoom
+            if drawing:
+                adj_x1 = int((start_point[0] - zoom_center[0] * (1 - 1/zoom_factor)) * zoom_factor)
+                adj_y1 = int((start_point[1] - zoom_center[1] * (1 - 1/zoom_factor)) * zoom_factor)
+                adj_x2 = int((end_point[0] - zoom_center[0] * (1 - 1/zoom_factor)) * zoom_factor)
+                adj_y2 = int((end_point[1] - zoom_center[1] * (1 - 1/zoom_factor)) * zoom_factor)
+                cv2.rectangle(frame, (adj_x1, adj_y1), (adj_x2, adj_y2), (0, 255, 255), 2)
+            
+            # Draw buttons
+            draw_buttons(frame)
+            
+            cv2.imshow(WINDOW_NAME, frame)
+        
+        # Handle keyboard events
+        key = cv2.waitKey(1) & 0xFF
+        config = ui_config.current
+        if key == ord('q'):
+            break
+        elif key == ord('d'):
+            config = ui_config.publish(zone_enabled=not config.zone_enabled)
+            log_message(f"Detection zone {'enabled' if config.zone_enabled else 'disabled'}")
+        elif key == ord('+') or key == ord('='):
+            config = ui_config.publish(zoom_factor=min(config.zoom_factor * 1.2, 3.0))
+            log_message(f"Zoom in - current zoom: {config.zoom_factor:.1f}x")
+        elif key == ord('-') or key == ord('_'):
+            config = ui_config.publish(zoom_factor=max(config.zoom_factor / 1.2, 1.0))
+            log_message(f"Zoom out - current zoom: {config.zoom_factor:.1f}x")
+        elif key == ord('0'):
+            ui_config.publish(zoom_factor=1.0)
+            log_message("Zoom reset to 1.0x")
+
+ui_config = UIConfig(DETECTION_AREA)
+camera = PresenceState()
+display_queue = queue.Queue(maxsize=1)
+stop_event = threading.Event()
+
 # Connect to webcam
 cap = cv2.VideoCapture(WEBCAM_INDEX)
 cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
@@ -297,75 +424,30 @@ if not cap.isOpened():
     exit()
 
 # Create window and set mouse callback
-cv2.namedWindow('Human Detection with Serial Output')
+cv2.namedWindow(WINDOW_NAME)
 # Pass the initial frame to mouse_callback so it can get frame dimensions immediately
 ret, initial_frame = cap.read()
 if ret:
-    cv2.setMouseCallback('Human Detection with Serial Output', mouse_callback, initial_frame)
+    cv2.setMouseCallback(WINDOW_NAME, mouse_callback, initial_frame)
 else:
     log_message("Warning: Could not read initial frame for mouse callback setup. Mouse interaction might be affected.")
 
 log_message("System started. Monitoring for humans...")
+detection_thread = threading.Thread(target=detection_loop, args=(camera,), daemon=True)
+detection_thread.start()
 
 try:
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            log_message("Error reading frame from webcam")
-            time.sleep(1)
-            continue
-        
-        frame = cv2.flip(frame, 1)
-        
-        # Apply zoom before processing
-        zoomed_frame = apply_zoom(frame)
-        
-        # Detect humans and draw UI on zoomed frame
-        processed_frame = detect_humans(zoomed_frame)
-        
-        # Display status text
-        status_text = f"DETECTED: {human_count} (Sending {'1' if human_count > 1 else '0'})"
-        status_color = (0, 255, 0) if human_count > 1 else (0, 0, 255)
-        cv2.putText(processed_frame, status_text, (20, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
-        
-        # Display zone status
-        zone_status = "ZONE: ENABLED" if zone_enabled else "ZONE: DISABLED"
-        zone_color = (0, 255, 0) if zone_enabled else (0, 0, 255)
-        cv2.putText(processed_frame, zone_status, (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, zone_color, 2)
-        
-        # Display zoom level
-        zoom_text = f"Zoom: {zoom_factor:.1f}x"
-        cv2.putText(processed_frame, zoom_text, (500, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        # Draw buttons
-        draw_buttons(processed_frame)
-        
-        cv2.imshow('Human Detection with Serial Output', processed_frame)
-        
-        # Handle keyboard events
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord('q'):
-            break
-        elif key == ord('d'):
-            zone_enabled = not zone_enabled
-            log_message(f"Detection zone {'enabled' if zone_enabled else 'disabled'}")
-        elif key == ord('+') or key == ord('='):
-            zoom_factor = min(zoom_factor * 1.2, 3.0)
-            log_message(f"Zoom in - current zoom: {zoom_factor:.1f}x")
-        elif key == ord('-') or key == ord('_'):
-            zoom_factor = max(zoom_factor / 1.2, 1.0)
-            log_message(f"Zoom out - current zoom: {zoom_factor:.1f}x")
-        elif key == ord('0'):
-            zoom_factor = 1.0
-            log_message("Zoom reset to 1.0x")
+    ui_loop()
 
 except KeyboardInterrupt:
     log_message("System stopped by user")
 
 finally:
+    stop_event.set()
+    detection_thread.join(timeout=2)
     cap.release()
     cv2.destroyAllWindows()
     if ser is not None:
-        send_serial_data(0) # Ensure serial state is reset on exit
+        send_serial_data(camera, 0) # Ensure serial state is reset on exit
         ser.close()
-    log_message("System shutdown")
\ No newline at end of file
+    log_message("System shutdown")
@@ -0,0 +1,390 @@
+import os
+import cv2
+import sys
+import json
+import time
+import queue
+import types
+import argparse
+import importlib.util
+import numpy as np
+from datetime import datetime
+
+# Configuration
+DETECTOR_SCRIPT = "dynamic-area-detections.py"  # the reference path is this script's own code
+MAX_FRAMES = 300         # frames decoded per clip and kept in memory for every path
+MIRROR_FRAMES = True     # live loops flip frames before detection, so zones are defined mirrored
+
+# Optimized path settings
+BATCH_SIZE = 4           # frames per forward pass for the batched path
+CROP_MARGIN = 0.15       # fraction of the frame added around the zone for the cropped path
+TILE_GRID = (2, 2)       # rows, columns for the tiled path
+TILE_OVERLAP = 0.2       # fraction of a tile shared with its neighbours
+NMS_THRESHOLD = 0.45     # IoU above which overlapping tile detections are merged
+TRACK_INTERVAL = 3       # tracked path runs the model every Nth frame and reuses boxes in between
+SMALL_INPUT_SIZE = 224
+
+# Tolerances: a path passes when it stays within all of them against the reference
+MATCH_IOU = 0.5                  # boxes overlapping this much are the same person
+BOX_IOU_TOLERANCE = 0.9          # matched boxes must overlap this much to count as unchanged
+CONFIDENCE_TOLERANCE = 0.05      # and their confidences may differ by at most this
+MIN_BOX_RECALL = 0.95            # fraction of reference boxes the path must find
+MIN_BOX_PRECISION = 0.95         # fraction of the path's boxes that must be in the reference
+MIN_BOXES_UNCHANGED = 0.9        # fraction of reference boxes matched within both tolerances above
+MIN_MEAN_IOU = BOX_IOU_TOLERANCE # mean overlap of matched boxes
+MAX_COUNT_MISMATCH_RATE = 0.01   # fraction of frames whose in-zone count may differ
+MAX_STATE_MISMATCH_RATE = 0.01   # fraction of frames whose presence state may differ
+TRANSITION_TOLERANCE_FRAMES = 2  # a state transition may move by this many frames
+
+def log_message(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}")
+
+def load_detector(path):
+    """Import the detector script without starting it; GPIO is stubbed off the Pi"""
+    if 'RPi' not in sys.modules and importlib.util.find_spec('RPi') is None:
+        gpio = types.ModuleType('RPi.GPIO')
+        gpio.BCM, gpio.OUT = 'BCM', 'OUT'
+        gpio.setmode = gpio.setup = gpio.output = lambda *args, **kwargs: None
+        sys.modules['RPi'] = types.ModuleType('RPi')
+        sys.modules['RPi'].GPIO = sys.modules['RPi.GPIO'] = gpio
+    spec = importlib.util.spec_from_file_location('detector', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+detector = load_detector(os.path.join(os.path.dirname(os.path.abspath(__file__)), DETECTOR_SCRIPT))
+
+# Model, thresholds and zone are the detector's, so the reference is what it runs
+PROTOTXT, MODEL = detector.PROTOTXT, detector.MODEL
+CONFIDENCE_THRESHOLD = detector.CONFIDENCE_THRESHOLD
+INPUT_SIZE = detector.INPUT_SIZE
+DETECTION_AREA = detector.DETECTION_AREA
+
+def load_net(target=None):
+    net = cv2.dnn.readNetFromCaffe(PROTOTXT, MODEL)
+    if target is not None:
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        net.setPreferableTarget(target)
+    return net
+
+def load_clip(path, count):
+    """Decode up to `count` frames of the clip into memory"""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.flip(frame, 1) if MIRROR_FRAMES else frame)
+    cap.release()
+    return frames
+
+def people(detections, w, h):
+    """People in one frame's (1, 1, N, 7) detections, boxed and zoned by the detector's FrameResult"""
+    result = detector.FrameResult('equivalence', capacity=max(detector.MAX_DETECTIONS, detections.shape[2]))
+    result.fill(0.0, detections, w, h, DETECTION_AREA)
+    return result_people(result)
+
+def result_people(result):
+    return [{
+        'box': [int(v) for v in result.pixel_boxes[i]],
+        'confidence': float(result.confidences[i]),
+        'in_zone': bool(result.zone_ids[i] >= 0)
+    } for i in result.person_indices()]
+
+def in_frame(rows, offset, size, w, h):
+    """SSD rows for a `size` crop at `offset`, as one frame's detections in whole-frame fractions"""
+    rows = rows.copy()
+    rows[:, [3, 5]] = (rows[:, [3, 5]] * size[0] + offset[0]) / w
+    rows[:, [4, 6]] = (rows[:, [4, 6]] * size[1] + offset[1]) / h
+    return rows[None, None]
+
+def reference_path(net, frames):
+    """The detector's own detect_humans on `net`: make_blob, escalation, hazard rules and FrameResult,
+    on a fresh camera context and the zone snapshot it would take from the UI"""
+    camera = detector.CameraContext('equivalence', queue.Queue())
+    config = detector.UIConfig(DETECTION_AREA).current
+    results = []
+    detector_net, detector.net = detector.net, net
+    try:
+        for frame in frames:
+            detector.detect_humans(camera, frame.copy(), {}, config)
+            camera.output_queue.get_nowait()
+            results.append(result_people(camera.result))
+    finally:
+        detector.net = detector_net
+    return results
+
+def preallocated_path(net, frames):
+    """The detector's low-memory profile: make_blob resizes and normalises into FrameBuffers"""
+    (h, w) = frames[0].shape[:2]
+    detector.buffers = detector.FrameBuffers(w, h, INPUT_SIZE)
+    try:
+        return reference_path(net, frames)
+    finally:
+        detector.buffers = None
+
+def batched_path(net, frames):
+    """batch-analysis.py path: several frames per forward pass"""
+    results = []
+    for start in range(0, len(frames), BATCH_SIZE):
+        batch = frames[start:start + BATCH_SIZE]
+        (h, w) = batch[0].shape[:2]
+        resized = [cv2.resize(frame, (INPUT_SIZE, INPUT_SIZE)) for frame in batch]
+        net.setInput(cv2.dnn.blobFromImages(resized, 0.007843, (INPUT_SIZE, INPUT_SIZE), 127.5))
+        rows = net.forward()[0, 0]
+        for image_id in range(len(batch)):
+            results.append(people(rows[rows[:, 0] == image_id][None, None], w, h))
+    return results
+
+def small_input_path(net, frames):
+    """Smaller network input, as a tuning profile may choose"""
+    results = []
+    for frame in frames:
+        (h, w) = frame.shape[:2]
+        size = SMALL_INPUT_SIZE
+        net.setInput(cv2.dnn.blobFromImage(cv2.resize(frame, (size, size)), 0.007843, (size, size), 127.5))
+        results.append(people(net.forward(), w, h))
+    return results
+
+def crop_region(w, h):
+    """Detection area plus CROP_MARGIN, clamped to the frame, in pixels"""
+    x1 = max(0, int(w * (DETECTION_AREA['x_start'] - CROP_MARGIN)))
+    y1 = max(0, int(h * (DETECTION_AREA['y_start'] - CROP_MARGIN)))
+    x2 = min(w, int(w * (DETECTION_AREA['x_end'] + CROP_MARGIN)))
+    y2 = min(h, int(h * (DETECTION_AREA['y_end'] + CROP_MARGIN)))
+    return x1, y1, x2, y2
+
+def cropped_path(net, frames):
+    """Run the model on the zone and its margin only; people far outside the zone are not seen"""
+    results = []
+    for frame in frames:
+        (h, w) = frame.shape[:2]
+        x1, y1, x2, y2 = crop_region(w, h)
+        crop = frame[y1:y2, x1:x2]
+        net.setInput(cv2.dnn.blobFromImage(cv2.resize(crop, (INPUT_SIZE, INPUT_SIZE)), 0.007843, (INPUT_SIZE, INPUT_SIZE), 127.5))
+        results.append(people(in_frame(net.forward()[0, 0], (x1, y1), (x2 - x1, y2 - y1), w, h), w, h))
+    return results
+
+def tiled_path(net, frames):
+    """Split the frame into overlapping tiles, detect per tile and merge with NMS"""
+    rows, cols = TILE_GRID
+    results = []
+    for frame in frames:
+        (h, w) = frame.shape[:2]
+        tile_w = int(w / (cols - (cols - 1) * TILE_OVERLAP))
+        tile_h = int(h / (rows - (rows - 1) * TILE_OVERLAP))
+        tiles = []
+        for r in range(rows):
+            for c in range(cols):
+                x1 = min(w - tile_w, int(c * tile_w * (1 - TILE_OVERLAP)))
+                y1 = min(h - tile_h, int(r * tile_h * (1 - TILE_OVERLAP)))
+                tiles.append((x1, y1))
+        resized = [cv2.resize(frame[y1:y1 + tile_h, x1:x1 + tile_w], (INPUT_SIZE, INPUT_SIZE)) for x1, y1 in tiles]
+        net.setInput(cv2.dnn.blobFromImages(resized, 0.007843, (INPUT_SIZE, INPUT_SIZE), 127.5))
+        found = net.forward()[0, 0]
+        found = found[(found[:, 2] > CONFIDENCE_THRESHOLD) & (found[:, 1].astype(int) == detector.HUMAN_CLASS_ID)]
+        merged = np.concatenate([in_frame(found[found[:, 0] == i], tile, (tile_w, tile_h), w, h)[0, 0]
+                                 for i, tile in enumerate(tiles)])
+        boxes = merged[:, 3:7] * np.array([w, h, w, h])
+        keep = cv2.dnn.NMSBoxes([[float(b[0]), float(b[1]), float(b[2] - b[0]), float(b[3] - b[1])] for b in boxes],
+                                [float(c) for c in merged[:, 2]], CONFIDENCE_THRESHOLD, NMS_THRESHOLD)
+        results.append(people(merged[np.array(keep, dtype=int).flatten()][None, None], w, h))
+    return results
+
+def fp16_path(net, frames):
+    """Reference preprocessing on a half-precision CPU target"""
+    return reference_path(net, frames)
+
+def tracked_path(net, frames):
+    """Run the model every TRACK_INTERVAL frames and carry the last boxes forward in between"""
+    results = []
+    last_people = []
+    for i in range(0, len(frames)):
+        if i % TRACK_INTERVAL == 0:
+            last_people = reference_path(net, frames[i:i + 1])[0]
+        results.append([dict(p) for p in last_people])
+    return results
+
+# name -> (function, DNN target or None for the default)
+PATHS = {
+    'reference': (reference_path, None),
+    'preallocated': (preallocated_path, None),
+    'batched': (batched_path, None),
+    'input-224': (small_input_path, None),
+    'cropped': (cropped_path, None),
+    'tiled': (tiled_path, None),
+    'tracked': (tracked_path, None),
+}
+# Half precision stands in for quantization: the repo ships a single float Caffe model
+if hasattr(cv2.dnn, 'DNN_TARGET_CPU_FP16'):
+    PATHS['fp16'] = (fp16_path, cv2.dnn.DNN_TARGET_CPU_FP16)
+
+def iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def match_boxes(reference, candidate):
+    """Greedy best-IoU matching; returns (reference index, candidate index, IoU) pairs"""
+    pairs = sorted(((iou(r['box'], c['box']), i, j) for i, r in enumerate(reference) for j, c in enumerate(candidate)),
+                   reverse=True)
+    used_r, used_c, matches = set(), set(), []
+    for overlap, i, j in pairs:
+        if overlap < MATCH_IOU:
+            break
+        if i in used_r or j in used_c:
+            continue
+        used_r.add(i)
+        used_c.add(j)
+        matches.append((i, j, overlap))
+    return matches
+
+def presence_states(results):
+    return [sum(p['in_zone'] for p in frame) >= detector.PRESENCE_MIN_COUNT for frame in results]
+
+def transitions(states):
+    """Frame indexes where the presence state changes, with the new state"""
+    return [(i, state) for i, state in enumerate(states) if i > 0 and state != states[i - 1]]
+
+def compare(reference, candidate):
+    """Per-frame box, count and state comparison of one path against the reference"""
+    ref_boxes = cand_boxes = matched = unchanged = 0
+    ious = []
+    count_mismatches = 0
+    for ref_people, cand_people in zip(reference, candidate):
+        ref_boxes += len(ref_people)
+        cand_boxes += len(cand_people)
+        for i, j, overlap in match_boxes(ref_people, cand_people):
+            matched += 1
+            ious.append(overlap)
+            if (overlap >= BOX_IOU_TOLERANCE and
+                    abs(ref_people[i]['confidence'] - cand_people[j]['confidence']) <= CONFIDENCE_TOLERANCE):
+                unchanged += 1
+        if sum(p['in_zone'] for p in ref_people) != sum(p['in_zone'] for p in cand_people):
+            count_mismatches += 1
+
+    ref_states = presence_states(reference)
+    cand_states = presence_states(candidate)
+    state_mismatches = sum(r != c for r, c in zip(ref_states, cand_states))
+
+    # Pair each reference transition with the nearest candidate transition to the same state
+    ref_transitions = transitions(ref_states)
+    cand_transitions = transitions(cand_states)
+    unpaired = list(cand_transitions)
+    missed = 0
+    max_shift = 0
+    for frame, state in ref_transitions:
+        near = [t for t in unpaired if t[1] == state and abs(t[0] - frame) <= TRANSITION_TOLERANCE_FRAMES]
+        if not near:
+            missed += 1
+            continue
+        best = min(near, key=lambda t: abs(t[0] - frame))
+        unpaired.remove(best)
+        max_shift = max(max_shift, abs(best[0] - frame))
+
+    frames = max(1, len(reference))
+    return {
+        'frames': len(reference),
+        'box_recall': matched / ref_boxes if ref_boxes else 1.0,
+        'box_precision': matched / cand_boxes if cand_boxes else 1.0,
+        'boxes_unchanged': unchanged / ref_boxes if ref_boxes else 1.0,
+        'mean_iou': float(np.mean(ious)) if ious else 1.0,
+        'count_mismatch_rate': count_mismatches / frames,
+        'state_mismatch_rate': state_mismatches / frames,
+        'transitions': len(ref_transitions),
+        'transitions_missed': missed,
+        'transitions_extra': len(unpaired),
+        'max_transition_shift': max_shift
+    }
+
+def passes(result):
+    return (result['box_recall'] >= MIN_BOX_RECALL and
+            result['box_precision'] >= MIN_BOX_PRECISION and
+            result['boxes_unchanged'] >= MIN_BOXES_UNCHANGED and
+            result['mean_iou'] >= MIN_MEAN_IOU and
+            result['count_mismatch_rate'] <= MAX_COUNT_MISMATCH_RATE and
+            result['state_mismatch_rate'] <= MAX_STATE_MISMATCH_RATE and
+            result['transitions_missed'] == 0 and result['transitions_extra'] == 0)
+
+def run_path(name, frames, nets):
+    """Run one path over the clip, after an untimed warm-up frame; returns (results, seconds)"""
+    function, target = PATHS[name]
+    if target not in nets:
+        nets[target] = load_net(target)
+    net = nets[target]
+    function(net, frames[:1])
+    started = time.perf_counter()
+    results = function(net, frames)
+    return results, time.perf_counter() - started
+
+def run_harness(clips, names, max_frames):
+    """Compare every path against the reference on every clip and return the report"""
+    nets = {}
+    report = []
+    for clip in clips:
+        frames = load_clip(clip, max_frames)
+        if not frames:
+            log_message(f"Warning: could not read frames from {clip}, skipping")
+            continue
+        reference, reference_time = run_path('reference', frames, nets)
+        log_message(f"{clip}: {len(frames)} frames, reference (detect_humans, escalation "
+                    f"{'on' if detector.ESCALATION_BAND else 'off'}, {len(detector.HAZARD_RULES)} hazard rule(s)) "
+                    f"{len(frames) / reference_time:.1f} FPS")
+        for name in names:
+            if name == 'reference':
+                continue
+            try:
+                results, seconds = run_path(name, frames, nets)
+            except cv2.error as e:
+                log_message(f"  {name}: could not run ({e})")
+                continue
+            result = {
+                'clip': clip,
+                'path': name,
+                'fps': len(frames) / seconds,
+                'speedup': reference_time / seconds,
+                **compare(reference, results)
+            }
+            result['pass'] = passes(result)
+            report.append(result)
+            log_message(f"  {name:<12} {result['speedup']:5.2f}x  recall {100 * result['box_recall']:5.1f}%  "
+                        f"precision {100 * result['box_precision']:5.1f}%  unchanged {100 * result['boxes_unchanged']:5.1f}%  "
+                        f"IoU {result['mean_iou']:.2f}  "
+                        f"count diff {100 * result['count_mismatch_rate']:4.1f}%  state diff {100 * result['state_mismatch_rate']:4.1f}%  "
+                        f"transitions -{result['transitions_missed']}/+{result['transitions_extra']} of {result['transitions']}  "
+                        f"{'PASS' if result['pass'] else 'FAIL'}")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Check optimized detection paths against the reference on recorded clips")
+    parser.add_argument('clips', nargs='+', help="recorded clips to replay")
+    parser.add_argument('--paths', default=','.join(PATHS),
+                        help=f"comma-separated paths to compare (available: {', '.join(PATHS)})")
+    parser.add_argument('--max-frames', type=int, default=MAX_FRAMES, help="frames per clip")
+    parser.add_argument('-o', '--output', help="write the full report as JSON")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.paths.split(',') if name.strip()]
+    unknown = [name for name in names if name not in PATHS]
+    if unknown:
+        log_message(f"Error: unknown path(s) {', '.join(unknown)}")
+        sys.exit(2)
+
+    report = run_harness(args.clips, names, args.max_frames)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        log_message(f"Report written to {args.output}")
+
+    failed = sorted({r['path'] for r in report if not r['pass']})
+    if failed:
+        log_message(f"Outside tolerance: {', '.join(failed)}")
+        sys.exit(1)
+    log_message("All paths within tolerance")
+
+if __name__ == "__main__":
+    main()
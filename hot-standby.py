@@ -0,0 +1,440 @@
+import os
+import cv2
+import sys
+import time
+import queue
+import types
+import signal
+import argparse
+import threading
+import importlib.util
+import numpy as np
+import multiprocessing as mp
+from datetime import datetime
+from multiprocessing import shared_memory
+import serial
+
+# Configuration
+DETECTOR_SCRIPT = "dynamic-area-detections.py"  # model, zone, escalation and hazard rules are this script's
+
+CAMERA_SOURCE = 0
+FRAME_SIZE = (640, 480)      # frames are resized to this before they are shared
+SERIAL_PORT = '/dev/cu.usbserial-120'  # Change to your Arduino port, '' to run without one
+BAUD_RATE = 9600
+
+# Failover
+FAILOVER_TIMEOUT = 0.3       # seconds without a heartbeat from the output owner before the standby takes over
+HEARTBEAT_INTERVAL = 0.05    # seconds between heartbeats, written by a thread of their own so inference never delays them
+WATCH_INTERVAL = 0.01        # seconds between the standby's heartbeat checks
+STUCK_TIMEOUT_MIN = 2.0      # seconds one inference may run before its detector counts as stuck...
+STUCK_FACTOR = 5.0           # ...or this many times its last inference time, if that is longer
+OUTPUT_INTERVAL = 0.01       # seconds between output owner reads in the supervisor
+SAFE_TIMEOUT = 1.0           # seconds with no live owner at all before the output is forced safe
+FRAME_TIMEOUT = 1.0          # seconds from capture of the owner's last processed frame before the output is forced safe
+SAFE_OUTPUT_STATE = True     # '1' stops the machine
+RESTART_DELAY = 1.0          # seconds before a dead or fenced detector is started again
+DRILL_SETTLE = 3.0           # seconds between drill failovers, once both detectors are ready again
+
+# Shared state layout: one control record, one slot per detector, then the latest frame
+CONTROL = np.dtype([('owner', '<i4'), ('epoch', '<u4'), ('takeover_at', '<f8'), ('failovers', '<u4'), ('stop', 'u1')])
+SLOT = np.dtype([('pid', '<i4'), ('ready', 'u1'), ('state', 'u1'), ('count', '<u2'), ('heartbeat', '<f8'),
+                 ('busy_since', '<f8'), ('frame_seq', '<u8'), ('captured', '<f8'), ('inference_ms', '<f4')])
+FRAME_HEADER = np.dtype([('seq', '<u8'), ('captured', '<f8')])
+DETECTORS = 2
+
+def log_message(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+class SharedState:
+    """Control record, detector slots and the latest camera frame in one shared memory segment.
+
+    The frame is guarded by a sequence lock: the writer makes `seq` odd while copying, so a
+    reader that sees an odd or changed sequence retries.
+    """
+
+    def __init__(self, name=None):
+        width, height = FRAME_SIZE
+        self.offsets = [0, 64, 64 + DETECTORS * 64, 64 + DETECTORS * 64 + 64]
+        size = self.offsets[3] + width * height * 3
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            # Spawned detectors share the supervisor's resource tracker, which unlinks the
+            # segment once, when the supervisor does
+            self.shm = shared_memory.SharedMemory(name)
+            self.owner = False
+        buf = self.shm.buf
+        self.control = np.ndarray((), CONTROL, buffer=buf, offset=self.offsets[0])
+        self.slots = np.ndarray((DETECTORS,), SLOT, buffer=buf, offset=self.offsets[1])
+        self.frame_header = np.ndarray((), FRAME_HEADER, buffer=buf, offset=self.offsets[2])
+        self.frame = np.ndarray((height, width, 3), np.uint8, buffer=buf, offset=self.offsets[3])
+        if self.owner:
+            self.control['owner'] = 0
+            self.control['stop'] = 0
+            self.slots[:] = 0
+            self.frame_header['seq'] = 0
+
+    def write_frame(self, frame, captured):
+        self.frame_header['seq'] += 1
+        self.frame[:] = frame
+        self.frame_header['captured'] = captured
+        self.frame_header['seq'] += 1
+
+    def read_frame(self, out, last_seq):
+        """Copy the latest frame into `out` if it is newer than last_seq; returns (seq, captured) or None"""
+        seq = int(self.frame_header['seq'])
+        if seq == last_seq or seq % 2:
+            return None
+        out[:] = self.frame
+        captured = float(self.frame_header['captured'])
+        if int(self.frame_header['seq']) != seq:
+            return None  # Overwritten while copying
+        return seq, captured
+
+    def close(self):
+        del self.control, self.slots, self.frame_header, self.frame
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def load_detector(path):
+    """Import the detector script without starting it; GPIO is stubbed off the Pi"""
+    if 'RPi' not in sys.modules and importlib.util.find_spec('RPi') is None:
+        gpio = types.ModuleType('RPi.GPIO')
+        gpio.BCM, gpio.OUT = 'BCM', 'OUT'
+        gpio.setmode = gpio.setup = gpio.output = lambda *args, **kwargs: None
+        sys.modules['RPi'] = types.ModuleType('RPi')
+        sys.modules['RPi'].GPIO = sys.modules['RPi.GPIO'] = gpio
+    spec = importlib.util.spec_from_file_location('detector', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def stuck_timeout(slot):
+    """Seconds the detector's current inference may run, scaled to how long its last one took"""
+    return max(STUCK_TIMEOUT_MIN, STUCK_FACTOR * float(slot['inference_ms']) / 1000)
+
+def frame_failure(slot, now):
+    """Why the detector's output is too old to forward, or None: its last processed frame was
+    captured more than FRAME_TIMEOUT ago, so the camera or the frame hand-off has stalled."""
+    captured = float(slot['captured'])
+    if not captured:
+        return "no frame processed yet"
+    if now - captured > FRAME_TIMEOUT:
+        return f"last processed frame captured {1000 * (now - captured):.0f} ms ago"
+    return None
+
+def slot_failure(slot, now, timeout):
+    """Why a ready detector is not live, or None: a stale heartbeat means the process is dead or
+    paused, a long-running inference that it is stuck. A slow but progressing frame is neither."""
+    stale = now - float(slot['heartbeat'])
+    if stale >= timeout:
+        return f"no heartbeat for {1000 * stale:.0f} ms"
+    busy_since = float(slot['busy_since'])
+    if busy_since and now - busy_since >= stuck_timeout(slot):
+        return f"inference running for {1000 * (now - busy_since):.0f} ms"
+    return None
+
+def heartbeat_loop(shared, me, done):
+    """Heartbeat thread: proves the process is scheduled, independent of how long inference takes"""
+    slot = shared.slots[me]
+    while not done.is_set() and not shared.control['stop']:
+        slot['heartbeat'] = time.monotonic()
+        done.wait(HEARTBEAT_INTERVAL)
+
+def watch_owner(shared, me, failover_timeout):
+    """Standby side: take the output over when the owner's heartbeat goes stale or it is stuck.
+
+    With two detectors only the standby ever writes the control record, so it takes no lock:
+    a lock held by a detector that is then killed would never be released.
+    """
+    while not shared.control['stop']:
+        time.sleep(WATCH_INTERVAL)
+        owner = int(shared.control['owner'])
+        if owner == me or not shared.slots[me]['ready']:
+            continue
+        failure = slot_failure(shared.slots[owner], time.monotonic(), failover_timeout)
+        if failure is None:
+            continue
+        shared.control['epoch'] += 1
+        shared.control['takeover_at'] = time.monotonic()
+        shared.control['failovers'] += 1
+        shared.control['owner'] = me
+        log_message(f"[detector {me}] Took over output from detector {owner} "
+                    f"({failure}, epoch {int(shared.control['epoch'])})")
+
+def detector(me, shm_name, failover_timeout):
+    """Detector process: warm model, runs on every shared frame, heartbeats, and watches the owner.
+
+    Each frame goes through the detector script's own detect_humans, so escalation, hazard
+    rules and the presence state decide the output exactly as they do in a single detector.
+    Both detectors run all the time, so the standby's state is always current and only the
+    output has to move. The supervisor forwards only the current owner's slot, so a paused
+    former owner that wakes up is fenced off by the epoch change and then replaced.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The supervisor handles Ctrl+C
+    shared = SharedState(shm_name)
+    slot = shared.slots[me]
+    slot['pid'] = os.getpid()
+    width, height = FRAME_SIZE
+
+    detection = load_detector(os.path.join(os.path.dirname(os.path.abspath(__file__)), DETECTOR_SCRIPT))
+    camera = detection.CameraContext(f"detector-{me}", queue.Queue())
+    config = detection.UIConfig(detection.DETECTION_AREA).current
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    detection.net.setInput(detection.make_blob(frame))
+    detection.net.forward()  # Warm up so a takeover never waits for layer setup
+    done = threading.Event()
+    heartbeat = threading.Thread(target=heartbeat_loop, args=(shared, me, done), daemon=True)
+    heartbeat.start()
+    slot['ready'] = 1
+    log_message(f"[detector {me}] Ready ({'owner' if int(shared.control['owner']) == me else 'standby'}, pid {os.getpid()})")
+
+    watcher = threading.Thread(target=watch_owner, args=(shared, me, failover_timeout), daemon=True)
+    watcher.start()
+    last_seq = 0
+    try:
+        while not shared.control['stop']:
+            got = shared.read_frame(frame, last_seq)
+            if got is None:
+                time.sleep(0.002)
+                continue
+            last_seq, captured = got
+            started = time.monotonic()
+            slot['busy_since'] = started
+            detection.detect_humans(camera, cv2.flip(frame, 1), {'captured': captured}, config)
+            state, count, _, _, _ = camera.output_queue.get_nowait()
+            slot['inference_ms'] = 1000 * (time.monotonic() - started)
+            slot['count'] = count
+            slot['state'] = state
+            slot['frame_seq'] = last_seq
+            slot['captured'] = captured
+            slot['busy_since'] = 0.0
+    finally:
+        slot['ready'] = 0
+        done.set()
+        heartbeat.join(timeout=1)
+        watcher.join(timeout=1)
+        del slot  # A view into the segment; it must go before the segment can close
+        shared.close()
+
+class Supervisor:
+    """Owns the camera and the serial port, runs both detectors and forwards the owner's state"""
+
+    def __init__(self, source, serial_port):
+        self.ctx = mp.get_context('spawn')  # The supervisor has threads; never fork it
+        self.shared = SharedState()
+        self.stop_event = threading.Event()
+        self.processes = [None] * DETECTORS
+        self.restart_at = [0.0] * DETECTORS
+        self.source = source
+        self.ser = None
+        if serial_port:
+            try:
+                self.ser = serial.Serial(serial_port, BAUD_RATE, timeout=1)
+                time.sleep(2)  # Wait for connection to establish
+                log_message(f"Connected to serial port {serial_port}")
+            except serial.SerialException as e:
+                log_message(f"Error opening serial port: {e}")
+        self.sent_state = None
+        self.sent_owner = None
+        self.last_write = None   # (monotonic time, owner) of the last output write
+        self.safe = False
+
+    def start_detector(self, me):
+        self.shared.slots[me]['ready'] = 0
+        self.shared.slots[me]['heartbeat'] = 0.0
+        self.shared.slots[me]['busy_since'] = 0.0
+        self.shared.slots[me]['captured'] = 0.0
+        process = self.ctx.Process(target=detector,
+                                   args=(me, self.shared.shm.name, FAILOVER_TIMEOUT),
+                                   name=f"detector-{me}", daemon=True)
+        process.start()
+        self.processes[me] = process
+
+    def capture_loop(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            log_message(f"Error: Could not open camera {self.source}")
+            self.stop_event.set()
+            return
+        recorded = isinstance(self.source, str) and os.path.isfile(self.source)
+        interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30.0) if recorded else 0.0
+        while not self.stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret and recorded:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Loop recorded clips, for drills without a camera
+                ret, frame = cap.read()
+            if not ret:
+                log_message("Error reading frame")
+                time.sleep(1)
+                continue
+            if frame.shape[1::-1] != FRAME_SIZE:
+                frame = cv2.resize(frame, FRAME_SIZE)
+            self.shared.write_frame(frame, time.monotonic())
+            if interval:
+                time.sleep(interval)  # Play clips at their own rate, not as fast as they decode
+        cap.release()
+
+    def write(self, state, owner):
+        if self.ser is not None:
+            try:
+                self.ser.write(b'1' if state else b'0')
+                self.ser.flush()
+            except serial.SerialException as e:
+                log_message(f"Serial write error: {e}")
+                return
+        self.sent_state = state
+        self.sent_owner = owner
+        self.last_write = (time.monotonic(), owner)
+
+    def tick(self):
+        """Forward the current owner's state; hold the safe state if nobody is live or its frames
+        are stale, and restart the dead"""
+        now = time.monotonic()
+        owner = int(self.shared.control['owner'])
+        slot = self.shared.slots[owner]
+        failure = (slot_failure(slot, now, SAFE_TIMEOUT) or frame_failure(slot, now)) if slot['ready'] else "not ready"
+        if failure is not None:
+            if not self.safe:
+                log_message(f"Detector {owner} output unusable ({failure}), holding safe output")
+                self.safe = True
+            if self.sent_state != SAFE_OUTPUT_STATE:
+                self.write(SAFE_OUTPUT_STATE, owner)
+        else:
+            if self.safe:
+                log_message(f"Detector {owner} live, resuming normal output")
+                self.safe = False
+            state = bool(slot['state'])
+            if state != self.sent_state or owner != self.sent_owner:
+                self.write(state, owner)
+
+        for me, process in enumerate(self.processes):
+            # A standby mid-inference keeps heartbeating; only a dead, paused or stuck one is replaced
+            failure = slot_failure(self.shared.slots[me], now, FAILOVER_TIMEOUT) \
+                if me != owner and self.shared.slots[me]['ready'] else None
+            if failure is not None and process.is_alive():
+                log_message(f"Detector {me} (pid {process.pid}) is unresponsive ({failure}), replacing it")
+                process.kill()
+            if not process.is_alive():
+                if not self.restart_at[me]:
+                    self.restart_at[me] = now + RESTART_DELAY
+                    log_message(f"Detector {me} exited (code {process.exitcode}), restarting as standby")
+                elif now >= self.restart_at[me]:
+                    self.restart_at[me] = 0.0
+                    process.join()
+                    self.start_detector(me)
+
+    def both_ready(self):
+        return all(p.is_alive() and self.shared.slots[i]['ready'] for i, p in enumerate(self.processes))
+
+    def run(self, drill=0, hang=False):
+        for me in range(DETECTORS):
+            self.start_detector(me)
+        capture = threading.Thread(target=self.capture_loop, daemon=True)
+        capture.start()
+        log_message(f"Hot standby running: failover after {1000 * FAILOVER_TIMEOUT:.0f} ms without a heartbeat")
+
+        results = []
+        next_drill = None
+        pending = None
+        try:
+            while not self.stop_event.is_set():
+                self.tick()
+                now = time.monotonic()
+                if drill and len(results) < drill:
+                    if pending is None and self.both_ready():
+                        if next_drill is None:
+                            next_drill = now + DRILL_SETTLE
+                        elif now >= next_drill:
+                            pending = self.inject_failure(hang)
+                            next_drill = None
+                    elif pending is not None:
+                        result = self.check_failover(pending, now)
+                        if result is not None:
+                            results.append(result)
+                            pending = None
+                elif drill:
+                    break
+                time.sleep(OUTPUT_INTERVAL)
+        except KeyboardInterrupt:
+            log_message("System stopped by user")
+        finally:
+            self.stop_event.set()
+            self.shared.control['stop'] = 1
+            capture.join(timeout=3)
+            for process in self.processes:
+                if process is not None:
+                    process.join(timeout=3)
+                    if process.is_alive():
+                        process.kill()
+            if self.ser is not None:
+                self.ser.write(b'0')  # Ensure serial state is reset on exit
+                self.ser.close()
+            self.shared.close()
+        return results
+
+    def inject_failure(self, hang):
+        owner = int(self.shared.control['owner'])
+        process = self.processes[owner]
+        failed_at = time.monotonic()
+        os.kill(process.pid, signal.SIGSTOP if hang else signal.SIGKILL)
+        log_message(f"Drill: {'paused' if hang else 'killed'} owner detector {owner} (pid {process.pid})")
+        return {'owner': owner, 'failed_at': failed_at, 'epoch': int(self.shared.control['epoch'])}
+
+    def check_failover(self, pending, now):
+        if int(self.shared.control['epoch']) == pending['epoch']:
+            if now - pending['failed_at'] > 10 * max(FAILOVER_TIMEOUT, SAFE_TIMEOUT):
+                log_message("Drill: no takeover happened")
+                return {'takeover_ms': None, 'output_ms': None}
+            return None
+        if self.last_write is None or self.last_write[1] == pending['owner'] or self.last_write[0] < pending['failed_at']:
+            return None  # Taken over, but the new owner's state has not been written yet
+        takeover = float(self.shared.control['takeover_at']) - pending['failed_at']
+        output = self.last_write[0] - pending['failed_at']
+        log_message(f"Drill: detector {int(self.shared.control['owner'])} took over in {1000 * takeover:.0f} ms, "
+                    f"output written after {1000 * output:.0f} ms")
+        return {'takeover_ms': 1000 * takeover, 'output_ms': 1000 * output}
+
+def report_drill(results, window):
+    """Log failover times against the window; returns True when every failover was inside it"""
+    times = [r['output_ms'] for r in results if r['output_ms'] is not None]
+    missed = len(results) - len(times)
+    late = sum(1 for t in times if t > 1000 * window)
+    if times:
+        log_message(f"Failover drill: {len(results)} failover(s), output moved in min {min(times):.0f} ms, "
+                    f"mean {sum(times) / len(times):.0f} ms, max {max(times):.0f} ms (window {1000 * window:.0f} ms)")
+    if missed or late:
+        log_message(f"FAIL: {missed} failover(s) did not happen, {late} exceeded the window")
+        return False
+    log_message("PASS: every failover inside the window")
+    return True
+
+def main():
+    global FAILOVER_TIMEOUT
+
+    parser = argparse.ArgumentParser(description="Primary and hot-standby detectors on one camera, with heartbeat takeover of the actuator")
+    parser.add_argument('--source', default=str(CAMERA_SOURCE), help="camera index, stream URL or video file")
+    parser.add_argument('--serial-port', default=SERIAL_PORT, help="actuator port ('' for none)")
+    parser.add_argument('--failover-timeout', type=float, default=FAILOVER_TIMEOUT, help="seconds without heartbeat before takeover")
+    parser.add_argument('--failover-drill', type=int, default=0, metavar='N',
+                        help="fail the output owner N times, measure each takeover, then exit")
+    parser.add_argument('--hang', action='store_true', help="drill by pausing the owner (SIGSTOP) instead of killing it")
+    parser.add_argument('--window', type=float, default=0.5, help="drill pass limit in seconds, failure to output written")
+    args = parser.parse_args()
+
+    if args.failover_timeout < 4 * HEARTBEAT_INTERVAL:
+        parser.error(f"--failover-timeout must be at least {4 * HEARTBEAT_INTERVAL:g}s "
+                     f"(four {1000 * HEARTBEAT_INTERVAL:.0f} ms heartbeats)")
+    FAILOVER_TIMEOUT = args.failover_timeout
+    source = int(args.source) if args.source.isdigit() else args.source
+    supervisor = Supervisor(source, args.serial_port)
+    results = supervisor.run(args.failover_drill, args.hang)
+    if args.failover_drill:
+        sys.exit(0 if report_drill(results, args.window) else 1)
+    log_message("System shutdown")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import cv2
+import json
+import time
+import queue
+import argparse
+import threading
+import numpy as np
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Configuration
+PROTOTXT = "MobileNetSSD_deploy.prototxt"
+MODEL = "MobileNetSSD_deploy.caffemodel"
+CONFIDENCE_THRESHOLD = 0.5
+INPUT_SIZE = 300
+
+HOST = '0.0.0.0'
+PORT = 8090
+MAX_BATCH = 8           # frames per forward pass
+MAX_WAIT_MS = 10        # how long the first frame of a batch waits for others to join
+REQUEST_TIMEOUT = 5     # seconds a request waits for its result
+REPORT_INTERVAL = 60    # seconds between batching statistics log lines
+
+def log_message(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}")
+
+class Job:
+    """One frame waiting for inference"""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.done = threading.Event()
+        self.boxes = []
+        self.confidences = []
+        self.class_ids = []
+        self.error = None   # set when inference failed; the client must not read that as "no people"
+
+class Batcher:
+    """Collects concurrent requests into batches and runs them through the model on one thread"""
+
+    def __init__(self, max_batch, max_wait):
+        self.net = cv2.dnn.readNetFromCaffe(PROTOTXT, MODEL)
+        self.jobs = queue.Queue()
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.frames = 0
+        self.busy = 0.0
+
+    def submit(self, frame):
+        job = Job(frame)
+        self.jobs.put(job)
+        if not job.done.wait(REQUEST_TIMEOUT):
+            raise TimeoutError("inference timed out")
+        if job.error is not None:
+            raise RuntimeError(job.error)
+        return job
+
+    def collect(self):
+        """Block for the first job, then take more until the batch is full or the wait window closes"""
+        batch = [self.jobs.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.jobs.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        last_report = time.monotonic()
+        while True:
+            batch = self.collect()
+            started = time.monotonic()
+            try:
+                self.infer(batch)
+            except Exception as e:
+                log_message(f"Inference error: {e}")
+                for job in batch:
+                    job.boxes, job.confidences, job.class_ids = [], [], []
+                    job.error = str(e)
+            finally:
+                for job in batch:
+                    job.done.set()
+            self.busy += time.monotonic() - started
+            self.batches += 1
+            self.frames += len(batch)
+
+            if time.monotonic() - last_report >= REPORT_INTERVAL:
+                log_message(f"{self.frames} frames in {self.batches} batches "
+                            f"(mean batch {self.frames / self.batches:.2f}, "
+                            f"{1000 * self.busy / self.batches:.1f} ms per batch)")
+                self.batches = self.frames = 0
+                self.busy = 0.0
+                last_report = time.monotonic()
+
+    def infer(self, batch):
+        resized = [cv2.resize(job.frame, (INPUT_SIZE, INPUT_SIZE)) for job in batch]
+        blob = cv2.dnn.blobFromImages(resized, 0.007843, (INPUT_SIZE, INPUT_SIZE), 127.5)
+
+        self.net.setInput(blob)
+        detections = self.net.forward()
+
+        # Every class is returned, not only people: clients' hazard rules match other objects too
+        for i in range(detections.shape[2]):
+            confidence = detections[0, 0, i, 2]
+
+            if confidence > CONFIDENCE_THRESHOLD:
+                # Column 0 holds the index of the frame within the batch
+                job = batch[int(detections[0, 0, i, 0])]
+                (h, w) = job.frame.shape[:2]
+                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
+                (startX, startY, endX, endY) = box.astype("int")
+                job.boxes.append([int(startX), int(startY), int(endX), int(endY)])
+                job.confidences.append(float(confidence))
+                job.class_ids.append(int(detections[0, 0, i, 1]))
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """POST /detect with a JPEG/PNG body, or raw BGR bytes with X-Frame-Width/X-Frame-Height headers;
+    answers with the boxes, confidences and class ids of every detection above the threshold"""
+
+    def do_POST(self):
+        if self.path != '/detect':
+            self.send_error(404)
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not body:
+            self.send_error(400, "empty body")
+            return
+        content_type = self.headers.get('Content-Type', '')
+        if content_type == 'application/octet-stream':
+            try:
+                width = int(self.headers['X-Frame-Width'])
+                height = int(self.headers['X-Frame-Height'])
+                frame = np.frombuffer(body, dtype=np.uint8).reshape(height, width, 3)
+            except (TypeError, KeyError, ValueError):
+                self.send_error(400, "raw frames need X-Frame-Width and X-Frame-Height matching the body")
+                return
+        else:
+            try:
+                frame = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+            except cv2.error:
+                frame = None
+            if frame is None:
+                self.send_error(400, "could not decode image")
+                return
+
+        try:
+            job = batcher.submit(frame)
+        except TimeoutError:
+            self.send_error(503, "inference timed out")
+            return
+        except RuntimeError as e:
+            # Never answer 200 with no boxes: to the client that means the zone is clear
+            self.send_error(500, f"inference failed: {e}")
+            return
+
+        response = json.dumps({'boxes': job.boxes, 'confidences': job.confidences, 'class_ids': job.class_ids}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass  # One line per frame would drown the batching statistics
+
+def main():
+    global batcher
+
+    parser = argparse.ArgumentParser(description="Serve person detection to thin camera devices with dynamic batching")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help="frames per forward pass")
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS, help="batch collection window")
+    args = parser.parse_args()
+
+    batcher = Batcher(args.max_batch, args.max_wait_ms / 1000)
+    threading.Thread(target=batcher.run, daemon=True).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), InferenceRequestHandler)
+    log_message(f"Inference server listening on http://{args.host}:{args.port}/detect "
+                f"(batches of up to {args.max_batch}, {args.max_wait_ms:.0f} ms window)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log_message("Inference server stopped by user")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
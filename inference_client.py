@@ -0,0 +1,52 @@
+import cv2
+import json
+import time
+import numpy as np
+import urllib.request
+from datetime import datetime
+
+def log_message(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}")
+
+class InferenceClient:
+    """Detections for a frame from inference-server.py, shared by the detection scripts.
+
+    The server answers with every detection above its threshold and its class id, so the
+    result is read exactly like the local model's output. A failed inference comes back as
+    a 5xx (HTTPError, an OSError) and is never read as no people: the caller runs its local
+    model instead, and the server is not asked again for `retry_interval` seconds.
+    """
+
+    def __init__(self, url, timeout, retry_interval):
+        self.url = url
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.retry_at = 0.0
+
+    def detections(self, frame):
+        """SSD detections array (1, 1, N, 7) for `frame` from the server, or None to run locally"""
+        if self.url is None or time.time() < self.retry_at:
+            return None
+
+        (h, w) = frame.shape[:2]
+        jpeg = cv2.imencode('.jpg', frame)[1].tobytes()
+        request = urllib.request.Request(self.url, data=jpeg, headers={'Content-Type': 'image/jpeg'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                result = json.loads(response.read())
+            boxes, confidences, class_ids = result['boxes'], result['confidences'], result['class_ids']
+        except (OSError, ValueError, KeyError) as e:
+            log_message(f"Inference server unavailable ({e}), using local model for {self.retry_interval}s")
+            self.retry_at = time.time() + self.retry_interval
+            return None
+
+        detections = np.zeros((1, 1, len(boxes), 7), dtype=np.float32)
+        if boxes:
+            boxes = np.array(boxes, dtype=np.float64)
+            # Half-pixel offset so scaling back and truncating with astype("int") gives the same pixels
+            boxes += np.where(boxes < 0, -0.5, 0.5)
+            detections[0, 0, :, 1] = class_ids
+            detections[0, 0, :, 2] = confidences
+            detections[0, 0, :, 3:7] = boxes / np.array([w, h, w, h])
+        return detections
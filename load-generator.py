@@ -0,0 +1,264 @@
+import os
+import cv2
+import sys
+import json
+import time
+import heapq
+import queue
+import types
+import random
+import argparse
+import threading
+import importlib.util
+from datetime import datetime
+
+# Configuration
+DETECTOR_SCRIPT = "dynamic-area-detections.py"  # each frame runs this script's own per-frame path
+MAX_FRAMES = 300             # frames decoded per clip and kept in memory
+MIRROR_FRAMES = True         # live loops flip frames before detection
+
+# Virtual cameras
+CAMERA_RESOLUTION = (640, 480)
+CAMERA_FPS = 15.0
+CAMERA_JITTER = 0.1          # standard deviation of the frame interval, as a fraction of it
+
+# Capacity search
+LATENCY_SLO = 0.5            # seconds from frame capture to result at the 99th percentile
+MAX_DROP_RATE = 0.05         # fraction of frames a camera may lose to newer ones before it is processed
+STEP_DURATION = 15.0         # seconds measured at each camera count
+STEP_WARMUP = 3.0            # seconds run before measuring, so queues settle
+MAX_CAMERAS = 64
+
+def log_message(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+def load_clip(path, count, resolution):
+    """Decode up to `count` frames of the clip into memory at the virtual camera resolution"""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame = cv2.resize(frame, resolution)
+        frames.append(cv2.flip(frame, 1) if MIRROR_FRAMES else frame)
+    cap.release()
+    return frames
+
+def load_detector(path):
+    """Import the detector script without starting it; GPIO is stubbed off the Pi.
+
+    Every call returns a new instance of the module with its own network, so each worker
+    is a separate detector.
+    """
+    if 'RPi' not in sys.modules and importlib.util.find_spec('RPi') is None:
+        gpio = types.ModuleType('RPi.GPIO')
+        gpio.BCM, gpio.OUT = 'BCM', 'OUT'
+        gpio.setmode = gpio.setup = gpio.output = lambda *args, **kwargs: None
+        sys.modules['RPi'] = types.ModuleType('RPi')
+        sys.modules['RPi'].GPIO = sys.modules['RPi.GPIO'] = gpio
+    spec = importlib.util.spec_from_file_location('detector', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class VirtualCameras:
+    """Publishes frames from the loaded clips for N cameras on their own jittered clocks.
+
+    Like the capture thread of the detection scripts, each camera keeps only its newest
+    frame: a frame replaced before a worker took it counts as dropped. A camera's frames
+    are processed one at a time and in order, as by its own detection thread.
+    """
+
+    def __init__(self, clips, count, fps, jitter):
+        self.clips = clips
+        self.fps = fps
+        self.jitter = jitter
+        self.condition = threading.Condition()
+        self.pending = {}   # camera -> (frame, captured_at)
+        self.busy = set()   # cameras whose previous frame a worker is still processing
+        self.stop = threading.Event()
+        self.generated = [0] * count
+        self.dropped = [0] * count
+        now = time.perf_counter()
+        # Random phases so cameras do not all deliver in the same instant
+        self.schedule = [(now + random.random() / fps, camera) for camera in range(count)]
+        heapq.heapify(self.schedule)
+        self.position = [random.randrange(len(clips[camera % len(clips)])) for camera in range(count)]
+
+    def run(self):
+        interval = 1.0 / self.fps
+        while not self.stop.is_set():
+            due, camera = self.schedule[0]
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(min(delay, 0.01))
+                continue
+            clip = self.clips[camera % len(self.clips)]
+            frame = clip[self.position[camera]]
+            self.position[camera] = (self.position[camera] + 1) % len(clip)
+            with self.condition:
+                if camera in self.pending:
+                    self.dropped[camera] += 1
+                self.pending[camera] = (frame, time.perf_counter())
+                self.generated[camera] += 1
+                self.condition.notify()
+            heapq.heapreplace(self.schedule, (due + max(0.0, random.gauss(interval, interval * self.jitter)), camera))
+
+    def take(self):
+        """Oldest pending frame across idle cameras, or None once stopped"""
+        with self.condition:
+            while True:
+                if self.stop.is_set():
+                    return None
+                ready = [camera for camera in self.pending if camera not in self.busy]
+                if ready:
+                    break
+                self.condition.wait(0.1)
+            camera = min(ready, key=lambda c: self.pending[c][1])
+            frame, captured_at = self.pending.pop(camera)
+            self.busy.add(camera)
+        return camera, frame, captured_at
+
+    def done(self, camera):
+        with self.condition:
+            self.busy.discard(camera)
+            self.condition.notify()
+
+def detection_worker(detector, cameras, contexts, config, results):
+    """One detector instance: the detector's detect_humans (inference, escalation, hazard rules,
+    zone, presence, prediction and drawing) and its serial output for whichever camera waited longest"""
+    while True:
+        item = cameras.take()
+        if item is None:
+            break
+        camera, frame, captured_at = item
+        context = contexts[camera]
+        # Drawn on like a freshly captured frame; the clip frame is shared by cameras
+        detector.detect_humans(context, frame.copy(), {'captured': captured_at}, config)
+        state, count, _, _, _ = context.output_queue.get_nowait()
+        detector.send_serial_data(context, state, count)
+        results.append((camera, time.perf_counter(), time.perf_counter() - captured_at))
+        cameras.done(camera)
+
+def run_step(detectors, clips, count, fps, jitter, duration, warmup):
+    """Drive `count` virtual cameras through the workers and measure latency, drops and throughput"""
+    cameras = VirtualCameras(clips, count, fps, jitter)
+    # Per-camera state (presence, tracks, hazard rules) lives in its context, whichever worker runs the frame
+    contexts = [detectors[0].CameraContext(f"virtual{camera}", queue.Queue()) for camera in range(count)]
+    config = detectors[0].UIConfig(detectors[0].DETECTION_AREA).current
+    results = []
+    threads = [threading.Thread(target=cameras.run, daemon=True)]
+    threads += [threading.Thread(target=detection_worker, args=(detector, cameras, contexts, config, results), daemon=True)
+                for detector in detectors]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(warmup)
+    with cameras.condition:
+        generated_before, dropped_before = sum(cameras.generated), sum(cameras.dropped)
+    measured_from = len(results)
+    started = time.perf_counter()
+    time.sleep(duration)
+    with cameras.condition:
+        generated = sum(cameras.generated) - generated_before
+        dropped = sum(cameras.dropped) - dropped_before
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latency for _, _, latency in results[measured_from:])
+
+    cameras.stop.set()
+    with cameras.condition:
+        cameras.condition.notify_all()
+    for thread in threads:
+        thread.join()
+
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else float('inf')
+    step = {
+        'cameras': count,
+        'offered_fps': generated / elapsed,
+        'processed_fps': len(latencies) / elapsed,
+        'drop_rate': dropped / generated if generated else 0.0,
+        'latency_p50_ms': 1000 * latencies[len(latencies) // 2] if latencies else None,
+        'latency_p99_ms': 1000 * p99 if latencies else None
+    }
+    step['sustainable'] = bool(latencies) and p99 <= LATENCY_SLO and step['drop_rate'] <= MAX_DROP_RATE
+    log_message(f"{count:3d} camera(s): offered {step['offered_fps']:7.1f} FPS, processed {step['processed_fps']:7.1f} FPS, "
+                f"dropped {100 * step['drop_rate']:5.1f}%, latency p50 {step['latency_p50_ms'] or 0:7.1f} ms, "
+                f"p99 {step['latency_p99_ms'] or 0:7.1f} ms - {'OK' if step['sustainable'] else 'SATURATED'}")
+    return step
+
+def find_capacity(detectors, clips, fps, jitter, duration, warmup, max_cameras):
+    """Double the camera count until the SLO breaks, then bisect; returns (max sustainable count, steps)"""
+    steps = {}
+
+    def sustainable(count):
+        if count not in steps:
+            steps[count] = run_step(detectors, clips, count, fps, jitter, duration, warmup)
+        return steps[count]['sustainable']
+
+    good, bad = 0, None
+    count = 1
+    while count <= max_cameras:
+        if not sustainable(count):
+            bad = count
+            break
+        good = count
+        count *= 2
+    if bad is None:
+        if good < max_cameras and sustainable(max_cameras):
+            return max_cameras, [steps[c] for c in sorted(steps)]
+        bad = max_cameras if good < max_cameras else max_cameras + 1
+    while bad - good > 1:
+        middle = (good + bad) // 2
+        if sustainable(middle):
+            good = middle
+        else:
+            bad = middle
+    return good, [steps[c] for c in sorted(steps)]
+
+def main():
+    global LATENCY_SLO
+
+    parser = argparse.ArgumentParser(description="Fan recorded clips out into virtual cameras and find how many "
+                                                 "this host can run within the latency SLO")
+    parser.add_argument('clips', nargs='+', help="clips assigned to cameras in turn")
+    parser.add_argument('--resolution', default=f"{CAMERA_RESOLUTION[0]}x{CAMERA_RESOLUTION[1]}", help="WIDTHxHEIGHT")
+    parser.add_argument('--fps', type=float, default=CAMERA_FPS, help="frames per second per camera")
+    parser.add_argument('--jitter', type=float, default=CAMERA_JITTER, help="frame interval jitter (fraction)")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help=f"{DETECTOR_SCRIPT} instances, each with its own network")
+    parser.add_argument('--threads', type=int, default=0, help="OpenCV threads (0: CPUs / workers)")
+    parser.add_argument('--slo', type=float, default=LATENCY_SLO, help="p99 latency limit in seconds")
+    parser.add_argument('--duration', type=float, default=STEP_DURATION, help="seconds measured per step")
+    parser.add_argument('--max-cameras', type=int, default=MAX_CAMERAS)
+    parser.add_argument('-o', '--output', help="write the steps and result as JSON")
+    args = parser.parse_args()
+
+    LATENCY_SLO = args.slo
+    resolution = tuple(int(v) for v in args.resolution.lower().split('x'))
+    clips = [load_clip(path, MAX_FRAMES, resolution) for path in args.clips]
+    if not all(clips):
+        log_message("Error: could not read frames from every clip")
+        sys.exit(2)
+
+    cv2.setNumThreads(args.threads or max(1, (os.cpu_count() or 1) // args.workers))
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), DETECTOR_SCRIPT)
+    detectors = [load_detector(path) for _ in range(args.workers)]
+    for detector in detectors:
+        detector.net.setInput(detector.make_blob(clips[0][0]))
+        detector.net.forward()  # Warm up before anything is timed
+
+    log_message(f"Capacity search: {args.resolution} at {args.fps:g} FPS (jitter {100 * args.jitter:.0f}%), "
+                f"{args.workers} worker(s), p99 SLO {1000 * LATENCY_SLO:.0f} ms, max drop {100 * MAX_DROP_RATE:.0f}%")
+    capacity, steps = find_capacity(detectors, clips, args.fps, args.jitter, args.duration, STEP_WARMUP, args.max_cameras)
+    log_message(f"Maximum sustainable cameras on this host: {capacity}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'resolution': args.resolution, 'fps': args.fps, 'jitter': args.jitter, 'workers': args.workers,
+                       'latency_slo': LATENCY_SLO, 'max_drop_rate': MAX_DROP_RATE,
+                       'max_cameras': capacity, 'steps': steps}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import os
 import cv2
 import time
 from datetime import datetime
+from inference_client import InferenceClient
 
 import numpy as np
 
@@ -13,23 +14,51 @@ CONFIDENCE_THRESHOLD = 0.5
 HUMAN_CLASS_ID = 15  # Person class ID in MobileNet SSD
 NO_HUMAN_WAIT_TIME = 10  # seconds to wait when no human is detected
 
+# Remote inference (inference-server.py), None always runs the model locally
+INFERENCE_SERVER_URL = None     # e.g. "http://192.168.1.10:8090/detect"
+INFERENCE_TIMEOUT = 0.5         # seconds before falling back to the local model
+INFERENCE_RETRY_INTERVAL = 10   # seconds on the local model before trying the server again
+
 # Load pre-trained model
 net = cv2.dnn.readNetFromCaffe(PROTOTXT, MODEL)
 
-# Initialize variables
-last_human_detected_time = None
-process_started = False
-
 def log_message(message):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {message}")
 
+class PresenceState:
+    """Start/stop state machine for one stream: the process may run after NO_HUMAN_WAIT_TIME without a person"""
+
+    __slots__ = ('last_detected', 'process_started')
+
+    def __init__(self):
+        self.last_detected = None
+        self.process_started = False
+
+    def update(self, human_detected, now):
+        """Advance one frame; returns 'stop' or 'start' when the process should change, else None"""
+        if human_detected:
+            self.last_detected = now
+            if self.process_started:
+                self.process_started = False
+                return 'stop'
+            return None
+        if self.last_detected is None:
+            self.last_detected = now
+        if now - self.last_detected >= NO_HUMAN_WAIT_TIME and not self.process_started:
+            self.process_started = True
+            return 'start'
+        return None
+
+inference = InferenceClient(INFERENCE_SERVER_URL, INFERENCE_TIMEOUT, INFERENCE_RETRY_INTERVAL)
+
 def detect_humans(frame):
     (h, w) = frame.shape[:2]
-    blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 0.007843, (300, 300), 127.5)
-    
-    net.setInput(blob)
-    detections = net.forward()
+    detections = inference.detections(frame)
+    if detections is None:
+        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 0.007843, (300, 300), 127.5)
+        net.setInput(blob)
+        detections = net.forward()
     
     human_detected = False
     
@@ -63,6 +92,7 @@ if not cap.isOpened():
     exit()
 
 log_message("System started. Monitoring for humans...")
+presence = PresenceState()
 
 try:
     while True:
@@ -83,20 +113,11 @@ try:
             break
         
         # Handle human detection logic
-        if human_detected:
-            last_human_detected_time = time.time()
-            if process_started:
-                log_message("Human detected, process stop")
-                process_started = False
-        else:
-            current_time = time.time()
-            if last_human_detected_time is None:
-                last_human_detected_time = current_time
-            
-            # If no human for 30 seconds
-            if (current_time - last_human_detected_time) >= NO_HUMAN_WAIT_TIME and not process_started:
-                log_message("No human detected for 30 seconds, process start")
-                process_started = True
+        change = presence.update(human_detected, time.time())
+        if change == 'stop':
+            log_message("Human detected, process stop")
+        elif change == 'start':
+            log_message("No human detected for 30 seconds, process start")
         
         time.sleep(0.1)  # Reduce CPU usage
 
@@ -0,0 +1,437 @@
+import gc
+import os
+import cv2
+import json
+import time
+import queue
+import signal
+import argparse
+import threading
+import numpy as np
+import multiprocessing as mp
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import serial
+
+# Configuration
+PROTOTXT = "MobileNetSSD_deploy.prototxt"
+MODEL = "MobileNetSSD_deploy.caffemodel"
+CONFIDENCE_THRESHOLD = 0.5
+HUMAN_CLASS_ID = 15
+INPUT_SIZE = 300
+BAUD_RATE = 9600
+
+# One detector process per camera; serial_port may be None
+CAMERAS = [
+    {'name': 'cam0', 'source': 0, 'serial_port': None},
+    {'name': 'cam1', 'source': 1, 'serial_port': None},
+]
+
+WORKER_THREADS = 1            # OpenCV threads per detector process
+MEMORY_REPORT_INTERVAL = 60   # seconds between per-process memory reports
+
+# Inference scheduling: cameras wait for one of INFERENCE_SLOTS, granted earliest deadline first
+INFERENCE_SLOTS = max(1, (os.cpu_count() or 1) // WORKER_THREADS)  # concurrent forward passes, 0 disables
+ACTIVE_REFRESH = 0.1          # seconds: result deadline for cameras with people in or near the zone
+IDLE_REFRESH = 1.0            # seconds: guaranteed refresh for cameras with nobody around
+NEAR_ZONE_MARGIN = 0.1        # fraction of the frame around the zone that counts as "near"
+SCHEDULE_REPORT_INTERVAL = 10 # seconds between per-camera result age log lines
+SCHEDULER_HTTP_PORT = 8086    # per-camera result age on http://127.0.0.1:<port>/cameras, None to disable
+
+# Detection area configuration (percentage of frame width/height)
+DETECTION_AREA = {
+    'x_start': 0.25,
+    'y_start': 0.25,
+    'x_end': 0.75,
+    'y_end': 0.75
+}
+
+# Model loaded by the parent before forking; workers inherit it copy-on-write
+net = None
+scheduler = None
+
+def log_message(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+def load_model():
+    """Load the network and run one forward pass so every lazily built buffer exists before fork"""
+    model = cv2.dnn.readNetFromCaffe(PROTOTXT, MODEL)
+    # Layer setup (buffer allocation, weight fusion) happens on the first forward; doing it
+    # here keeps workers from writing to, and so privately copying, the shared pages
+    model.setInput(np.zeros((1, 3, INPUT_SIZE, INPUT_SIZE), dtype=np.float32))
+    model.forward()
+    return model
+
+def memory_usage():
+    """Resident, proportional, shared and private memory of this process in MB (Linux)"""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        'rss': fields.get('Rss', 0.0),
+        'pss': fields.get('Pss', 0.0),
+        'shared': fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0),
+        'private': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)
+    }
+
+def is_in_detection_area(box, frame_width, frame_height):
+    """Check if detection is within our defined area"""
+    x_center = (box[0] + box[2]) / 2
+    y_center = (box[1] + box[3]) / 2
+
+    x_min = frame_width * DETECTION_AREA['x_start']
+    x_max = frame_width * DETECTION_AREA['x_end']
+    y_min = frame_height * DETECTION_AREA['y_start']
+    y_max = frame_height * DETECTION_AREA['y_end']
+
+    return (x_min <= x_center <= x_max) and (y_min <= y_center <= y_max)
+
+def is_near_detection_area(box, frame_width, frame_height):
+    """Check if detection is within NEAR_ZONE_MARGIN of our defined area"""
+    x_center = (box[0] + box[2]) / 2
+    y_center = (box[1] + box[3]) / 2
+
+    x_min = frame_width * (DETECTION_AREA['x_start'] - NEAR_ZONE_MARGIN)
+    x_max = frame_width * (DETECTION_AREA['x_end'] + NEAR_ZONE_MARGIN)
+    y_min = frame_height * (DETECTION_AREA['y_start'] - NEAR_ZONE_MARGIN)
+    y_max = frame_height * (DETECTION_AREA['y_end'] + NEAR_ZONE_MARGIN)
+
+    return (x_min <= x_center <= x_max) and (y_min <= y_center <= y_max)
+
+def detect_humans(frame):
+    """Return (humans in zone, humans near but outside the zone)"""
+    (h, w) = frame.shape[:2]
+    blob = cv2.dnn.blobFromImage(cv2.resize(frame, (INPUT_SIZE, INPUT_SIZE)), 0.007843, (INPUT_SIZE, INPUT_SIZE), 127.5)
+
+    net.setInput(blob)
+    detections = net.forward()
+
+    human_count = 0
+    near_count = 0
+    for i in range(detections.shape[2]):
+        confidence = detections[0, 0, i, 2]
+
+        if confidence > CONFIDENCE_THRESHOLD:
+            class_id = int(detections[0, 0, i, 1])
+
+            if class_id == HUMAN_CLASS_ID:
+                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
+                (startX, startY, endX, endY) = box.astype("int")
+                if is_in_detection_area((startX, startY, endX, endY), w, h):
+                    human_count += 1
+                elif is_near_detection_area((startX, startY, endX, endY), w, h):
+                    near_count += 1
+    return human_count, near_count
+
+def capture_latest(cap, latest, stop_event, name):
+    """Keep reading so a granted inference always gets the newest frame, not a buffered one"""
+    while not stop_event.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            log_message(f"[{name}] Error reading frame")
+            time.sleep(1)
+            continue
+        latest['frame'] = (frame, time.monotonic())
+        latest['ready'].set()
+
+def camera_worker(camera, shared_model, reports, stop_event, grant=None):
+    """Detection loop for one camera, run in its own process.
+
+    Args:
+        camera (dict): Entry from CAMERAS.
+        shared_model (bool): Use the parent's model instead of loading a private copy.
+        reports (multiprocessing.Queue): Memory reports and scheduling messages sent to the parent.
+        stop_event (multiprocessing.Event): Set by the parent to stop the worker.
+        grant (multiprocessing.Event): Set by the scheduler when this camera may run inference;
+            None runs inference on every frame.
+    """
+    global net
+    name = camera['name']
+    # Ctrl+C is handled by the parent, which stops workers through stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cv2.setNumThreads(WORKER_THREADS)
+    if not shared_model:
+        net = load_model()
+
+    ser = None
+    if camera['serial_port']:
+        try:
+            ser = serial.Serial(camera['serial_port'], BAUD_RATE, timeout=1)
+            time.sleep(2)  # Wait for connection to establish
+        except serial.SerialException as e:
+            log_message(f"[{name}] Error opening serial port: {e}")
+
+    cap = cv2.VideoCapture(camera['source'])
+    if not cap.isOpened():
+        log_message(f"[{name}] Error: Could not open camera {camera['source']}")
+        return
+
+    log_message(f"[{name}] Monitoring for humans ({'shared' if shared_model else 'private'} model)")
+    latest = {'frame': None, 'ready': threading.Event()}
+    capture_thread = None
+    if grant is not None:
+        capture_thread = threading.Thread(target=capture_latest, args=(cap, latest, stop_event, name), daemon=True)
+        capture_thread.start()
+    last_human_state = None
+    last_report = 0.0
+    try:
+        while not stop_event.is_set():
+            if grant is None:
+                ret, frame = cap.read()
+                if not ret:
+                    log_message(f"[{name}] Error reading frame")
+                    time.sleep(1)
+                    continue
+            else:
+                if not latest['ready'].wait(1):
+                    continue
+                reports.put(('ready', name, None))
+                while not grant.wait(0.5):
+                    if stop_event.is_set():
+                        return
+                grant.clear()
+                frame, captured_at = latest['frame']
+                latest['ready'].clear()  # Ask again only once a newer frame has arrived
+
+            human_count, near_count = detect_humans(cv2.flip(frame, 1))
+            human_detected = human_count > 0
+            if grant is not None:
+                reports.put(('done', name, {'captured': captured_at, 'in_zone': human_count, 'near_zone': near_count}))
+            if human_detected != last_human_state:
+                log_message(f"[{name}] {'Human detected' if human_detected else 'No human'} in zone")
+                if ser is not None:
+                    try:
+                        ser.write(b'1' if human_detected else b'0')
+                    except serial.SerialException as e:
+                        log_message(f"[{name}] Serial write error: {e}")
+                last_human_state = human_detected
+
+            if time.monotonic() - last_report >= MEMORY_REPORT_INTERVAL:
+                reports.put(('memory', name, memory_usage()))
+                last_report = time.monotonic()
+    finally:
+        if capture_thread is not None:
+            capture_thread.join(timeout=2)
+        cap.release()
+        if ser is not None:
+            try:
+                ser.write(b'0')  # Ensure serial state is reset on exit
+            except serial.SerialException as e:
+                log_message(f"[{name}] Serial write error: {e}")
+            ser.close()
+
+class Scheduler:
+    """Earliest-deadline-first grants of a fixed number of inference slots across cameras.
+
+    A camera's deadline is its last result's capture time plus ACTIVE_REFRESH when people are in
+    or near its zone, or IDLE_REFRESH otherwise. While any camera is active, idle cameras are only
+    granted a slot once their deadline is near, so they get their guaranteed refresh and the rest
+    goes to the active ones; with nobody around, every camera shares the slots freely.
+    """
+
+    def __init__(self, names, slots, grants):
+        now = time.monotonic()
+        self.slots = slots
+        self.grants = grants
+        self.lock = threading.Lock()
+        self.cameras = {name: {'waiting': False, 'running': False, 'exited': False, 'captured': None, 'deadline': now,
+                               'active': False, 'in_zone': 0, 'near_zone': 0, 'inferences': 0, 'misses': 0}
+                        for name in names}
+
+    def ready(self, name):
+        with self.lock:
+            if self.cameras[name]['exited']:
+                return  # Queued before its worker died
+            self.cameras[name]['waiting'] = True
+            self.dispatch()
+
+    def exited(self, name):
+        """Release a dead worker's slot, including one granted while it was running or about to"""
+        with self.lock:
+            camera = self.cameras[name]
+            camera['exited'] = True
+            camera['waiting'] = camera['running'] = camera['active'] = False
+            self.grants[name].clear()
+            self.dispatch()
+
+    def done(self, name, result):
+        now = time.monotonic()
+        with self.lock:
+            camera = self.cameras[name]
+            if camera['exited']:
+                return
+            camera['running'] = False
+            camera['inferences'] += 1
+            if now > camera['deadline']:
+                camera['misses'] += 1
+            camera['captured'] = result['captured']
+            camera['in_zone'] = result['in_zone']
+            camera['near_zone'] = result['near_zone']
+            camera['active'] = result['in_zone'] > 0 or result['near_zone'] > 0
+            camera['deadline'] = result['captured'] + (ACTIVE_REFRESH if camera['active'] else IDLE_REFRESH)
+            self.dispatch()
+
+    def tick(self):
+        """Grant slots to idle cameras whose deadline came close without any other event"""
+        with self.lock:
+            self.dispatch()
+
+    def dispatch(self):
+        now = time.monotonic()
+        any_active = any(c['active'] for c in self.cameras.values())
+        running = sum(c['running'] for c in self.cameras.values())
+        while running < self.slots:
+            # Leave an idle camera one active period to finish before its deadline
+            waiting = [(c['deadline'], name) for name, c in self.cameras.items()
+                       if c['waiting'] and (c['active'] or not any_active or c['deadline'] - now <= ACTIVE_REFRESH)]
+            if not waiting:
+                break
+            _, name = min(waiting)
+            self.cameras[name]['waiting'] = False
+            self.cameras[name]['running'] = True
+            self.grants[name].set()
+            running += 1
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            return {name: {
+                'result_age_ms': None if c['captured'] is None else round(1000 * (now - c['captured']), 1),
+                'priority': 'exited' if c['exited'] else 'active' if c['active'] else 'idle',
+                'in_zone': c['in_zone'],
+                'near_zone': c['near_zone'],
+                'inferences': c['inferences'],
+                'deadline_misses': c['misses']
+            } for name, c in self.cameras.items()}
+
+class SchedulerRequestHandler(BaseHTTPRequestHandler):
+    """Serves GET /cameras with per-camera result age and scheduling counters"""
+
+    def do_GET(self):
+        if self.path != '/cameras':
+            self.send_error(404)
+            return
+        body = json.dumps({'slots': scheduler.slots, 'cameras': scheduler.snapshot()}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep request logs out of the detection log
+
+def log_schedule(snapshot):
+    for name, camera in sorted(snapshot.items()):
+        age = 'n/a' if camera['result_age_ms'] is None else f"{camera['result_age_ms']:.0f} ms"
+        log_message(f"[{name}] {camera['priority']}, result age {age}, {camera['inferences']} inferences, "
+                    f"{camera['deadline_misses']} deadline misses")
+
+def log_memory(latest):
+    """Log the most recent memory report of every worker and the node total"""
+    total_pss = 0.0
+    for name, usage in sorted(latest.items()):
+        if usage is None:
+            continue
+        total_pss += usage['pss']
+        log_message(f"[{name}] RSS {usage['rss']:.1f} MB, PSS {usage['pss']:.1f} MB, "
+                    f"shared {usage['shared']:.1f} MB, private {usage['private']:.1f} MB")
+    log_message(f"Detector processes: {total_pss:.1f} MB total PSS")
+
+def main():
+    global net, scheduler
+
+    parser = argparse.ArgumentParser(description="Run one detector process per camera sharing a single model copy")
+    parser.add_argument('sources', nargs='*', help="camera indexes or stream URLs (default: CAMERAS)")
+    parser.add_argument('--no-share', action='store_true',
+                        help="load a private model in every process, to measure the memory saved by sharing")
+    parser.add_argument('--slots', type=int, default=INFERENCE_SLOTS,
+                        help="concurrent inferences granted by deadline (0: every camera runs flat out)")
+    args = parser.parse_args()
+
+    cameras = CAMERAS
+    if args.sources:
+        cameras = [{'name': f"cam{i}", 'source': int(s) if s.isdigit() else s, 'serial_port': None}
+                   for i, s in enumerate(args.sources)]
+
+    # Copy-on-write sharing needs fork; spawn would re-import and reload the model per process
+    ctx = mp.get_context('fork')
+    shared_model = not args.no_share
+    if shared_model:
+        # No OpenCV worker threads in the parent: they would not survive fork
+        cv2.setNumThreads(0)
+        net = load_model()
+        usage = memory_usage()
+        log_message("Model loaded once in parent" +
+                    (f" (RSS {usage['rss']:.1f} MB)" if usage else ""))
+        # Keep the garbage collector from touching (and so copying) inherited objects
+        gc.freeze()
+
+    reports = ctx.Queue()
+    stop_event = ctx.Event()
+    grants = {camera['name']: ctx.Event() for camera in cameras} if args.slots > 0 else {}
+    scheduler = None
+    if grants:
+        scheduler = Scheduler(list(grants), args.slots, grants)
+        if SCHEDULER_HTTP_PORT:
+            server = ThreadingHTTPServer(('127.0.0.1', SCHEDULER_HTTP_PORT), SchedulerRequestHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            log_message(f"Camera result ages available at http://127.0.0.1:{SCHEDULER_HTTP_PORT}/cameras")
+    workers = [ctx.Process(target=camera_worker,
+                           args=(camera, shared_model, reports, stop_event, grants.get(camera['name'])),
+                           name=camera['name'], daemon=True)
+               for camera in cameras]
+    for worker in workers:
+        worker.start()
+    log_message(f"Started {len(workers)} detector process(es)" +
+                (f", {args.slots} inference slot(s) granted by deadline" if scheduler else ""))
+
+    latest = {}
+    exited = set()
+    last_log = time.monotonic()
+    last_schedule_log = time.monotonic()
+    try:
+        while any(worker.is_alive() for worker in workers):
+            try:
+                kind, name, payload = reports.get(timeout=min(1.0, ACTIVE_REFRESH))
+                if kind == 'memory':
+                    latest[name] = payload
+                elif kind == 'ready':
+                    scheduler.ready(name)
+                elif kind == 'done':
+                    scheduler.done(name, payload)
+            except queue.Empty:
+                pass
+            for worker in workers:
+                if worker.name not in exited and not worker.is_alive():
+                    exited.add(worker.name)
+                    log_message(f"[{worker.name}] Detector process exited (code {worker.exitcode})")
+                    if scheduler:
+                        scheduler.exited(worker.name)
+            if scheduler:
+                scheduler.tick()
+            if latest and time.monotonic() - last_log >= MEMORY_REPORT_INTERVAL:
+                log_memory(latest)
+                last_log = time.monotonic()
+            if scheduler and time.monotonic() - last_schedule_log >= SCHEDULE_REPORT_INTERVAL:
+                log_schedule(scheduler.snapshot())
+                last_schedule_log = time.monotonic()
+    except KeyboardInterrupt:
+        log_message("System stopped by user")
+    finally:
+        stop_event.set()
+        for worker in workers:
+            worker.join(timeout=5)
+        if latest:
+            log_memory(latest)
+        log_message("System shutdown")
+
+if __name__ == "__main__":
+    main()
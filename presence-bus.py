@@ -0,0 +1,244 @@
+import sys
+import time
+import struct
+import socket
+import argparse
+import threading
+from datetime import datetime
+import serial
+
+# Configuration
+HUB_HOST = '0.0.0.0'
+HUB_PORT = 9500
+SUBSCRIBE_INTERVAL = 2.0   # seconds between subscription renewals sent by the aggregator
+SUBSCRIBER_TTL = 6.0       # seconds the hub keeps forwarding to a silent subscriber
+
+# Presence message: header + one count byte per zone (sent by PresencePublisher in dynamic-area-detections.py)
+MESSAGE_MAGIC = b'HDPB'
+MESSAGE_VERSION = 2
+HEADER = struct.Struct('<4sB16sIIdIB')  # magic, version, node id, boot id, seq, sent time, presence mask, zone count
+SUBSCRIBE = b'SUB'
+
+# Fusion rules: each input is "node:zone_index"; the rule fires when at least k inputs report presence.
+# k=1 is any-of, k=len(inputs) is all-of. The actuator is driven high while any rule fires.
+FUSION_RULES = [
+    {'name': 'press-1', 'inputs': ['node-a:0', 'node-b:0', 'node-c:0'], 'k': 1},
+]
+STALE_TIMEOUT = 1.5        # seconds without a message before a node counts as dropped
+STALE_POLICY = 'safe'      # 'safe': a dropped input votes present; 'ignore': it is left out of the vote,
+                           # and a rule with fewer than k live inputs holds the safe (present) state
+EVALUATE_INTERVAL = 0.1    # seconds between staleness checks when no messages arrive
+REPORT_INTERVAL = 60       # seconds between fan-in latency log lines
+
+SERIAL_PORT = '/dev/cu.usbserial-120'  # Change to your Arduino port
+BAUD_RATE = 9600
+
+def log_message(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}")
+
+def unpack_presence(data):
+    """Decode a presence message into a dict, or None if it is not one"""
+    if len(data) < HEADER.size:
+        return None
+    magic, version, node, boot, seq, sent, mask, zone_count = HEADER.unpack_from(data)
+    if magic != MESSAGE_MAGIC or version != MESSAGE_VERSION or len(data) != HEADER.size + zone_count:
+        return None
+    return {
+        'node': node.rstrip(b'\0').decode(errors='replace'),
+        'boot': boot,
+        'seq': seq,
+        'sent': sent,
+        'present': [bool(mask >> i & 1) for i in range(zone_count)],
+        'counts': list(data[HEADER.size:])
+    }
+
+def run_hub(host, port):
+    """Forward every presence message to all subscribers that renewed recently"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, port))
+    log_message(f"Presence hub listening on udp://{host}:{port}")
+
+    subscribers = {}
+    while True:
+        data, addr = sock.recvfrom(2048)
+        now = time.monotonic()
+        if data == SUBSCRIBE:
+            if addr not in subscribers:
+                log_message(f"Subscriber {addr[0]}:{addr[1]} joined")
+            subscribers[addr] = now
+            continue
+        for subscriber, seen in list(subscribers.items()):
+            if now - seen > SUBSCRIBER_TTL:
+                log_message(f"Subscriber {subscriber[0]}:{subscriber[1]} expired")
+                del subscribers[subscriber]
+                continue
+            try:
+                sock.sendto(data, subscriber)
+            except OSError as e:
+                log_message(f"Forward to {subscriber[0]}:{subscriber[1]} failed: {e}")
+
+class Aggregator:
+    """Fuses per-node zone presence with k-of-n rules and drives one actuator"""
+
+    def __init__(self, rules, ser):
+        self.rules = rules
+        self.ser = ser
+        self.lock = threading.Lock()
+        self.inputs = {}     # "node:zone" -> present
+        self.last_seen = {}  # node -> monotonic arrival time
+        self.dropped = set()
+        self.last_boot = {}  # node -> boot id; a restarted node starts its seq again from 1
+        self.last_seq = {}
+        self.short = set()   # rules with fewer than k live inputs
+        self.output = None
+        self.latencies = []
+
+    def receive(self, message):
+        node = message['node']
+        now = time.monotonic()
+        with self.lock:
+            if self.last_boot.get(node) != message['boot']:
+                if node in self.last_boot:
+                    log_message(f"Node {node} restarted")
+                self.last_boot[node] = message['boot']
+                self.last_seq.pop(node, None)
+            # UDP may reorder; ignore anything older than what we already applied
+            if node in self.last_seq and 0 < (self.last_seq[node] - message['seq']) % 2**32 < 2**31:
+                return
+            self.last_seq[node] = message['seq']
+            self.last_seen[node] = now
+            for zone, present in enumerate(message['present']):
+                self.inputs[f"{node}:{zone}"] = present
+            # Fan-in latency assumes node clocks are synchronised (NTP/PTP)
+            self.latencies.append(time.time() - message['sent'])
+            if node in self.dropped:
+                self.dropped.discard(node)
+                log_message(f"Node {node} is back")
+        self.evaluate()
+
+    def vote(self, rule, now):
+        """True when k of the rule's inputs report presence. k never shrinks with the live inputs:
+        with fewer than k left the rule could never fire, so it holds the safe state instead."""
+        votes = 0
+        voters = 0
+        for name in rule['inputs']:
+            node = name.split(':', 1)[0]
+            stale = now - self.last_seen.get(node, float('-inf')) > STALE_TIMEOUT
+            if stale:
+                if STALE_POLICY == 'safe':
+                    votes += 1
+                    voters += 1
+                continue
+            voters += 1
+            votes += self.inputs.get(name, False)
+        if voters < rule['k']:
+            if rule['name'] not in self.short:
+                self.short.add(rule['name'])
+                log_message(f"Rule {rule['name']}: {voters} live input(s), fewer than k={rule['k']}, holding safe state")
+            return True
+        if rule['name'] in self.short:
+            self.short.discard(rule['name'])
+            log_message(f"Rule {rule['name']}: {voters} live input(s), voting {rule['k']} of them again")
+        return votes >= rule['k']
+
+    def evaluate(self):
+        now = time.monotonic()
+        with self.lock:
+            for node, seen in self.last_seen.items():
+                if now - seen > STALE_TIMEOUT and node not in self.dropped:
+                    self.dropped.add(node)
+                    log_message(f"Node {node} dropped (no message for {now - seen:.1f}s, policy {STALE_POLICY})")
+            fired = [rule['name'] for rule in self.rules if self.vote(rule, now)]
+
+        state = bool(fired)
+        if state != self.output:
+            log_message(f"Actuator {'ON' if state else 'OFF'}" + (f" (rules: {', '.join(fired)})" if fired else ""))
+            if self.ser is not None:
+                try:
+                    self.ser.write(b'1' if state else b'0')
+                except serial.SerialException as e:
+                    log_message(f"Serial write error: {e}")
+                    return
+            self.output = state
+
+    def report(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            self.latencies = []
+        if latencies:
+            log_message(f"Fan-in latency over {len(latencies)} messages: "
+                        f"p50 {1000 * latencies[len(latencies) // 2]:.1f} ms, "
+                        f"p99 {1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.1f} ms")
+
+def run_aggregator(hub_host, hub_port, serial_port):
+    """Subscribe to the hub and drive the actuator from the fusion rules"""
+    ser = None
+    if serial_port:
+        try:
+            ser = serial.Serial(serial_port, BAUD_RATE, timeout=1)
+            time.sleep(2)  # Wait for connection to establish
+            log_message(f"Connected to serial port {serial_port}")
+        except serial.SerialException as e:
+            log_message(f"Error opening serial port: {e}")
+
+    aggregator = Aggregator(FUSION_RULES, ser)
+    for rule in FUSION_RULES:
+        log_message(f"Rule {rule['name']}: {rule['k']} of {len(rule['inputs'])} ({', '.join(rule['inputs'])})")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(EVALUATE_INTERVAL)
+    hub = (hub_host, hub_port)
+    last_subscribe = 0.0
+    last_report = time.monotonic()
+    try:
+        while True:
+            now = time.monotonic()
+            if now - last_subscribe >= SUBSCRIBE_INTERVAL:
+                sock.sendto(SUBSCRIBE, hub)
+                last_subscribe = now
+            try:
+                data, _ = sock.recvfrom(2048)
+            except socket.timeout:
+                aggregator.evaluate()  # Catch nodes that went silent
+            except ConnectionResetError:
+                continue  # Hub not up yet (ICMP port unreachable on some platforms)
+            else:
+                message = unpack_presence(data)
+                if message is not None:
+                    aggregator.receive(message)
+            if now - last_report >= REPORT_INTERVAL:
+                aggregator.report()
+                last_report = now
+    except KeyboardInterrupt:
+        log_message("Aggregator stopped by user")
+    finally:
+        if ser is not None:
+            ser.write(b'0')
+            ser.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Presence hub and fusing aggregator for multi-node deployments")
+    sub = parser.add_subparsers(dest='command', required=True)
+    hub = sub.add_parser('hub', help="run the message hub")
+    hub.add_argument('--host', default=HUB_HOST)
+    hub.add_argument('--port', type=int, default=HUB_PORT)
+    agg = sub.add_parser('aggregate', help="fuse node presence and drive the actuator")
+    agg.add_argument('--hub', default=f"127.0.0.1:{HUB_PORT}", help="hub address host:port")
+    agg.add_argument('--serial-port', default=SERIAL_PORT, help="actuator port, empty for none")
+    args = parser.parse_args()
+
+    if args.command == 'hub':
+        try:
+            run_hub(args.host, args.port)
+        except KeyboardInterrupt:
+            log_message("Hub stopped by user")
+    else:
+        host, _, port = args.hub.rpartition(':')
+        if not host:
+            log_message("Error: --hub must be host:port")
+            sys.exit(1)
+        run_aggregator(host, int(port), args.serial_port)
+
+if __name__ == "__main__":
+    main()
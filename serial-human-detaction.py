@@ -2,6 +2,7 @@ import cv2
 import time
 import numpy as np
 from datetime import datetime
+from inference_client import InferenceClient
 import serial
 
 # Configuration
@@ -23,6 +24,11 @@ DETECTION_AREA = {
     'y_end': 0.75
 }
 
+# Remote inference (inference-server.py), None always runs the model locally
+INFERENCE_SERVER_URL = None     # e.g. "http://192.168.1.10:8090/detect"
+INFERENCE_TIMEOUT = 0.5         # seconds before falling back to the local model
+INFERENCE_RETRY_INTERVAL = 10   # seconds on the local model before trying the server again
+
 # Load pre-trained model
 net = cv2.dnn.readNetFromCaffe(PROTOTXT, MODEL)
 
@@ -35,13 +41,19 @@ except serial.SerialException as e:
     print(f"Error opening serial port: {e}")
     ser = None
 
-# Initialize variables
-last_human_state = None
-
 def log_message(message):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {message}")
 
+class PresenceState:
+    """Output state for one camera: whether anyone is in the zone, and the state last sent"""
+
+    __slots__ = ('present', 'last_sent')
+
+    def __init__(self):
+        self.present = False
+        self.last_sent = None
+
 def is_in_detection_area(box, frame_width, frame_height):
     """Check if detection is within our defined area"""
     x_center = (box[0] + box[2]) / 2
@@ -54,26 +66,27 @@ def is_in_detection_area(box, frame_width, frame_height):
     
     return (x_min <= x_center <= x_max) and (y_min <= y_center <= y_max)
 
-def send_serial_data(state):
-    """Send data over serial if port is open"""
-    global last_human_state
-    
+def send_serial_data(camera, state):
+    """Send `camera`'s state over serial if port is open"""
     # Only send if state changed
-    if state != last_human_state and ser is not None:
+    if state != camera.last_sent and ser is not None:
         try:
             data = b'1' if state else b'0'
             ser.write(data)
             log_message(f"Serial data sent: {data.decode()}")
-            last_human_state = state
+            camera.last_sent = state
         except serial.SerialException as e:
             log_message(f"Serial write error: {e}")
 
-def detect_humans(frame):
+inference = InferenceClient(INFERENCE_SERVER_URL, INFERENCE_TIMEOUT, INFERENCE_RETRY_INTERVAL)
+
+def detect_humans(frame, camera):
     (h, w) = frame.shape[:2]
-    blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 0.007843, (300, 300), 127.5)
-    
-    net.setInput(blob)
-    detections = net.forward()
+    detections = inference.detections(frame)
+    if detections is None:
+        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 0.007843, (300, 300), 127.5)
+        net.setInput(blob)
+        detections = net.forward()
     
     human_detected = False
     
@@ -104,7 +117,8 @@ def detect_humans(frame):
                     cv2.rectangle(frame, (startX, startY), (endX, endY), (200, 200, 200), 1)
     
     # Send serial data based on detection
-    send_serial_data(human_detected)
+    camera.present = human_detected
+    send_serial_data(camera, human_detected)
     
     return frame, human_detected
 
@@ -119,6 +133,7 @@ if not cap.isOpened():
     exit()
 
 log_message("System started. Monitoring for humans in detection zone...")
+camera = PresenceState()
 
 try:
     while True:
@@ -129,7 +144,7 @@ try:
             continue
         
         frame = cv2.flip(frame, 1)
-        processed_frame, human_detected = detect_humans(frame)
+        processed_frame, human_detected = detect_humans(frame, camera)
         
         # Display status text
         status_text = "DETECTED (1)" if human_detected else "NO HUMAN (0)"
@@ -148,6 +163,6 @@ finally:
     cap.release()
     cv2.destroyAllWindows()
     if ser is not None:
-        send_serial_data(0)
+        send_serial_data(camera, 0)
         ser.close()
     log_message("System shutdown")
\ No newline at end of file
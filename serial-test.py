@@ -1,6 +1,19 @@
+import os
+import tty
 import serial
 import time
 import sys
+import random
+import select
+import struct
+import argparse
+import binascii
+import threading
+
+# Framed actuator protocol, as sent by ActuatorPool in dynamic-area-detections.py
+FRAME_SYNC = b'\xaa\x55'
+FRAME_HEADER = struct.Struct('<2sBHI')  # sync, zone count, sequence, zone bitmask; CRC-16 follows
+FRAME_SIZE = FRAME_HEADER.size + 2
 
 def send_alternating_serial_data(port, baud_rate, interval_seconds=10):
     """
@@ -42,6 +55,158 @@ def send_alternating_serial_data(port, baud_rate, interval_seconds=10):
             ser.close()
             print("Serial port closed.")
 
+def pack_frame(seq, zone_count, mask):
+    body = FRAME_HEADER.pack(FRAME_SYNC, zone_count, seq, mask)
+    return body + struct.pack('<H', binascii.crc_hqx(body, 0xFFFF))
+
+class FrameDecoder:
+    """Finds frames in a byte stream, resynchronising on the sync bytes after corruption"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.crc_errors = 0
+
+    def feed(self, data):
+        """Add received bytes and return the (seq, zone_count, mask) of every complete valid frame"""
+        self.buffer += data
+        frames = []
+        while True:
+            start = self.buffer.find(FRAME_SYNC)
+            if start < 0:
+                del self.buffer[:-1]  # Keep a trailing half of the sync word
+                break
+            del self.buffer[:start]
+            if len(self.buffer) < FRAME_SIZE:
+                break
+            body = bytes(self.buffer[:FRAME_HEADER.size])
+            (crc,) = struct.unpack_from('<H', self.buffer, FRAME_HEADER.size)
+            if binascii.crc_hqx(body, 0xFFFF) != crc:
+                self.crc_errors += 1
+                del self.buffer[:1]  # Not a frame start after all; look for the next sync
+                continue
+            _, zone_count, seq, mask = FRAME_HEADER.unpack(body)
+            frames.append((seq, zone_count, mask))
+            del self.buffer[:FRAME_SIZE]
+        return frames
+
+def open_pty():
+    """A pseudo-terminal pair standing in for an actuator board: (sender path, receiver fd, sender fd)"""
+    master, slave = os.openpty()
+    tty.setraw(slave)  # No line discipline: bytes arrive exactly as written
+    return os.ttyname(slave), master, slave
+
+def receive_frames(fd, decoder, arrivals, stop_event):
+    """Reader thread for one output: decode frames and timestamp their arrival"""
+    while not stop_event.is_set():
+        if not select.select([fd], [], [], 0.1)[0]:
+            continue
+        try:
+            data = os.read(fd, 4096)
+        except OSError:
+            break
+        now = time.perf_counter()
+        for seq, _, mask in decoder.feed(data):
+            arrivals.append((seq, mask, now))
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def load_test(outputs, zones, rate, duration, change_probability, heartbeat, corrupt_rate, baud_rate):
+    """
+    Drives several pseudo-terminal outputs with the framed protocol and checks what arrives.
+
+    Args:
+        outputs (int): Number of serial outputs in the pool.
+        zones (int): Zones per output (bits in the mask, up to 32).
+        rate (float): Zone state updates per second, as the detector's output stage would make.
+        duration (float): Test length in seconds.
+        change_probability (float): Chance that an update flips one zone, per output.
+        heartbeat (float): Seconds between repeated frames while nothing changes.
+        corrupt_rate (float): Fraction of frames with one byte corrupted in transit.
+        baud_rate (int): Link speed used to report how much of a real serial line the load would need.
+    """
+    stop_event = threading.Event()
+    pool = []
+    for _ in range(outputs):
+        path, master, slave = open_pty()
+        # Opened once and kept, as ActuatorPool does; a pty ignores the baud rate
+        conn = serial.Serial(path, baud_rate, timeout=1)
+        out = {'path': path, 'serial': conn, 'master': master, 'slave': slave, 'decoder': FrameDecoder(),
+               'arrivals': [], 'sent': {}, 'mask': 0, 'last_mask': None, 'last_sent': 0.0, 'seq': 0,
+               'frames': 0, 'changes': 0, 'heartbeats': 0, 'corrupted': 0}
+        out['reader'] = threading.Thread(target=receive_frames,
+                                         args=(master, out['decoder'], out['arrivals'], stop_event), daemon=True)
+        out['reader'].start()
+        pool.append(out)
+    print(f"Load test: {outputs} output(s) x {zones} zone(s), {rate:.0f} updates/s for {duration:.0f}s")
+
+    interval = 1.0 / rate
+    started = time.perf_counter()
+    next_tick = started
+    while time.perf_counter() - started < duration:
+        for out in pool:
+            if random.random() < change_probability:
+                out['mask'] ^= 1 << random.randrange(zones)
+            now = time.perf_counter()
+            changed = out['mask'] != out['last_mask']
+            if not changed and now - out['last_sent'] < heartbeat:
+                continue
+            out['seq'] = (out['seq'] + 1) % 2**16
+            frame = bytearray(pack_frame(out['seq'], zones, out['mask']))
+            if random.random() < corrupt_rate:
+                frame[random.randrange(2, FRAME_SIZE)] ^= 0xFF  # Corrupt past the sync so it stays findable
+                out['corrupted'] += 1
+            # Keyed by sequence number, so only the last 65536 frames are matched for latency
+            out['sent'][out['seq']] = (out['mask'], time.perf_counter())
+            out['frames'] += 1
+            out['serial'].write(frame)
+            out['serial'].flush()
+            out['changes' if changed else 'heartbeats'] += 1
+            out['last_mask'] = out['mask']
+            out['last_sent'] = now
+        next_tick += interval
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+    elapsed = time.perf_counter() - started
+
+    time.sleep(0.2)  # Let the readers drain
+    stop_event.set()
+    for out in pool:
+        out['reader'].join()
+
+    failed = False
+    link_capacity = baud_rate / 10 / FRAME_SIZE  # frames/s on a real 8N1 line
+    for i, out in enumerate(pool):
+        sent = out['frames']
+        latencies = []
+        gaps = 0
+        mismatches = 0
+        previous = None
+        for seq, mask, arrived in out['arrivals']:
+            if seq in out['sent']:
+                sent_mask, sent_at = out['sent'][seq]
+                latencies.append((arrived - sent_at) * 1000)
+                mismatches += mask != sent_mask
+            if previous is not None and seq != (previous + 1) % 2**16:
+                gaps += 1
+            previous = seq
+        received = len(out['arrivals'])
+        lost = sent - received - out['corrupted']
+        ok = lost == 0 and mismatches == 0 and out['decoder'].crc_errors >= out['corrupted']
+        failed |= not ok
+        print(f"[{i}] {out['path']}: sent {sent} ({out['changes']} changes, {out['heartbeats']} heartbeats), "
+              f"received {received}, corrupted {out['corrupted']}, CRC errors {out['decoder'].crc_errors}, "
+              f"lost {lost}, sequence gaps {gaps}, mask mismatches {mismatches} - {'OK' if ok else 'FAIL'}")
+        print(f"    latency p50 {percentile(latencies, 50):.3f} ms, p99 {percentile(latencies, 99):.3f} ms, "
+              f"max {max(latencies, default=float('nan')):.3f} ms; "
+              f"{sent / elapsed:.1f} frames/s = {100 * sent / elapsed / link_capacity:.1f}% of a {baud_rate} baud link")
+        out['serial'].close()
+        os.close(out['master'])
+        os.close(out['slave'])
+    return not failed
+
 if __name__ == "__main__":
     # --- Configuration ---
     # IMPORTANT: Replace with your actual serial port and baud rate
@@ -49,5 +214,33 @@ if __name__ == "__main__":
     BAUD_RATE = 9600      # Common baud rate. Match your device's baud rate.
     SEND_INTERVAL = 10    # Send data every 10 seconds
 
+    parser = argparse.ArgumentParser(description="Serial output test tools")
+    parser.add_argument('--baud', type=int, default=BAUD_RATE)
+    # --baud is accepted after the command too; SUPPRESS keeps a subcommand from resetting one given before it
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--baud', type=int, default=argparse.SUPPRESS)
+    sub = parser.add_subparsers(dest='command')
+    toggle = sub.add_parser('toggle', parents=[common], help="send alternating '1'/'0' bytes to a real port (default)")
+    toggle.add_argument('--port', default=SERIAL_PORT)
+    toggle.add_argument('--interval', type=float, default=SEND_INTERVAL)
+    load = sub.add_parser('load', parents=[common], help="load-test the framed protocol against pseudo-terminal outputs")
+    load.add_argument('--outputs', type=int, default=4, help="serial outputs in the pool")
+    load.add_argument('--zones', type=int, default=8, help="zones per output (max 32)")
+    load.add_argument('--rate', type=float, default=100, help="zone state updates per second")
+    load.add_argument('--duration', type=float, default=10, help="seconds")
+    load.add_argument('--change-probability', type=float, default=0.2, help="chance an update flips a zone")
+    load.add_argument('--heartbeat', type=float, default=1.0, help="seconds between unchanged frames")
+    load.add_argument('--corrupt-rate', type=float, default=0.0, help="fraction of frames corrupted in transit")
+    args = parser.parse_args()
+
+    if args.command == 'load':
+        if not 1 <= args.zones <= 32:
+            print("Error: --zones must be between 1 and 32")
+            sys.exit(2)
+        passed = load_test(args.outputs, args.zones, args.rate, args.duration, args.change_probability,
+                           args.heartbeat, args.corrupt_rate, args.baud)
+        sys.exit(0 if passed else 1)
+
     print("Starting serial data sender. Press Ctrl+C to stop.")
-    send_alternating_serial_data(SERIAL_PORT, BAUD_RATE, SEND_INTERVAL)
\ No newline at end of file
+    send_alternating_serial_data(args.port if args.command else SERIAL_PORT, args.baud,
+                                 args.interval if args.command else SEND_INTERVAL)
@@ -0,0 +1,345 @@
+import os
+import sys
+import cv2
+import json
+import time
+import types
+import runpy
+import argparse
+import threading
+import tracemalloc
+import numpy as np
+from datetime import datetime
+
+# Configuration
+SAMPLE_INTERVAL = 10.0         # seconds between RSS/FPS/latency samples
+WARMUP = 60.0                  # seconds before the baseline is taken (model init, allocator warm-up)
+KEY_SCRIPT = ['+', '+', '-', '-', 'd', 'd']  # keys pressed in turn, to exercise zoom and zone toggling
+KEY_INTERVAL = 150             # frames between key presses
+
+# Failure thresholds, measured from the end of the warm-up
+MAX_RSS_GROWTH_MB = 20.0       # total resident memory growth
+MAX_RSS_SLOPE_MB_PER_HOUR = 5.0
+MAX_TRACED_GROWTH_MB = 10.0    # Python heap growth seen by tracemalloc
+MAX_FPS_DRIFT = 0.10           # fractional drop between the first and last tenth of the run
+MAX_FRAME_TIME_DRIFT = 0.25    # fractional rise of p99 frame time between the first and last tenth
+MAX_LATENCY_DRIFT = 0.25       # fractional rise of p99 capture-to-output latency between the first and last tenth
+
+def log_message(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] [soak] {message}", flush=True)
+
+def parse_duration(text):
+    """'90', '30s', '15m' or '4h' to seconds"""
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    if text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+def current_rss():
+    """Resident set size in bytes (Linux), falling back to the peak elsewhere"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def bucket_percentile(buckets, top, pct):
+    """Percentile of {upper bound ms: count} buckets, interpolated inside the bucket holding it"""
+    total = sum(buckets.values())
+    if not total:
+        return None
+    target = total * pct / 100
+    seen = 0
+    lower = 0.0
+    for bound, count in buckets.items():
+        upper = min(float(bound), top)
+        if count and seen + count >= target:
+            return lower + (upper - lower) * (target - seen) / count
+        seen += count
+        lower = upper
+    return top
+
+class MockSerial:
+    """Stands in for serial.Serial; counts writes instead of keeping them, so it cannot leak"""
+
+    def __init__(self, port=None, baudrate=9600, timeout=None, **kwargs):
+        self.port = port
+        self.is_open = True
+        self.writes = 0
+        self.bytes = 0
+
+    def write(self, data):
+        self.writes += 1
+        self.bytes += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def read(self, size=1):
+        return b''
+
+    def close(self):
+        self.is_open = False
+
+def install_mocks():
+    """Replace RPi.GPIO and serial ports with in-memory stand-ins"""
+    gpio = types.ModuleType('RPi.GPIO')
+    gpio.BCM, gpio.OUT, gpio.IN = 'BCM', 'OUT', 'IN'
+    gpio.setmode = gpio.setup = gpio.output = gpio.cleanup = lambda *args, **kwargs: None
+    rpi = types.ModuleType('RPi')
+    rpi.GPIO = gpio
+    sys.modules['RPi'] = rpi
+    sys.modules['RPi.GPIO'] = gpio
+
+    try:
+        import serial
+    except ImportError:
+        serial = types.ModuleType('serial')
+        serial.SerialException = type('SerialException', (IOError,), {})
+        sys.modules['serial'] = serial
+    serial.Serial = MockSerial
+
+class LoopedClip:
+    """cv2.VideoCapture replacement that replays a clip forever, paced at `fps` (0: as fast as read)"""
+
+    open_clip = cv2.VideoCapture  # The real one, before main() patches cv2
+
+    def __init__(self, path, fps):
+        self.path = path
+        self.cap = LoopedClip.open_clip(path)
+        self.interval = 1.0 / fps if fps else 0.0
+        self.next_frame = time.monotonic()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def set(self, prop, value):
+        return True  # Resolution/FPS requests are for real cameras
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def read(self, image=None):
+        if self.interval:
+            delay = self.next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_frame = max(self.next_frame + self.interval, time.monotonic() - self.interval)
+        ret, frame = self.cap.read(image)
+        if not ret:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(image)
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+class SoakMonitor:
+    """Counts frames through the stubbed GUI calls and samples memory and timing in the background.
+
+    Frames are counted at imshow: the detection scripts may pump waitKey more often than
+    they show frames.
+    """
+
+    def __init__(self, duration, trace):
+        self.duration = duration
+        self.trace = trace
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.frame_times = []
+        self.last_frame = None
+        self.pressed = 0
+        self.samples = []
+        self.baseline = None
+        self.stop = threading.Event()
+        self.histogram = None
+        self.latency_counts = None
+
+    def show(self, *args, **kwargs):
+        now = time.monotonic()
+        with self.lock:
+            self.frames += 1
+            if self.last_frame is not None:
+                self.frame_times.append(now - self.last_frame)
+            self.last_frame = now
+
+    def wait_key(self, delay=0):
+        if time.monotonic() - self.started >= self.duration:
+            return ord('q')
+        due = self.frames // KEY_INTERVAL
+        if due > self.pressed:
+            self.pressed = due
+            return ord(KEY_SCRIPT[due % len(KEY_SCRIPT)])
+        return -1
+
+    def pipeline_latency(self):
+        """The soaked script's own capture-to-output latency histogram, if it keeps one.
+
+        runpy installs the script as __main__ while it runs, so its globals are reachable here;
+        the histogram is kept for the final sample after the script has returned.
+        """
+        if self.histogram is None:
+            latency = getattr(sys.modules.get('__main__'), 'latency', None)
+            if isinstance(latency, dict):
+                self.histogram = latency.get('end_to_end')
+        return self.histogram
+
+    def latency_p99(self):
+        """p99 capture-to-output latency of the frames completed since the last sample"""
+        histogram = self.pipeline_latency()
+        if histogram is None:
+            return None
+        summary = histogram.summary()
+        if not summary['count']:
+            return None
+        counts = summary['buckets_ms']
+        previous, self.latency_counts = self.latency_counts, counts
+        if previous is not None:
+            counts = {bound: count - previous[bound] for bound, count in counts.items()}
+        return bucket_percentile(counts, summary['max_ms'], 99)
+
+    def sample(self):
+        now = time.monotonic()
+        with self.lock:
+            frame_times, self.frame_times = self.frame_times, []
+            frames = self.frames
+        latency_p99 = self.latency_p99()
+        previous = self.samples[-1] if self.samples else {'elapsed': 0.0, 'frames': 0}
+        elapsed = now - self.started
+        sample = {
+            'elapsed': elapsed,
+            'frames': frames,
+            'fps': (frames - previous['frames']) / max(elapsed - previous['elapsed'], 1e-9),
+            'frame_ms_p50': 1000 * float(np.percentile(frame_times, 50)) if frame_times else None,
+            'frame_ms_p99': 1000 * float(np.percentile(frame_times, 99)) if frame_times else None,
+            'latency_ms_p99': latency_p99,
+            'rss_mb': current_rss() / 2**20,
+            'traced_mb': tracemalloc.get_traced_memory()[0] / 2**20 if self.trace else None
+        }
+        self.samples.append(sample)
+        if self.baseline is None and elapsed >= WARMUP:
+            self.baseline = (len(self.samples) - 1, tracemalloc.take_snapshot() if self.trace else None)
+            log_message("Warm-up done, baseline taken")
+        log_message(f"{elapsed / 60:6.1f} min: {sample['fps']:6.1f} FPS, "
+                    f"frame p99 {sample['frame_ms_p99'] or 0:6.1f} ms, "
+                    + (f"latency p99 {latency_p99:6.1f} ms, " if latency_p99 is not None else "")
+                    + f"RSS {sample['rss_mb']:7.1f} MB"
+                    + (f", traced {sample['traced_mb']:6.1f} MB" if self.trace else ""))
+
+    def run(self):
+        while not self.stop.wait(SAMPLE_INTERVAL):
+            self.sample()
+
+    def verdict(self):
+        """Compare the run after warm-up against the thresholds; returns a list of failures"""
+        if self.baseline is None:
+            return [f"run shorter than the {WARMUP:.0f}s warm-up, nothing measured"]
+        first, snapshot = self.baseline
+        samples = self.samples[first:]
+        if len(samples) < 2:
+            return ["fewer than two samples after warm-up"]
+        failures = []
+
+        hours = np.array([s['elapsed'] for s in samples]) / 3600
+        rss = np.array([s['rss_mb'] for s in samples])
+        growth = rss[-1] - rss[0]
+        slope = np.polyfit(hours, rss, 1)[0]
+        log_message(f"RSS {rss[0]:.1f} -> {rss[-1]:.1f} MB ({growth:+.1f} MB, trend {slope:+.2f} MB/h)")
+        if growth > MAX_RSS_GROWTH_MB:
+            failures.append(f"RSS grew {growth:.1f} MB (limit {MAX_RSS_GROWTH_MB} MB)")
+        if slope > MAX_RSS_SLOPE_MB_PER_HOUR and hours[-1] - hours[0] >= 0.25:
+            failures.append(f"RSS trend {slope:.2f} MB/h (limit {MAX_RSS_SLOPE_MB_PER_HOUR} MB/h)")
+
+        if self.trace:
+            traced = samples[-1]['traced_mb'] - samples[0]['traced_mb']
+            log_message(f"Traced Python memory {traced:+.1f} MB; largest growth by line:")
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')]
+            final = tracemalloc.take_snapshot().filter_traces(ignore)
+            for stat in final.compare_to(snapshot.filter_traces(ignore), 'lineno')[:10]:
+                log_message(f"  {stat}")
+            if traced > MAX_TRACED_GROWTH_MB:
+                failures.append(f"traced memory grew {traced:.1f} MB (limit {MAX_TRACED_GROWTH_MB} MB)")
+
+        tenth = max(1, len(samples) // 10)
+        head, tail = samples[:tenth], samples[-tenth:]
+        fps_head = np.mean([s['fps'] for s in head])
+        fps_tail = np.mean([s['fps'] for s in tail])
+        fps_drift = (fps_head - fps_tail) / fps_head if fps_head else 0.0
+        log_message(f"FPS {fps_head:.1f} -> {fps_tail:.1f} ({-100 * fps_drift:+.1f}%)")
+        if fps_drift > MAX_FPS_DRIFT:
+            failures.append(f"FPS dropped {100 * fps_drift:.1f}% (limit {100 * MAX_FPS_DRIFT:.0f}%)")
+
+        p99_head = [s['frame_ms_p99'] for s in head if s['frame_ms_p99'] is not None]
+        p99_tail = [s['frame_ms_p99'] for s in tail if s['frame_ms_p99'] is not None]
+        if p99_head and p99_tail:
+            head_ms, tail_ms = np.mean(p99_head), np.mean(p99_tail)
+            latency_drift = (tail_ms - head_ms) / head_ms if head_ms else 0.0
+            log_message(f"Frame time p99 {head_ms:.1f} -> {tail_ms:.1f} ms ({100 * latency_drift:+.1f}%)")
+            if latency_drift > MAX_FRAME_TIME_DRIFT:
+                failures.append(f"p99 frame time rose {100 * latency_drift:.1f}% (limit {100 * MAX_FRAME_TIME_DRIFT:.0f}%)")
+
+        p99_head = [s['latency_ms_p99'] for s in head if s['latency_ms_p99'] is not None]
+        p99_tail = [s['latency_ms_p99'] for s in tail if s['latency_ms_p99'] is not None]
+        if p99_head and p99_tail:
+            head_ms, tail_ms = np.mean(p99_head), np.mean(p99_tail)
+            latency_drift = (tail_ms - head_ms) / head_ms if head_ms else 0.0
+            log_message(f"Capture-to-output p99 {head_ms:.1f} -> {tail_ms:.1f} ms ({100 * latency_drift:+.1f}%)")
+            if latency_drift > MAX_LATENCY_DRIFT:
+                failures.append(f"p99 capture-to-output latency rose {100 * latency_drift:.1f}% "
+                                f"(limit {100 * MAX_LATENCY_DRIFT:.0f}%)")
+        else:
+            log_message("No pipeline latency stats from this script, latency drift not checked")
+        return failures
+
+def main():
+    global WARMUP
+
+    parser = argparse.ArgumentParser(description="Replay looped footage through a detection script with mock "
+                                                 "serial and GPIO, and fail on memory growth or throughput drift")
+    parser.add_argument('clip', help="recorded clip to loop")
+    parser.add_argument('--script', default="dynamic-area-detections.py", help="detection script to soak")
+    parser.add_argument('--duration', default="4h", help="run length, e.g. 900, 30m, 4h")
+    parser.add_argument('--fps', type=float, default=0, help="pace the looped clip (0: as fast as the pipeline runs)")
+    parser.add_argument('--warmup', type=parse_duration, default=WARMUP, help="seconds before the baseline")
+    parser.add_argument('--no-tracemalloc', action='store_true', help="skip allocation tracing (it slows the loop)")
+    parser.add_argument('-o', '--output', help="write the samples as JSON")
+    args = parser.parse_args()
+
+    WARMUP = args.warmup
+    monitor = SoakMonitor(parse_duration(args.duration), not args.no_tracemalloc)
+    install_mocks()
+    cv2.VideoCapture = lambda *args_, **kwargs: LoopedClip(args.clip, args.fps)
+    cv2.waitKey = monitor.wait_key
+    cv2.imshow = monitor.show
+    cv2.namedWindow = cv2.setMouseCallback = lambda *args_, **kwargs: None
+    cv2.destroyAllWindows = lambda: None
+
+    if monitor.trace:
+        tracemalloc.start(1)
+    sampler = threading.Thread(target=monitor.run, daemon=True)
+    sampler.start()
+    log_message(f"Soaking {args.script} on {args.clip} for {args.duration}")
+    try:
+        runpy.run_path(args.script, run_name='__main__')
+    except SystemExit:
+        pass
+    monitor.stop.set()
+    sampler.join()
+    monitor.sample()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(monitor.samples, f, indent=2)
+    failures = monitor.verdict()
+    for failure in failures:
+        log_message(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    log_message("PASS: no growth or drift beyond the thresholds")
+
+if __name__ == "__main__":
+    main()
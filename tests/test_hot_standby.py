@@ -0,0 +1,119 @@
+import os
+import time
+import signal
+import threading
+import importlib.util
+import multiprocessing as mp
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+spec = importlib.util.spec_from_file_location('hot_standby', os.path.join(HERE, '..', 'hot-standby.py'))
+hot_standby = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(hot_standby)
+
+TAKEOVER_MARGIN = 0.15  # seconds allowed past FAILOVER_TIMEOUT for polling and scheduling
+
+def owner_heartbeats(shm_name):
+    """Stand-in owner detector: attach and heartbeat until killed"""
+    shared = hot_standby.SharedState(shm_name)
+    shared.slots[0]['ready'] = 1
+    hot_standby.heartbeat_loop(shared, 0, threading.Event())
+
+@pytest.fixture
+def shared():
+    state = hot_standby.SharedState()
+    threads = []
+    yield state, threads
+    state.control['stop'] = 1
+    for thread in threads:
+        thread.join(timeout=2)
+    state.close()
+
+def start(threads, target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    threads.append(thread)
+    return thread
+
+def wait_for(condition, timeout):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return condition()
+
+def test_takeover_after_owner_killed(shared):
+    state, threads = shared
+    # Fork before any thread exists in this process
+    owner = mp.get_context('fork').Process(target=owner_heartbeats, args=(state.shm.name,), daemon=True)
+    owner.start()
+    try:
+        assert wait_for(lambda: state.slots[0]['ready'] and state.slots[0]['heartbeat'], 5)
+        state.slots[1]['ready'] = 1
+        start(threads, hot_standby.heartbeat_loop, state, 1, threading.Event())
+        start(threads, hot_standby.watch_owner, state, 1, hot_standby.FAILOVER_TIMEOUT)
+        time.sleep(0.5)
+        assert int(state.control['owner']) == 0  # Healthy owner keeps the output
+
+        killed_at = time.monotonic()
+        os.kill(owner.pid, signal.SIGKILL)
+        assert wait_for(lambda: int(state.control['owner']) == 1, 2 * hot_standby.FAILOVER_TIMEOUT + 1)
+        takeover = float(state.control['takeover_at']) - killed_at
+        assert takeover <= hot_standby.FAILOVER_TIMEOUT + TAKEOVER_MARGIN
+        assert int(state.control['epoch']) == 1
+    finally:
+        owner.kill()
+        owner.join()
+
+def test_slow_inference_is_not_a_failure(shared):
+    state, threads = shared
+    for me in range(hot_standby.DETECTORS):
+        state.slots[me]['ready'] = 1
+        start(threads, hot_standby.heartbeat_loop, state, me, threading.Event())
+    # The owner is in one inference three times longer than the failover timeout
+    state.slots[0]['busy_since'] = time.monotonic()
+    start(threads, hot_standby.watch_owner, state, 1, hot_standby.FAILOVER_TIMEOUT)
+    time.sleep(3 * hot_standby.FAILOVER_TIMEOUT)
+    assert int(state.control['owner']) == 0
+    assert int(state.control['failovers']) == 0
+    assert hot_standby.slot_failure(state.slots[1], time.monotonic(), hot_standby.FAILOVER_TIMEOUT) is None
+
+def test_stuck_inference_is_taken_over(shared):
+    state, threads = shared
+    for me in range(hot_standby.DETECTORS):
+        state.slots[me]['ready'] = 1
+        start(threads, hot_standby.heartbeat_loop, state, me, threading.Event())
+    state.slots[0]['inference_ms'] = 100
+    state.slots[0]['busy_since'] = time.monotonic() - hot_standby.STUCK_TIMEOUT_MIN
+    start(threads, hot_standby.watch_owner, state, 1, hot_standby.FAILOVER_TIMEOUT)
+    assert wait_for(lambda: int(state.control['owner']) == 1, 1)
+
+class Running:
+    """Stand-in for a detector process that is alive"""
+    pid = 0
+    exitcode = None
+
+    def is_alive(self):
+        return True
+
+def test_stale_frame_forces_safe_output():
+    supervisor = hot_standby.Supervisor(0, '')
+    supervisor.processes = [Running() for _ in range(hot_standby.DETECTORS)]
+    slot = supervisor.shared.slots[0]
+    try:
+        slot['ready'] = 1
+        slot['state'] = not hot_standby.SAFE_OUTPUT_STATE
+        # Heartbeat fresh, but the last processed frame is older than FRAME_TIMEOUT
+        slot['heartbeat'] = time.monotonic()
+        slot['captured'] = time.monotonic() - hot_standby.FRAME_TIMEOUT - 0.1
+        supervisor.tick()
+        assert supervisor.sent_state == hot_standby.SAFE_OUTPUT_STATE
+
+        slot['heartbeat'] = slot['captured'] = time.monotonic()
+        supervisor.tick()
+        assert supervisor.sent_state == (not hot_standby.SAFE_OUTPUT_STATE)
+    finally:
+        del slot
+        supervisor.shared.close()